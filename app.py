@@ -1,439 +1,103 @@
 import os
-import re
 import json
+import time
+import uuid
 import streamlit as st
-import google.generativeai as genai
-from dotenv import load_dotenv
-from datetime import datetime
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from collections import Counter, defaultdict
-
-# Load environment variables
-load_dotenv()
-
-# Configuration
-API_KEY = os.environ.get("GEMINI_API_KEY", "")
-MODEL_NAME = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
-TELOS_FOLDER = os.environ.get("TELOS_FOLDER", "telos")
-
-# Patterns - Organized by category
-PATTERN_CATEGORIES = {
-    "🎯 Core Analysis": {
-        "summarize": (
-            "You are an expert synthesizer. Read the provided user context (Telos file) "
-            "and provide a concise executive summary of their current life status, "
-            "mission, and immediate goals."
-        ),
-    },
-    
-    "🔥 Critical Analysis": {
-        "red_team": (
-            "You are an expert security researcher and life coach. Your goal is to 'Red Team' "
-            "the user's life strategy. Look at the provided context (Telos file). "
-            "Ruthlessly identify vulnerabilities, contradictions, weak goals, and blind spots. "
-            "Be direct, critical, and constructive. Tell them where they are lying to themselves."
-        ),
-        "find_blind_spots": (
-            "Analyze the provided Telos file for cognitive dissonance and blind spots. "
-            "Look for areas where the user's stated goals do not match their reported behaviors "
-            "or challenges. Highlight 3 major blind spots they are ignoring."
-        ),
-        "death_bed_test": (
-            "You are a memento mori philosopher. Imagine the user is on their deathbed at age 90, "
-            "looking back at their life. Based on their current Telos, what will they regret NOT doing? "
-            "What opportunities did they waste? What fears held them back from their true potential? "
-            "Be brutally honest but compassionate. This is their wake-up call."
-        ),
-        "future_self": (
-            "You are the user's future self from 10 years in the future. You've achieved everything they dream of. "
-            "Write them a letter explaining: 1) What they need to START doing immediately, "
-            "2) What they need to STOP doing that's holding them back, "
-            "3) The ONE decision that changed everything. Be specific and personal."
-        ),
-    },
-    
-    "💼 Strategic Coaching": {
-        "career_coach": (
-            "You are a world-class career strategist. Based on the user's history, "
-            "skills, and mission in the Telos file, suggest 3 concrete, high-impact "
-            "projects they should start immediately to advance their specific mission."
-        ),
-        "stoic_mentor": (
-            "You are Marcus Aurelius, the Stoic philosopher-emperor. Analyze the user's Telos through "
-            "the lens of Stoic philosophy. What is within their control vs outside their control? "
-            "Where are they wasting energy on externals? What virtues should they cultivate? "
-            "Provide 3 Stoic practices they should adopt immediately. Write in a wise, measured tone."
-        ),
-        "contrarian": (
-            "You are a contrarian thinker who questions conventional wisdom. Look at the user's goals "
-            "and ask: Are these REALLY their goals, or society's goals? Are they optimizing for the wrong things? "
-            "Challenge their assumptions. Suggest 3 unconventional paths they haven't considered. "
-            "Be provocative but insightful."
-        ),
-        "systems_thinker": (
-            "You are a systems design expert. Analyze the user's life as an interconnected system. "
-            "Identify: 1) Leverage points - small changes with big impact, "
-            "2) Feedback loops - what behaviors reinforce or undermine their goals, "
-            "3) Bottlenecks - what's the ONE constraint limiting their progress? "
-            "Provide a systems-level intervention strategy."
-        ),
-    },
-    
-    "🧠 Psychological Depth": {
-        "therapist": (
-            "You are a compassionate but firm therapist. Read the journal entries and "
-            "insecurities in the Telos file. Identify the emotional blockers holding the user back "
-            "and provide a psychological reframe to help them move forward."
-        ),
-        "shadow_work": (
-            "You are a Jungian psychologist specializing in shadow work. Analyze the user's Telos for: "
-            "1) Repressed desires they're not admitting, 2) Projections - what they criticize in others that they deny in themselves, "
-            "3) The 'golden shadow' - positive traits they're not owning. "
-            "Help them integrate their shadow for wholeness. Be deep and psychological."
-        ),
-        "inner_child": (
-            "You are a trauma-informed therapist. Look at the user's goals and challenges through the lens of their inner child. "
-            "What childhood wounds are driving their current behaviors? What does their inner child need to hear? "
-            "What patterns are they repeating from their past? Provide a healing message and 3 reparenting practices."
-        ),
-        "imposter_syndrome": (
-            "You are an expert in imposter syndrome and self-worth. Analyze where the user is playing small, "
-            "self-sabotaging, or not claiming their achievements. Identify: 1) Evidence they're more capable than they believe, "
-            "2) The origin story of their self-doubt, 3) A new identity narrative they should adopt. "
-            "Be empowering and evidence-based."
-        ),
-    },
-    
-    "⚡ Creative & Practical": {
-        "elevator_pitch": (
-            "Based on the 'Mission' and 'Narrative' sections, create three variations "
-            "of an elevator pitch: 1) A 10-second casual version, 2) A 30-second professional version, "
-            "and 3) A Twitter/X bio version."
-        ),
-        "energy_audit": (
-            "You are an energy management consultant. Analyze the user's Telos and identify: "
-            "1) Energy vampires - activities/people draining them, "
-            "2) Energy amplifiers - what gives them life, "
-            "3) Misallocated energy - where they're spending energy that doesn't align with their mission. "
-            "Provide a weekly energy reallocation plan."
-        ),
-        "time_billionaire": (
-            "You are a time management philosopher. If the user had unlimited money but the same 24 hours, "
-            "how would they spend their time? Compare that to their current schedule. "
-            "What does the gap reveal about their priorities? Provide a 'time billionaire' weekly schedule "
-            "that aligns with their true values."
-        ),
-        "accountability_partner": (
-            "You are a no-BS accountability coach. Based on their Telos, create: "
-            "1) 3 specific, measurable commitments for the next 30 days, "
-            "2) The consequences if they don't follow through (what they'll lose), "
-            "3) A weekly check-in protocol. Be direct and action-oriented."
-        ),
-    },
-    
-    "🏛️ Philosophical": {
-        "meaning_maker": (
-            "You are Viktor Frankl, author of Man's Search for Meaning. Analyze the user's Telos through "
-            "the lens of logotherapy. What is their unique meaning and purpose? "
-            "Where are they experiencing existential vacuum? How can they find meaning even in their struggles? "
-            "Provide 3 meaning-centered practices."
-        ),
-        "memento_mori": (
-            "You are a death meditation guide. Remind the user that they will die, and no one knows when. "
-            "Given their mortality, what becomes urgent? What becomes trivial? "
-            "What would they do differently if they knew they had 1 year left? "
-            "Provide a 'death-aware' life strategy. Be sobering but motivating."
-        ),
-    },
-}
-
-# Flatten patterns for backward compatibility
-PATTERNS = {}
-for category_patterns in PATTERN_CATEGORIES.values():
-    PATTERNS.update(category_patterns)
+from telos_os.config import MAX_CONCURRENCY, MODEL_NAME, MULTI_USER, TENANT_HEADER, VERSIONS_PER_PAGE
+from telos_os.analytics import analyze_goal_progress, get_analytics_data
+from telos_os.assistant import get_ai_writing_assistance
+from telos_os.client import configure_gemini, get_scheduler, get_token_counter, get_usage_meter
+from telos_os.gemini import (
+    ErrorResponse,
+    get_context_cache,
+    get_gemini_response,
+    get_response_cache,
+    patterns_per_batch,
+    run_patterns_batched,
+    run_patterns_concurrently,
+    stream_gemini_response,
+)
+from telos_os.documents import DocumentCache, TelosDocument
+from telos_os.jobs import get_job_queue
+from telos_os.metrics import calls_by_route, get_metrics_store, latency_by_name, slowest, to_otlp, tokens_by_day
+from telos_os.parsing import find_markdown_files
+from telos_os.patterns import PATTERN_CATEGORIES, PATTERNS
+from telos_os.search import get_search_index, semantic_search_telos
+from telos_os.storage import (
+    delete_output,
+    get_all_outputs,
+    get_output_counts,
+    get_output_page,
+    get_output_sources,
+    open_output,
+    read_output,
+    save_output,
+    share_output,
+)
+from telos_os.tenants import get_tenant, set_tenant, tenant_for_user
+
+
+def session_tenant():
+    """Make this session's tenant current and return it.
+
+    In multi-user mode the tenant is the signed-in user: the TENANT_HEADER set by an
+    authenticating proxy, or Streamlit's own sign-in (``[auth]`` in secrets.toml).
+    Sessions without a user stop here.
+    """
+    if not MULTI_USER:
+        return get_tenant()
+    if TENANT_HEADER:
+        user = st.context.headers.get(TENANT_HEADER)
+        if not user:
+            st.error(f"🔐 Not signed in: the `{TENANT_HEADER}` header is missing. Open the app through the sign-in proxy.")
+            st.stop()
+    else:
+        if not st.user.get("is_logged_in"):
+            st.info("🔐 Sign in to open your Telos workspace.")
+            st.button("Sign in", on_click=st.login, type="primary")
+            st.stop()
+        user = st.user.get("email") or st.user.get("sub")
+    tenant = tenant_for_user(user)
+    set_tenant(tenant)
+    Path(tenant.telos_folder).mkdir(parents=True, exist_ok=True)
+    return tenant
 
 
 def setup_gemini():
     """Configure Gemini API."""
-    if not API_KEY:
-        st.error("GEMINI_API_KEY not found. Please set it in your .env file.")
-        st.stop()
-    genai.configure(api_key=API_KEY)
-
-
-def find_markdown_files(folder: str) -> list[str]:
-    """Scan folder for markdown files."""
-    if not os.path.exists(folder):
-        return []
-    
-    md_files = []
-    for file in os.listdir(folder):
-        if file.endswith(('.md', '.markdown')):
-            md_files.append(os.path.join(folder, file))
-    
-    return sorted(md_files)
-
-
-def load_file(filepath: str) -> str:
-    """Load file content."""
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        st.error(f"File '{filepath}' not found.")
-        return ""
+        configure_gemini()
+    except RuntimeError as e:
+        st.error(str(e))
+        st.stop()
 
 
 @st.cache_resource
-def get_model():
-    """Get cached Gemini model instance."""
-    return genai.GenerativeModel(MODEL_NAME)
+def get_document_cache():
+    """Get the shared parsed-document cache (calibrated token estimates for MODEL_NAME).
 
+    Estimates only: showing a file must not cost a model request before anything is run.
+    """
+    return DocumentCache(count_tokens=get_token_counter().estimate)
 
-def safe_extract_text(response) -> str:
-    """Safely extract text from Gemini response with multiple fallback methods."""
-    try:
-        return response.text
-    except Exception as e:
-        # If .text fails, inspect the candidates.
-        if hasattr(response, "candidates") and response.candidates:
-            candidate = response.candidates[0]
-            
-            # If there's content in parts, return it, even if truncated.
-            if candidate.content and candidate.content.parts:
-                text = "".join(part.text for part in candidate.content.parts if hasattr(part, "text"))
-                if text:  # If we got some text
-                    if candidate.finish_reason == 2 or candidate.finish_reason == 'MAX_TOKENS':
-                        return text + "\n\n✂️ **Response truncated due to maximum token limit.**\n\n💡 *Tip: Try using a shorter Telos file or run a more focused analysis pattern.*"
-                    return text
-
-            # If no content, explain why based on finish_reason
-            finish_reason = candidate.finish_reason
-            if finish_reason == 2 or finish_reason == 'MAX_TOKENS':
-                return "⚠️ **Response Truncated**\n\nThe response was cut off because it reached the maximum token limit and returned no content.\n\n**Possible solutions:**\n- Your Telos file might be too long. Try splitting it into smaller sections.\n- The analysis pattern generated too much output. Try a different pattern.\n- Consider using a model with higher token limits (e.g., gemini-1.5-pro)."
-            if finish_reason == 3 or finish_reason == 'SAFETY':
-                return "� ️ **Safety Filter Triggered**\n\nThe AI declined to respond due to safety settings. Try rephrasing your content."
-            if finish_reason == 4 or finish_reason == 'RECITATION':
-                return "📋 **Recitation Blocked**\n\nThe response was blocked for potential recitation of copyrighted material."
-            if finish_reason == 5 or finish_reason == 'OTHER':
-                return f"⚠️ **Unknown Error**\n\nFinish reason: {finish_reason}\n\nTry running the analysis again or use a different pattern."
-
-        # If we still can't figure it out, show a generic error
-        return f"⚠️ **Could not extract text from response**\n\nError: {str(e)}\n\nFinish reason: {getattr(response.candidates[0], 'finish_reason', 'unknown') if hasattr(response, 'candidates') and response.candidates else 'no candidates'}\n\nTry using a shorter Telos file or a different model."
-
-
-def split_telos_by_sections(content: str) -> list:
-    """Split Telos content by ## sections for processing large files."""
-    sections = []
-    current_section = ""
-    current_header = ""
-    
-    for line in content.split('\n'):
-        if line.startswith('## '):
-            # Save previous section
-            if current_section:
-                sections.append({
-                    'header': current_header,
-                    'content': current_section.strip()
-                })
-            # Start new section
-            current_header = line
-            current_section = line + '\n'
-        else:
-            current_section += line + '\n'
-    
-    # Add last section
-    if current_section:
-        sections.append({
-            'header': current_header,
-            'content': current_section.strip()
-        })
-    
-    return sections
-
-
-def estimate_tokens(text: str) -> int:
-    """Rough estimate of tokens (1 token ≈ 4 characters)."""
-    return len(text) // 4
 
+@st.cache_data(max_entries=64, show_spinner=False)
+def _load_document(filepath: str, mtime: float, size: int) -> TelosDocument:
+    """Parse a Telos file; mtime and size make edited files a cache miss."""
+    return get_document_cache().load(filepath)
 
-def get_gemini_response(prompt: str, context: str) -> str:
-    """Get response from Gemini with robust error handling and automatic splitting for large files."""
-    print("🚨 DEBUG: get_gemini_response() called - AI API call happening!")
-    
-    # Check if context is too large (rough estimate: 30K tokens = 120K chars for input)
-    estimated_tokens = estimate_tokens(context)
-    max_input_tokens = 30000  # Conservative limit for gemini-1.5-pro
-    
-    if estimated_tokens > max_input_tokens:
-        # Split by sections and analyze separately
-        st.info(f"📊 Large file detected (~{estimated_tokens:,} tokens). Splitting into sections for analysis...")
-        sections = split_telos_by_sections(context)
-        
-        results = []
-        for i, section in enumerate(sections, 1):
-            st.caption(f"Analyzing section {i}/{len(sections)}: {section['header']}")
-            
-            section_prompt = f"""
-{prompt}
-
-**Note:** This is section {i} of {len(sections)} from a larger Telos document.
 
---- SECTION CONTENT ---
-{section['content']}
-"""
-            try:
-                model = get_model()
-                response = model.generate_content(
-                    section_prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.7,
-                        max_output_tokens=4096,
-                        candidate_count=1,
-                    ),
-                    safety_settings=[
-                        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-                    ]
-                )
-                results.append(f"### {section['header']}\n\n{safe_extract_text(response)}")
-            except Exception as e:
-                results.append(f"### {section['header']}\n\n❌ Error: {str(e)}")
-        
-        # Combine results
-        combined = "# Analysis Results (Processed in Sections)\n\n" + "\n\n---\n\n".join(results)
-        return combined
-    
-    # Normal processing for smaller files
+def get_document(filepath: str):
+    """Load a parsed Telos document without re-reading or re-parsing unchanged files."""
     try:
-        model = get_model()
-        
-        full_prompt = f"""
-{prompt}
-
---- USER CONTEXT (TELOS FILE) ---
-{context}
-"""
-        
-        response = model.generate_content(
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-                max_output_tokens=8192,
-                candidate_count=1,
-            ),
-            safety_settings=[
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-            ]
-        )
-        
-        return safe_extract_text(response)
-    
-    except Exception as e:
-        error_msg = str(e)
-        
-        # Provide helpful error messages
-        if "API_KEY" in error_msg or "authentication" in error_msg.lower():
-            return "❌ **Authentication Error**\n\nYour API key may be invalid or expired. Check your `.env` file."
-        elif "quota" in error_msg.lower() or "rate" in error_msg.lower():
-            return "⏸️ **Rate Limit Reached**\n\nYou've hit the API rate limit. Wait a moment and try again."
-        elif "safety" in error_msg.lower():
-            return "🛡️ **Safety Filter Triggered**\n\nThe AI declined to respond due to safety settings. Try rephrasing your Telos content."
-        else:
-            return f"❌ **Error**\n\n{error_msg}\n\nIf this persists, check your internet connection and API key."
-
-
-def save_output(pattern: str, source_file: str, output: str) -> str:
-    """Save output to file."""
-    output_dir = "outputs"
-    pattern_dir = os.path.join(output_dir, pattern)
-    Path(pattern_dir).mkdir(parents=True, exist_ok=True)
-    
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    source_name = os.path.splitext(os.path.basename(source_file))[0]
-    filename = f"{source_name}_{timestamp}.md"
-    filepath = os.path.join(pattern_dir, filename)
-    
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(f"# {pattern.replace('_', ' ').title()} Analysis\n\n")
-        f.write(f"**Source File:** {os.path.basename(source_file)}\n")
-        f.write(f"**Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"**Pattern:** {pattern}\n\n")
-        f.write("---\n\n")
-        f.write(output)
-    
-    return filepath
-
-
-def get_all_outputs():
-    """Get all output files organized by pattern and source file."""
-    output_dir = "outputs"
-    if not os.path.exists(output_dir):
-        return {}
-    
-    outputs = {}
-    
-    for pattern_folder in os.listdir(output_dir):
-        pattern_path = os.path.join(output_dir, pattern_folder)
-        if not os.path.isdir(pattern_path):
-            continue
-        
-        for filename in os.listdir(pattern_path):
-            if not filename.endswith('.md'):
-                continue
-            
-            filepath = os.path.join(pattern_path, filename)
-            
-            # Parse filename: source_YYYY-MM-DD_HH-MM-SS.md
-            # Example: test_2025-12-05_00-57-59.md
-            try:
-                # Remove .md extension first
-                name_without_ext = filename.replace('.md', '')
-                
-                # Split by underscore to separate source from timestamp
-                # Format: source_YYYY-MM-DD_HH-MM-SS
-                parts = name_without_ext.split('_')
-                
-                if len(parts) >= 3:
-                    # First part is source name
-                    source_name = parts[0]
-                    # Remaining parts are date and time
-                    date_part = parts[1]  # YYYY-MM-DD
-                    time_part = parts[2]  # HH-MM-SS
-                    timestamp = datetime.strptime(f"{date_part}_{time_part}", "%Y-%m-%d_%H-%M-%S")
-                else:
-                    source_name = name_without_ext
-                    timestamp = datetime.fromtimestamp(os.path.getmtime(filepath))
-            except Exception as e:
-                # Fallback: use whole filename as source
-                source_name = filename.replace('.md', '')
-                timestamp = datetime.fromtimestamp(os.path.getmtime(filepath))
-            
-            # Organize by source file
-            if source_name not in outputs:
-                outputs[source_name] = {}
-            
-            if pattern_folder not in outputs[source_name]:
-                outputs[source_name][pattern_folder] = []
-            
-            outputs[source_name][pattern_folder].append({
-                'filepath': filepath,
-                'filename': filename,
-                'timestamp': timestamp,
-                'pattern': pattern_folder
-            })
-    
-    # Sort by timestamp (newest first)
-    for source in outputs.values():
-        for pattern in source.values():
-            pattern.sort(key=lambda x: x['timestamp'], reverse=True)
-    
-    return outputs
+        stat = os.stat(filepath)
+        return _load_document(filepath, stat.st_mtime, stat.st_size)
+    except FileNotFoundError:
+        st.error(f"File '{filepath}' not found.")
+        return None
 
 
 def format_relative_time(timestamp):
@@ -458,243 +122,51 @@ def format_relative_time(timestamp):
         return timestamp.strftime("%b %d, %Y")
 
 
-def semantic_search_telos(query: str, telos_files: list) -> list:
-    """Perform semantic search across all Telos files using AI."""
-    try:
-        model = get_model()
-        
-        # Combine all Telos content
-        all_content = []
-        for filepath in telos_files:
-            content = load_file(filepath)
-            if content:
-                all_content.append({
-                    'file': os.path.basename(filepath),
-                    'content': content
-                })
-        
-        if not all_content:
-            return []
-        
-        # Create search prompt
-        files_text = "\n\n---\n\n".join([
-            f"FILE: {item['file']}\n{item['content']}" 
-            for item in all_content
-        ])
-        
-        prompt = f"""You are a semantic search engine for personal Telos files.
-
-USER QUERY: "{query}"
-
-TELOS FILES:
-{files_text}
-
-Find and return the most relevant sections from these files that answer the query.
-Format your response as JSON with this structure:
-{{
-    "results": [
-        {{
-            "file": "filename.md",
-            "relevance": "high/medium/low",
-            "excerpt": "relevant text excerpt",
-            "context": "why this is relevant"
-        }}
-    ]
-}}
-
-Return only the JSON, no other text."""
-        
-        response = model.generate_content(prompt)
-        result_text = safe_extract_text(response)
-        
-        # Try to parse JSON
-        try:
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-            if json_match:
-                results = json.loads(json_match.group())
-                return results.get('results', [])
-        except Exception:
-            pass
-        
-        # Fallback: return formatted text
-        return [{'file': 'All Files', 'relevance': 'medium', 'excerpt': result_text, 'context': 'Search results'}]
-    
-    except Exception as e:
-        return [{'file': 'Error', 'relevance': 'low', 'excerpt': str(e), 'context': 'Search failed'}]
-
-
-def extract_goals_from_telos(content: str) -> list:
-    """Extract goals from Telos content using pattern matching and AI."""
-    goals = []
-    
-    # Pattern 1: Look for Goals section
-    goals_section = re.search(r'##\s*Goals\s*\n(.*?)(?=\n##|\Z)', content, re.DOTALL | re.IGNORECASE)
-    if goals_section:
-        goal_text = goals_section.group(1)
-        # Extract bullet points
-        bullet_goals = re.findall(r'[-*]\s+(.+)', goal_text)
-        goals.extend(bullet_goals)
-    
-    # Pattern 2: Look for numbered goals
-    numbered_goals = re.findall(r'\d+\.\s+(.+)', content)
-    goals.extend(numbered_goals)
-    
-    return list(set(goals))  # Remove duplicates
-
-
-def analyze_goal_progress(telos_file: str, outputs: dict) -> dict:
-    """Analyze goal progress by comparing Telos file with analysis outputs."""
-    content = load_file(telos_file)
-    goals = extract_goals_from_telos(content)
-    
-    # Get all analyses for this file
-    source_name = os.path.splitext(os.path.basename(telos_file))[0]
-    file_outputs = outputs.get(source_name, {})
-    
-    # Count analyses
-    total_analyses = sum(len(analyses) for analyses in file_outputs.values())
-    
-    # Get latest analysis dates
-    latest_dates = []
-    for pattern_analyses in file_outputs.values():
-        if pattern_analyses:
-            latest_dates.append(pattern_analyses[0]['timestamp'])
-    
-    last_analysis = max(latest_dates) if latest_dates else None
-    
-    return {
-        'goals_count': len(goals),
-        'goals': goals[:10],  # First 10 goals
-        'total_analyses': total_analyses,
-        'last_analysis': last_analysis,
-        'patterns_used': list(file_outputs.keys())
-    }
-
-
-def get_analytics_data():
-    """Generate analytics data from all Telos files and outputs."""
-    outputs = get_all_outputs()
-    telos_files = find_markdown_files(TELOS_FOLDER)
-    
-    # Overall stats
-    total_files = len(telos_files)
-    total_analyses = sum(
-        len(analyses) 
-        for source in outputs.values() 
-        for analyses in source.values()
-    )
-    
-    # Pattern usage
-    pattern_usage = Counter()
-    for source in outputs.values():
-        for pattern, analyses in source.items():
-            pattern_usage[pattern] += len(analyses)
-    
-    # Timeline data
-    timeline = defaultdict(int)
-    for source in outputs.values():
-        for analyses in source.values():
-            for analysis in analyses:
-                date_key = analysis['timestamp'].strftime('%Y-%m-%d')
-                timeline[date_key] += 1
-    
-    # Recent activity
-    recent_analyses = []
-    for source_name, source in outputs.items():
-        for pattern, analyses in source.items():
-            for analysis in analyses[:3]:  # Last 3 per pattern
-                recent_analyses.append({
-                    'source': source_name,
-                    'pattern': pattern,
-                    'timestamp': analysis['timestamp']
-                })
-    
-    recent_analyses.sort(key=lambda x: x['timestamp'], reverse=True)
-    
-    return {
-        'total_files': total_files,
-        'total_analyses': total_analyses,
-        'pattern_usage': dict(pattern_usage.most_common(10)),
-        'timeline': dict(sorted(timeline.items())),
-        'recent_activity': recent_analyses[:10]
-    }
-
-
-def get_ai_writing_assistance(section: str, current_content: str, full_context: str) -> str:
-    """Get AI assistance for writing a specific section."""
-    prompts = {
-        "mission": (
-            "You are a life purpose coach. Based on the user's current Telos draft, "
-            "help them articulate their core mission and purpose. Ask probing questions "
-            "or provide 3-5 concrete mission statement examples that align with what they've written. "
-            "Be inspiring but grounded."
-        ),
-        "goals": (
-            "You are a goal-setting expert. Review the user's Telos and help them create "
-            "SMART goals (Specific, Measurable, Achievable, Relevant, Time-bound). "
-            "Suggest 3-5 concrete short-term and long-term goals based on their mission and current status."
-        ),
-        "challenges": (
-            "You are a strategic problem-solver. Based on the user's Telos, help them identify "
-            "and articulate their key challenges and obstacles. Ask clarifying questions or "
-            "suggest common challenges they might be facing but haven't named yet."
-        ),
-        "strengths": (
-            "You are a strengths-based coach. Help the user identify and articulate their "
-            "key strengths, skills, and resources. Based on their Telos, suggest strengths "
-            "they might be overlooking or undervaluing."
-        ),
-        "expand": (
-            "You are a thoughtful writing coach. The user is working on their Telos. "
-            "Provide 3-5 thought-provoking questions or prompts to help them expand and deepen "
-            "what they've written. Be specific to their content."
-        ),
-        "improve": (
-            "You are an editor and life coach. Review the user's Telos draft and provide "
-            "constructive feedback on: 1) Clarity - is it clear and specific? "
-            "2) Alignment - do the sections support each other? "
-            "3) Actionability - are there concrete next steps? "
-            "Provide 3-5 specific suggestions for improvement."
-        ),
-        "analyze_expand": (
-            "You are a Telos expert. Analyze the user's current Telos document and provide: "
-            "1) What's working well (2-3 strengths), "
-            "2) What's missing or underdeveloped (2-3 gaps), "
-            "3) Specific suggestions to expand and deepen each section, "
-            "4) How to better connect Problems → Mission → Goals → Challenges. "
-            "Be specific and actionable. Reference their actual content."
-        ),
-        "connect": (
-            "You are a systems thinker. Analyze how the user's Problems, Mission, Goals, and Challenges "
-            "connect to each other. Show the logical flow: which goals address which problems? "
-            "Which challenges block which goals? Are there gaps in the chain? "
-            "Provide a clear map of connections and suggest missing links."
-        ),
-    }
-    
-    prompt = prompts.get(section, prompts["expand"])
-    
-    try:
-        model = get_model()
-        
-        full_prompt = f"""
-{prompt}
-
---- USER'S TELOS DOCUMENT ---
-{full_context if full_context else "[User is just starting their Telos]"}
-
-Provide helpful, actionable guidance. Be concise but insightful. Use markdown formatting.
-"""
-        
-        response = model.generate_content(full_prompt)
-        return safe_extract_text(response)
-    
-    except Exception as e:
-        return f"❌ Error getting AI assistance: {str(e)}"
+@st.fragment(run_every=2)
+def show_background_runs():
+    """Show progress of this session's background runs, polling the job queue every 2 seconds."""
+    queue = get_job_queue()
+    if "background_runs" not in st.session_state:
+        # New session (e.g. after a browser refresh): pick up this user's runs that are still going
+        st.session_state.background_runs = [
+            {"sweep": sweep["sweep"], "label": os.path.basename(sweep["filepath"]), "job_ids": sweep["job_ids"]}
+            for sweep in queue.active_sweeps(session_tenant().id)
+        ]
+    runs = st.session_state.background_runs
+    if not runs:
+        return
+    
+    st.markdown("### 🧵 Background Runs")
+    for run in reversed(runs):
+        counts = queue.progress(run['job_ids'])
+        total = len(run['job_ids'])
+        active = counts['queued'] + counts['running']
+        with st.container(border=True):
+            st.markdown(f"**{run['label']}**")
+            st.progress((total - active) / total if total else 1.0)
+            st.caption(
+                f"✅ {counts['done']} done · ⏳ {counts['running']} running · 🕒 {counts['queued']} queued"
+                f" · ❌ {counts['failed']} failed · 🚫 {counts['cancelled']} cancelled"
+            )
+            if active:
+                if st.button("🚫 Cancel", key=f"cancel_{run['sweep']}"):
+                    queue.cancel(run['job_ids'])
+                    st.rerun(scope="fragment")
+            else:
+                with st.expander("Results", expanded=False):
+                    for job in queue.jobs(run['job_ids']):
+                        title = job['pattern'].replace('_', ' ').title()
+                        if job['output_path']:
+                            st.caption(f"✓ {title}: `{os.path.basename(job['output_path'])}`")
+                        else:
+                            st.caption(f"⚠️ {title}: {job['error'] or job['status']}")
+                if st.button("✖️ Dismiss", key=f"dismiss_{run['sweep']}"):
+                    runs.remove(run)
+                    st.rerun(scope="fragment")
 
 
 # Streamlit UI
+page_started = time.perf_counter()
 st.set_page_config(
     page_title="Gemini Fabric - Telos Analyzer",
     page_icon="🧠",
@@ -705,20 +177,45 @@ st.title("🧠 Gemini Fabric - Telos OS")
 st.markdown("*Your Personal Operating System for Life - 20+ AI Personas*")
 
 # Setup
+tenant = session_tenant()
 setup_gemini()
 
 # Sidebar
 with st.sidebar:
     st.header("⚙️ Configuration")
     st.info(f"**Model:** {MODEL_NAME}")
-    st.info(f"**Folder:** {TELOS_FOLDER}")
+    st.info(f"**Folder:** {tenant.telos_folder}")
+    if MULTI_USER:
+        quota = get_usage_meter().quota(tenant.id)
+        used = get_usage_meter().today(tenant.id)
+        st.caption(
+            f"👤 {tenant.id} · today: {used['calls']}{f' / {quota.calls}' if quota.calls else ''} calls, "
+            f"{used['input_tokens'] + used['output_tokens']:,}{f' / {quota.tokens:,}' if quota.tokens else ''} tokens"
+        )
+        if not TENANT_HEADER:
+            st.button("Sign out", on_click=st.logout)
+    
+    force_refresh = st.toggle(
+        "🔄 Force refresh",
+        help="Skip the response cache and always call the API. Fresh answers still update the cache."
+    )
+    with st.expander("💾 Response Cache", expanded=False):
+        cache_stats = get_response_cache().stats()
+        col_hits, col_misses = st.columns(2)
+        col_hits.metric("Hits", cache_stats['hits'])
+        col_misses.metric("Misses", cache_stats['misses'])
+        st.caption(f"{cache_stats['entries']} cached responses ({cache_stats['bytes'] / 1024:.0f} KB)")
+        # The cache is shared by every user of a multi-user deployment
+        if not MULTI_USER and st.button("🧹 Clear Cache", use_container_width=True):
+            removed = get_response_cache().clear()
+            st.success(f"Removed {removed} cached responses")
     
     st.markdown("---")
     
     # Tab selection
     tab_mode = st.radio(
         "Mode:", 
-        ["📊 Analyze", "✍️ Create New File", "📚 View Outputs", "🔍 Search", "📈 Analytics", "🎯 Goal Tracker"],
+        ["📊 Analyze", "✍️ Create New File", "📚 View Outputs", "🔍 Search", "📈 Analytics", "🎯 Goal Tracker", "⚙️ Performance"],
         label_visibility="collapsed"
     )
     
@@ -726,10 +223,10 @@ with st.sidebar:
     
     if tab_mode == "📊 Analyze":
         # Find files
-        md_files = find_markdown_files(TELOS_FOLDER)
+        md_files = find_markdown_files(tenant.telos_folder)
         
         if not md_files:
-            st.warning(f"No markdown files found in '{TELOS_FOLDER}' folder.")
+            st.warning(f"No markdown files found in '{tenant.telos_folder}' folder.")
             st.info("Switch to 'Create New File' mode to create your first Telos file.")
             st.stop()
         
@@ -765,17 +262,43 @@ with st.sidebar:
         
         st.markdown("---")
         
+        stream_output = st.toggle(
+            "⚡ Stream response",
+            value=True,
+            help="Show the analysis as it is written instead of waiting for the full response (single pattern runs)"
+        )
+        
+        run_in_background = st.toggle(
+            "🧵 Run in background",
+            help="Queue the analysis instead of waiting for it. It keeps running if you switch modes or refresh the page; results are saved to outputs/ as usual."
+        )
+        
         # Batch mode
         run_all = st.checkbox("🔥 Run ALL patterns", help="Run all patterns on the selected file")
+        concurrency = MAX_CONCURRENCY
+        batch_patterns = False
+        if run_all:
+            concurrency = st.slider(
+                "⚡ Parallel requests",
+                min_value=1,
+                max_value=10,
+                value=min(max(MAX_CONCURRENCY, 1), 10),
+                help="How many patterns are sent to Gemini at the same time. Lower this if you hit rate limits."
+            )
+            batch_patterns = st.checkbox(
+                "📦 Batch patterns",
+                help=f"Ask for up to {patterns_per_batch()} patterns per request. Far fewer calls for short files; "
+                     "answers are a little less independent. Patterns a batch misses are re-run on their own."
+            )
         
         # Run button
         run_button = st.button("▶️ Run Analysis", type="primary", use_container_width=True)
         
         st.markdown("---")
         
-        # Quick actions
-        if st.button("📁 Open Outputs Folder", use_container_width=True):
-            output_path = os.path.abspath("outputs")
+        # Quick actions (the folder is on the server in multi-user mode)
+        if not MULTI_USER and st.button("📁 Open Outputs Folder", use_container_width=True):
+            output_path = os.path.abspath(tenant.output_dir)
             if os.path.exists(output_path):
                 try:
                     import platform
@@ -810,14 +333,14 @@ with st.sidebar:
         # View Outputs mode
         st.subheader("📚 View Outputs")
         
-        outputs = get_all_outputs()
+        source_files = get_output_sources()
+        output_counts = {}
         
-        if not outputs:
+        if not source_files:
             st.warning("No outputs found yet.")
             st.info("Run some analyses first!")
         else:
             # Source file selector with cleaner display
-            source_files = list(outputs.keys())
             
             # Create display names (remove timestamps if present)
             display_names = []
@@ -832,6 +355,7 @@ with st.sidebar:
             
             selected_display = st.selectbox("📄 Select Telos file:", display_names)
             selected_source = source_files[display_names.index(selected_display)]
+            output_counts = get_output_counts(selected_source)
             
             st.markdown("---")
             
@@ -839,7 +363,7 @@ with st.sidebar:
             st.subheader("🎯 Filter by Category")
             
             # Get available categories for this source
-            available_patterns = list(outputs[selected_source].keys())
+            available_patterns = list(output_counts.keys())
             available_categories = []
             for category, category_patterns in PATTERN_CATEGORIES.items():
                 if any(p in available_patterns for p in category_patterns.keys()):
@@ -864,7 +388,7 @@ with st.sidebar:
             
             # Stats
             if pattern_filter:
-                total_analyses = sum(len(outputs[selected_source][p]) for p in pattern_filter)
+                total_analyses = sum(output_counts[p] for p in pattern_filter)
                 st.metric("📊 Total Analyses", total_analyses)
                 st.caption(f"Across {len(pattern_filter)} patterns")
         
@@ -980,14 +504,14 @@ Daily reflections, thoughts, and observations. Use DD/MM/YYYY format.
                 st.error("Please enter some content.")
             else:
                 # Ensure telos folder exists
-                Path(TELOS_FOLDER).mkdir(parents=True, exist_ok=True)
+                Path(tenant.telos_folder).mkdir(parents=True, exist_ok=True)
                 
                 # Create filename
                 safe_filename = new_filename.strip().replace(" ", "-")
                 if not safe_filename.endswith(".md"):
                     safe_filename += ".md"
                 
-                filepath = os.path.join(TELOS_FOLDER, safe_filename)
+                filepath = os.path.join(tenant.telos_folder, safe_filename)
                 
                 # Check if file exists
                 if os.path.exists(filepath):
@@ -1086,62 +610,131 @@ elif tab_mode == "📊 Analyze":
 
     with col1:
         st.subheader("📝 Source Content")
-        context_content = load_file(selected_file)
+        document = get_document(selected_file)
+        context_content = document.text if document else ""
         
         if context_content:
             with st.expander("View file content", expanded=False):
                 st.text_area("File content", context_content, height=400, disabled=True, label_visibility="collapsed")
-            st.caption(f"File: {selected_file_name} ({len(context_content)} characters)")
+            st.caption(f"File: {selected_file_name} ({len(context_content)} characters, ~{document.tokens:,} tokens)")
 
     with col2:
         st.subheader("🤖 AI Analysis")
     
         if run_button:
-            if run_all:
+            if run_in_background:
+                # Hand the work to the job queue; progress is polled below
+                patterns = list(PATTERNS) if run_all else [selected_pattern]
+                sweep = uuid.uuid4().hex
+                job_ids = get_job_queue().submit_many(selected_file, patterns, context_content, sweep=sweep,
+                                                      use_cache=not force_refresh)
+                label = f"{selected_file_name}: {'all patterns' if run_all else selected_pattern.replace('_', ' ').title()}"
+                st.session_state.setdefault("background_runs", []).append(
+                    {"sweep": sweep, "label": label, "job_ids": job_ids}
+                )
+                st.success(f"🧵 Queued {len(job_ids)} analyses. You can keep working; results appear in 📚 View Outputs.")
+            elif run_all:
                 # Run all patterns with progress tracking
                 total_patterns = sum(len(patterns) for patterns in PATTERN_CATEGORIES.values())
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                st.info(f"Running {total_patterns} patterns... Grab a coffee ☕")
-                
-                completed = 0
+                st.info(f"Running {total_patterns} patterns ({concurrency} at a time)... Grab a coffee ☕")
                 
+                # Lay out every expander up front so results land in category order
+                placeholders = {}
                 for category, patterns in PATTERN_CATEGORIES.items():
                     st.markdown(f"### {category}")
                     for pattern in patterns.keys():
-                        status_text.text(f"Processing: {pattern.replace('_', ' ').title()} ({completed + 1}/{total_patterns})")
-                        
                         with st.expander(f"📊 {pattern.replace('_', ' ').title()}", expanded=False):
-                            output = get_gemini_response(PATTERNS[pattern], context_content)
-                            st.markdown(output)
-                            
-                            # Save output
-                            filepath = save_output(pattern, selected_file, output)
-                            st.caption(f"✓ Saved to: `{os.path.basename(filepath)}`")
+                            placeholders[pattern] = st.empty()
+                            placeholders[pattern].caption("⏳ Waiting...")
+                
+                completed = 0
+                failed = 0
+                context_stats_before = get_context_cache().stats()
+                status_text.text(f"Processing {total_patterns} patterns...")
+                
+                run_patterns = run_patterns_batched if batch_patterns else run_patterns_concurrently
+                for pattern, output in run_patterns(
+                    list(placeholders.keys()), context_content, concurrency, use_cache=not force_refresh
+                ):
+                    with placeholders[pattern].container():
+                        st.markdown(output)
                         
-                        completed += 1
-                        progress_bar.progress(completed / total_patterns)
+                        # Save output (errors are shown but not saved)
+                        filepath = save_output(pattern, selected_file, output)
+                        if filepath:
+                            st.caption(f"✓ Saved to: `{os.path.basename(filepath)}`")
+                        else:
+                            failed += 1
+                            st.caption("⚠️ Not saved - the analysis failed")
+                    
+                    completed += 1
+                    progress_bar.progress(completed / total_patterns)
+                    status_text.text(f"Finished: {pattern.replace('_', ' ').title()} ({completed}/{total_patterns})")
                 
                 progress_bar.empty()
                 status_text.empty()
-                st.balloons()
-                st.success(f"🎉 All {total_patterns} patterns completed! Check the `outputs/` folder.")
+                if failed:
+                    st.warning(f"{total_patterns - failed} of {total_patterns} patterns completed; {failed} failed and were not saved.")
+                else:
+                    st.balloons()
+                    st.success(f"🎉 All {total_patterns} patterns completed! Check the `outputs/` folder.")
+                
+                context_stats = get_context_cache().stats()
+                tokens_saved = context_stats['tokens_saved'] - context_stats_before['tokens_saved']
+                if tokens_saved:
+                    reused = context_stats['uses'] - context_stats_before['uses']
+                    st.caption(f"💾 Context cache: ~{tokens_saved:,} input tokens not resent across {reused} calls")
             
             else:
                 # Run single pattern
                 pattern_title = selected_pattern.replace('_', ' ').title()
-                with st.spinner(f"Analyzing with {pattern_title}..."):
-                    output = get_gemini_response(PATTERNS[selected_pattern], context_content)
-                    st.markdown(output)
-                    
-                    # Save output
-                    filepath = save_output(selected_pattern, selected_file, output)
+                if stream_output:
+                    # Render and save chunks as they arrive; the file is only created
+                    # once real content shows up, and a stream that fails partway is
+                    # deleted again, so a failed call leaves nothing behind
+                    placeholder = st.empty()
+                    placeholder.caption(f"⏳ Analyzing with {pattern_title}...")
+                    output = ""
+                    filepath = None
+                    with ExitStack() as stack:
+                        f = None
+                        for chunk in stream_gemini_response(
+                            PATTERNS[selected_pattern], context_content, progress_callback=st.caption, use_cache=not force_refresh
+                        ):
+                            if f is None and not isinstance(chunk, ErrorResponse):
+                                f = stack.enter_context(open_output(selected_pattern, selected_file))
+                            output += chunk
+                            if f is not None:
+                                f.write(chunk)
+                                f.flush()
+                            placeholder.markdown(output + " ▌")
+                    if f is not None:
+                        filepath = f.name  # Final once the output is closed
+                    placeholder.markdown(output)
+                    if filepath and isinstance(chunk, ErrorResponse):
+                        delete_output(filepath)
+                        filepath = None
+                    elif filepath:
+                        # Another session may have saved this same analysis while we streamed it
+                        filepath = share_output(filepath, selected_pattern, selected_file, output)
+                else:
+                    with st.spinner(f"Analyzing with {pattern_title}..."):
+                        output = get_gemini_response(
+                            PATTERNS[selected_pattern], context_content, progress_callback=st.caption, use_cache=not force_refresh
+                        )
+                        st.markdown(output)
+                        
+                        # Save output (errors are shown but not saved)
+                        filepath = save_output(selected_pattern, selected_file, output)
+                
+                if filepath:
                     st.success(f"✓ Saved to: `{filepath}`")
                     
                     # Download button with full saved content
-                    with open(filepath, "r", encoding="utf-8") as f:
-                        saved_output = f.read()
+                    saved_output = read_output(filepath)
                     
                     st.download_button(
                         label="📥 Download Result",
@@ -1149,14 +742,16 @@ elif tab_mode == "📊 Analyze":
                         file_name=os.path.basename(filepath),
                         mime="text/markdown"
                     )
+                else:
+                    st.warning("Nothing was saved because the analysis failed.")
         else:
             st.info("👈 Select a file and pattern, then click 'Run Analysis'")
+        
+        show_background_runs()
 
 elif tab_mode == "📚 View Outputs":
-    # View Outputs mode
-    outputs = get_all_outputs()
-    
-    if not outputs:
+    # View Outputs mode (version counts for the selected source were loaded in the sidebar)
+    if not output_counts:
         st.info("📭 No outputs yet. Run some analyses to see them here!")
     else:
         
@@ -1181,7 +776,7 @@ elif tab_mode == "📚 View Outputs":
         for category, category_patterns in PATTERN_CATEGORIES.items():
             patterns_in_this_category = []
             for pattern_key in category_patterns.keys():
-                if pattern_key in pattern_filter and pattern_key in outputs[selected_source]:
+                if pattern_key in pattern_filter and pattern_key in output_counts:
                     patterns_in_this_category.append(pattern_key)
             if patterns_in_this_category:
                 patterns_by_category[category] = patterns_in_this_category
@@ -1198,69 +793,83 @@ elif tab_mode == "📚 View Outputs":
             st.caption(f"{len(patterns_in_category)} analysis pattern{'s' if len(patterns_in_category) > 1 else ''} in this category")
             
             for pattern in patterns_in_category:
-                if pattern not in outputs[selected_source]:
-                    continue
-                
-                analyses = outputs[selected_source][pattern]
+                version_count = output_counts[pattern]
+                pattern_title = pattern.replace('_', ' ').title()
                 
-                with st.expander(f"🎭 {pattern.replace('_', ' ').title()} ({len(analyses)} version{'s' if len(analyses) > 1 else ''})", expanded=False):
-                    # Show version selector
-                    if len(analyses) > 1:
-                        version_options = [
-                            f"Version {i+1} - {format_relative_time(a['timestamp'])} ({a['timestamp'].strftime('%b %d, %I:%M %p')})"
-                            for i, a in enumerate(analyses)
-                        ]
-                        selected_version_idx = st.selectbox(
-                            "Select version:",
-                            range(len(version_options)),
-                            format_func=lambda i: version_options[i],
-                            key=f"version_{pattern}"
-                        )
-                    else:
-                        selected_version_idx = 0
+                # Only one page of index rows (with stored previews) is fetched per pattern;
+                # a file is read only when the user opens that version
+                with st.expander(f"🎭 {pattern_title} ({version_count} version{'s' if version_count > 1 else ''})", expanded=False):
+                    page_count = -(-version_count // VERSIONS_PER_PAGE)
+                    page = 0
+                    if page_count > 1:
+                        page = st.number_input(
+                            f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, key=f"page_{pattern}"
+                        ) - 1
+                    versions = get_output_page(selected_source, pattern, page, VERSIONS_PER_PAGE)
+                    opened_key = f"opened_{selected_source}_{pattern}"
+                    
+                    for offset, analysis in enumerate(versions):
+                        version_number = version_count - (page * VERSIONS_PER_PAGE + offset)
+                        col_info, col_open = st.columns([5, 1])
+                        with col_info:
+                            st.markdown(
+                                f"**Version {version_number}** · {format_relative_time(analysis['timestamp'])} "
+                                f"({analysis['timestamp'].strftime('%b %d, %I:%M %p')})"
+                            )
+                            if analysis['preview']:
+                                st.caption(analysis['preview'])
+                        with col_open:
+                            if st.button("📖 Open", key=f"open_{analysis['filepath']}"):
+                                st.session_state[opened_key] = analysis['filepath']
+                    
+                    opened = next((a for a in versions if a['filepath'] == st.session_state.get(opened_key)), None)
+                    if opened is None:
+                        continue
                     
-                    selected_analysis = analyses[selected_version_idx]
+                    st.markdown("---")
                     
                     # Display metadata with better context
                     st.markdown(f"**📄 Source Telos File:** `{selected_source}.md`")
-                    st.markdown(f"**🎭 Analysis Pattern:** `{pattern.replace('_', ' ').title()}`")
-                    st.markdown(f"**📅 Generated:** {selected_analysis['timestamp'].strftime('%Y-%m-%d at %I:%M %p')} ({format_relative_time(selected_analysis['timestamp'])})")
-                    st.markdown(f"**💾 File:** `{selected_analysis['filename']}`")
-                    
-                    if len(analyses) > 1:
-                        st.caption(f"📊 Showing version {selected_version_idx + 1} of {len(analyses)}")
+                    st.markdown(f"**🎭 Analysis Pattern:** `{pattern_title}`")
+                    st.markdown(f"**📅 Generated:** {opened['timestamp'].strftime('%Y-%m-%d at %I:%M %p')} ({format_relative_time(opened['timestamp'])})")
+                    st.markdown(f"**💾 File:** `{opened['filename']}`")
                     
                     st.markdown("---")
                     
                     # Load and display content
                     try:
-                        content = load_file(selected_analysis['filepath'])
+                        content = read_output(opened['filepath'])
                         
                         # Show content
                         st.markdown(content)
                         
                         # Action buttons
-                        col1, col2, col3 = st.columns(3)
+                        col1, col2, col3, col4 = st.columns(4)
                         with col1:
                             st.download_button(
                                 label="📥 Download",
                                 data=content,
-                                file_name=selected_analysis['filename'],
+                                file_name=opened['filename'],
                                 mime="text/markdown",
-                                key=f"download_{pattern}_{selected_version_idx}"
+                                key=f"download_{opened['filepath']}"
                             )
                         with col2:
-                            if st.button("📋 Copy to Clipboard", key=f"copy_{pattern}_{selected_version_idx}"):
+                            if st.button("📋 Copy to Clipboard", key=f"copy_{opened['filepath']}"):
                                 st.code(content, language="markdown")
                                 st.success("Content displayed above - copy from the code block")
                         with col3:
-                            if st.button("🗑️ Delete", key=f"delete_{pattern}_{selected_version_idx}"):
+                            if st.button("🗑️ Delete", key=f"delete_{opened['filepath']}"):
                                 try:
-                                    os.remove(selected_analysis['filepath'])
+                                    delete_output(opened['filepath'])
+                                    st.session_state.pop(opened_key, None)
                                     st.success("Deleted! Refresh to update.")
                                     st.rerun()
                                 except Exception as e:
                                     st.error(f"Error deleting: {e}")
+                        with col4:
+                            if st.button("✖️ Close", key=f"close_{opened['filepath']}"):
+                                st.session_state.pop(opened_key, None)
+                                st.rerun()
                     
                     except Exception as e:
                         st.error(f"Error loading file: {e}")
@@ -1271,8 +880,8 @@ elif tab_mode == "📚 View Outputs":
         
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("📁 Open Outputs Folder", use_container_width=True):
-                output_path = os.path.abspath("outputs")
+            if not MULTI_USER and st.button("📁 Open Outputs Folder", use_container_width=True):
+                output_path = os.path.abspath(tenant.output_dir)
                 try:
                     import platform
                     if platform.system() == "Windows":
@@ -1291,9 +900,9 @@ elif tab_mode == "📚 View Outputs":
                     # Actually delete
                     try:
                         deleted_count = 0
-                        for pattern in outputs[selected_source]:
-                            for analysis in outputs[selected_source][pattern]:
-                                os.remove(analysis['filepath'])
+                        for pattern_versions in get_all_outputs(source=selected_source).get(selected_source, {}).values():
+                            for version in pattern_versions:
+                                delete_output(version['filepath'])
                                 deleted_count += 1
                         st.success(f"Deleted {deleted_count} files!")
                         st.session_state.confirm_delete_all = False
@@ -1310,12 +919,12 @@ elif tab_mode == "🔍 Search":
     st.subheader("🔍 Semantic Search Across All Telos Files")
     st.markdown("Search for concepts, themes, or specific information across all your Telos files using AI-powered semantic search.")
     
-    telos_files = find_markdown_files(TELOS_FOLDER)
+    telos_files = find_markdown_files(tenant.telos_folder)
     
     if not telos_files:
         st.warning("No Telos files found. Create some files first!")
     else:
-        st.info(f"Searching across {len(telos_files)} Telos file(s)")
+        st.info(f"Searching across {len(telos_files)} Telos file(s) - only the best matching sections are sent to the AI")
         
         # Search input
         search_query = st.text_input(
@@ -1332,6 +941,9 @@ elif tab_mode == "🔍 Search":
         if search_button and search_query:
             with st.spinner("Searching with AI..."):
                 results = semantic_search_telos(search_query, telos_files)
+                embed_error = get_search_index().embed_error
+                if embed_error:
+                    st.caption(f"⚠️ Embedding search unavailable ({embed_error}); showing keyword matches")
                 
                 if results:
                     st.success(f"Found {len(results)} relevant result(s)")
@@ -1355,7 +967,18 @@ elif tab_mode == "📈 Analytics":
     st.subheader("📈 Analytics Dashboard")
     st.markdown("Visualize your Telos journey with insights and statistics.")
     
-    analytics = get_analytics_data()
+    # Date range filter
+    ranges = {"All time": None, "Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90, "Custom": None}
+    range_choice = st.radio("Date range:", list(ranges), horizontal=True, label_visibility="collapsed")
+    since, until = None, None
+    if range_choice == "Custom":
+        picked = st.date_input("Date range:", value=(date.today() - timedelta(days=30), date.today()))
+        if isinstance(picked, (tuple, list)) and len(picked) == 2:
+            since, until = picked
+    elif ranges[range_choice]:
+        since, until = date.today() - timedelta(days=ranges[range_choice] - 1), date.today()
+    
+    analytics = get_analytics_data(since, until)
     
     # Top metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -1367,7 +990,7 @@ elif tab_mode == "📈 Analytics":
         avg_per_file = analytics['total_analyses'] / analytics['total_files'] if analytics['total_files'] > 0 else 0
         st.metric("📊 Avg per File", f"{avg_per_file:.1f}")
     with col4:
-        st.metric("🎭 Patterns Used", len(analytics['pattern_usage']))
+        st.metric("🎭 Patterns Used", analytics['patterns_used'])
     
     st.markdown("---")
     
@@ -1377,15 +1000,15 @@ elif tab_mode == "📈 Analytics":
     with col1:
         st.subheader("🎭 Most Used Patterns")
         if analytics['pattern_usage']:
-            # Create bar chart data
-            patterns = list(analytics['pattern_usage'].keys())
-            counts = list(analytics['pattern_usage'].values())
-            
-            # Display as horizontal bars using markdown
-            for pattern, count in sorted(analytics['pattern_usage'].items(), key=lambda x: x[1], reverse=True):
-                bar_length = int((count / max(counts)) * 30)
-                bar = "█" * bar_length
-                st.markdown(f"**{pattern.replace('_', ' ').title()}** `{bar}` {count}")
+            st.bar_chart(
+                [
+                    {'pattern': pattern.replace('_', ' ').title(), 'analyses': count}
+                    for pattern, count in analytics['pattern_usage'].items()
+                ],
+                x='pattern',
+                y='analyses',
+                horizontal=True,
+            )
         else:
             st.info("No analyses yet. Run some patterns to see statistics!")
     
@@ -1404,14 +1027,11 @@ elif tab_mode == "📈 Analytics":
     st.markdown("---")
     st.subheader("📅 Analysis Timeline")
     if analytics['timeline']:
-        dates = list(analytics['timeline'].keys())
-        counts = list(analytics['timeline'].values())
-        
-        # Simple timeline visualization
-        for date, count in list(analytics['timeline'].items())[-14:]:  # Last 14 days
-            bar_length = int((count / max(counts)) * 40)
-            bar = "▓" * bar_length
-            st.markdown(f"`{date}` {bar} **{count}** analyses")
+        st.bar_chart(
+            [{'day': day, 'analyses': count} for day, count in analytics['timeline'].items()],
+            x='day',
+            y='analyses',
+        )
     else:
         st.info("No timeline data yet")
 
@@ -1420,8 +1040,7 @@ elif tab_mode == "🎯 Goal Tracker":
     st.subheader("🎯 Automatic Goal Tracker")
     st.markdown("Track goals extracted from your Telos files and monitor progress through analyses.")
     
-    telos_files = find_markdown_files(TELOS_FOLDER)
-    outputs = get_all_outputs()
+    telos_files = find_markdown_files(tenant.telos_folder)
     
     if not telos_files:
         st.warning("No Telos files found. Create some files first!")
@@ -1430,12 +1049,13 @@ elif tab_mode == "🎯 Goal Tracker":
         file_names = [os.path.basename(f) for f in telos_files]
         selected_file_name = st.selectbox("Select Telos file:", file_names)
         selected_file = telos_files[file_names.index(selected_file_name)]
+        outputs = get_all_outputs(source=os.path.splitext(selected_file_name)[0])
         
         st.markdown("---")
         
         # Analyze goals
         with st.spinner("Extracting goals..."):
-            progress_data = analyze_goal_progress(selected_file, outputs)
+            progress_data = analyze_goal_progress(selected_file, outputs, get_document(selected_file))
         
         # Display metrics
         col1, col2, col3 = st.columns(3)
@@ -1497,6 +1117,121 @@ Add a Goals section to your Telos file like this:
                 with cols[i % 4]:
                     st.caption(f"✓ {pattern.replace('_', ' ').title()}")
 
+elif tab_mode == "⚙️ Performance":
+    # Performance mode: summaries of the per-call metrics store
+    st.subheader("⚙️ Performance")
+    st.markdown("Latency, token spend and slow spots, from the timings recorded for every model call and page.")
+    
+    metrics_store = get_metrics_store()
+    if not metrics_store.enabled:
+        st.info("Metrics are disabled. Set `METRICS_FILE` in your `.env` file to start recording.")
+    else:
+        windows = {"Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30, "All time": None}
+        window = st.selectbox("Time window:", list(windows), index=1)
+        days = windows[window]
+        records = metrics_store.records(since=time.time() - days * 86400 if days else None)
+        if MULTI_USER:
+            # The metrics file is shared; each user only sees their own calls and pages
+            records = [entry for entry in records if entry.get('tenant') == tenant.id]
+        
+        if not records:
+            st.info("No metrics recorded yet. Run some analyses to see timings!")
+        else:
+            model_calls = [entry for entry in records if entry['kind'] == 'model_call']
+            analyses = [entry for entry in records if entry['kind'] == 'analysis']
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("📡 Model Calls", len(model_calls))
+            with col2:
+                input_tokens = sum(entry.get('input_tokens') or 0 for entry in model_calls)
+                output_tokens = sum(entry.get('output_tokens') or 0 for entry in model_calls)
+                st.metric("🪙 Tokens In / Out", f"{input_tokens:,} / {output_tokens:,}")
+            with col3:
+                hits = sum(1 for entry in analyses if entry.get('cache_hit'))
+                st.metric("💾 Cache Hit Rate", f"{hits / len(analyses):.0%}" if analyses else "–")
+            with col4:
+                st.metric("⏳ Retries", sum(entry.get('retries') or 0 for entry in model_calls))
+            
+            st.markdown("---")
+            st.subheader("🎭 Latency per Pattern")
+            if analyses:
+                st.dataframe(latency_by_name(records, 'analysis'), use_container_width=True, hide_index=True)
+            else:
+                st.info("No analyses in this window")
+            
+            st.subheader("🪙 Token Spend per Day")
+            daily_tokens = tokens_by_day(records)
+            if daily_tokens:
+                st.bar_chart(daily_tokens, x='day', y=['input_tokens', 'output_tokens'])
+            else:
+                st.info("No model calls in this window")
+            
+            st.subheader("👥 Usage and Model Workers")
+            scheduler_stats = get_scheduler().stats()
+            col1, col2 = st.columns(2)
+            col1.metric("🚦 Model Calls Running", f"{sum(scheduler_stats['running'].values())} / {scheduler_stats['slots']}")
+            col2.metric("🕒 Waiting for a Worker", sum(scheduler_stats['waiting'].values()))
+            usage = get_usage_meter().usage(
+                since=date.today() - timedelta(days=(days or 3650) - 1), tenant=tenant.id if MULTI_USER else None
+            )
+            if usage:
+                st.dataframe(usage, use_container_width=True, hide_index=True)
+            
+            st.subheader("🧭 Model Routing")
+            st.caption("Calls per task and model tier; 'degraded' calls went to a cheaper tier because the preferred one was near its rate limit, failing or slow.")
+            routes = calls_by_route(records)
+            if routes:
+                st.dataframe(routes, use_container_width=True, hide_index=True)
+            else:
+                st.info("No model calls in this window")
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.subheader("🐢 Slowest Pages")
+                st.dataframe(latency_by_name(records, 'page'), use_container_width=True, hide_index=True)
+            with col2:
+                st.subheader("🧰 Helpers")
+                st.dataframe(latency_by_name(records, 'function'), use_container_width=True, hide_index=True)
+            
+            st.subheader("📡 Slowest Model Calls")
+            st.dataframe(
+                [
+                    {
+                        'when': datetime.fromtimestamp(entry['time']).strftime('%Y-%m-%d %H:%M:%S'),
+                        'model': entry['name'],
+                        'seconds': round(entry['seconds'], 2),
+                        'input_tokens': entry.get('input_tokens'),
+                        'output_tokens': entry.get('output_tokens'),
+                        'retries': entry.get('retries'),
+                        'finish_reason': entry.get('finish_reason') or entry.get('error'),
+                    }
+                    for entry in slowest(records, 'model_call')
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+            
+            # Raw export and clearing cover every user's records (and the history routing reads)
+            if not MULTI_USER:
+                st.markdown("---")
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.download_button(
+                        "📤 Export as OpenTelemetry (OTLP JSON)",
+                        json.dumps(to_otlp(records)),
+                        file_name=f"telos-metrics-{datetime.now().strftime('%Y-%m-%d')}.otlp.json",
+                        mime="application/json",
+                        use_container_width=True,
+                    )
+                with col2:
+                    if st.button("🧹 Clear Metrics", use_container_width=True):
+                        metrics_store.clear()
+                        st.rerun()
+
 # Footer
 st.markdown("---")
 st.caption("Built with Streamlit & Google Gemini | Save outputs to `outputs/` folder")
+
+get_metrics_store().record("page", tab_mode, time.perf_counter() - page_started,
+                          tenant=tenant.id if MULTI_USER else None)
@@ -0,0 +1,77 @@
+"""Deterministic synthetic Telos files and outputs/ trees for benchmarks."""
+
+import os
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+WORDS = (
+    "focus energy family health career learning money friends purpose habit morning run read write "
+    "project deadline team mentor savings travel music garden sleep meditate journal fear doubt courage "
+    "discipline patience gratitude ambition balance rest build ship review plan weekly quarterly yearly"
+).split()
+
+SECTIONS = ("Problems", "Mission", "Goals", "Challenges", "Strategies", "Projects", "Values", "Wisdom")
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+
+def make_telos(rng: random.Random, journal_entries: int, paragraph_sentences: int = 6) -> str:
+    """Build one Telos document: the standard sections followed by dated journal entries."""
+    lines = ["# My Telos", ""]
+    for title in SECTIONS:
+        lines += [f"## {title}", ""]
+        if title == "Goals":
+            lines += [f"- {_sentence(rng)}" for _ in range(6)]
+            lines += [f"{i}. {_sentence(rng)}" for i in range(1, 4)]
+        else:
+            lines.append(" ".join(_sentence(rng) for _ in range(paragraph_sentences)))
+        lines.append("")
+    start = datetime(2025, 1, 1)
+    for day in range(journal_entries):
+        lines += [f"## Journal {(start + timedelta(days=day)):%Y-%m-%d}", ""]
+        lines.append(" ".join(_sentence(rng) for _ in range(paragraph_sentences)))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def write_telos_corpus(folder: str, files: int, journal_entries: int, seed: int = 0) -> list:
+    """Write ``files`` Telos documents into ``folder`` and return their paths."""
+    rng = random.Random(seed)
+    Path(folder).mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(files):
+        path = os.path.join(folder, f"telos_{i:03d}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_telos(rng, journal_entries))
+        paths.append(path)
+    return paths
+
+
+def write_outputs_tree(output_dir: str, sources: int, patterns: list, versions: int, seed: int = 0,
+                       paragraphs: int = 6) -> int:
+    """Write ``outputs/<pattern>/<source>_<timestamp>.md`` files like save_output() does.
+
+    Returns the number of files written.
+    """
+    rng = random.Random(seed)
+    written = 0
+    start = datetime(2025, 1, 1, 9, 0, 0)
+    for pattern in patterns:
+        pattern_dir = os.path.join(output_dir, pattern)
+        Path(pattern_dir).mkdir(parents=True, exist_ok=True)
+        for source in range(sources):
+            for version in range(versions):
+                when = start + timedelta(days=version, minutes=source)
+                path = os.path.join(pattern_dir, f"telos_{source:03d}_{when:%Y-%m-%d_%H-%M-%S}.md")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(f"# {pattern.replace('_', ' ').title()} Analysis\n\n")
+                    f.write(f"**Source File:** telos_{source:03d}.md\n")
+                    f.write(f"**Date:** {when:%Y-%m-%d %H:%M:%S}\n")
+                    f.write(f"**Pattern:** {pattern}\n\n---\n\n")
+                    f.write("\n\n".join(" ".join(_sentence(rng) for _ in range(5)) for _ in range(paragraphs)))
+                written += 1
+    return written
@@ -0,0 +1,163 @@
+"""Offline stand-in for ``genai.GenerativeModel`` with configurable latency and failures."""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+# Finish reasons as the SDK reports them
+STOP, MAX_TOKENS, SAFETY = 1, 2, 3
+
+
+class ServiceUnavailable(Exception):
+    """Transient error with the status code call_with_retry() treats as retryable."""
+
+    code = 503
+
+
+@dataclass
+class FakeModelConfig:
+    latency: float = 0.05  # Seconds before the first token
+    tokens_per_second: float = 2000.0  # Output speed once generating
+    output_tokens: int = 400  # Length of a normal answer
+    failure_rate: float = 0.0  # Share of calls raising ServiceUnavailable
+    max_tokens_rate: float = 0.0  # Share of answers cut off with MAX_TOKENS
+    safety_rate: float = 0.0  # Share of answers blocked with SAFETY (no content)
+    seed: int = 0
+
+
+class _Part:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Content:
+    def __init__(self, text):
+        self.parts = [_Part(text)] if text else []
+
+
+class _Candidate:
+    def __init__(self, text, finish_reason):
+        self.content = _Content(text)
+        self.finish_reason = finish_reason
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.cached_content_token_count = 0
+
+
+class FakeResponse:
+    """Mimics the parts of ``GenerateContentResponse`` the app reads."""
+
+    def __init__(self, text, finish_reason, prompt_tokens):
+        self.candidates = [_Candidate(text, finish_reason)]
+        self.usage_metadata = _Usage(prompt_tokens, len(text) // 4)
+        self._text = text
+
+    @property
+    def text(self):
+        # Like the SDK, .text raises when the candidate has no content
+        if not self._text:
+            raise ValueError("The response has no text; check candidate.finish_reason.")
+        return self._text
+
+
+class FakeStream:
+    """Streamed response: iterates chunk responses, then exposes the final candidates."""
+
+    def __init__(self, text, finish_reason, prompt_tokens, chunk_delay, chunks=8):
+        step = max(1, len(text) // chunks)
+        self._pieces = [text[i:i + step] for i in range(0, len(text), step)] or [""]
+        self._finish_reason = finish_reason
+        self._chunk_delay = chunk_delay
+        self.candidates = []
+        self.usage_metadata = _Usage(prompt_tokens, len(text) // 4)
+
+    def __iter__(self):
+        for i, piece in enumerate(self._pieces):
+            time.sleep(self._chunk_delay)
+            last = i == len(self._pieces) - 1
+            yield FakeResponse(piece, self._finish_reason if last else 0, 0)
+        self.candidates = [_Candidate("".join(self._pieces), self._finish_reason)]
+
+
+class FakeModel:
+    """Drop-in for ``genai.GenerativeModel`` that never touches the network.
+
+    Each outcome is drawn from an RNG seeded with the config seed, the prompt and how
+    often that prompt was seen, so runs are reproducible whatever order concurrent
+    workers call in. ``calls`` and ``prompt_tokens`` count what the app sent.
+    """
+
+    def __init__(self, config: FakeModelConfig = None):
+        self.config = config or FakeModelConfig()
+        self._lock = threading.Lock()
+        self._seen = Counter()
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def _draw(self, prompt: str) -> float:
+        digest = hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()
+        with self._lock:
+            self.calls += 1
+            self._seen[digest] += 1
+            attempt = self._seen[digest]
+        return random.Random(f"{self.config.seed}:{digest}:{attempt}").random()
+
+    def _outcome(self, roll: float, prompt: str, generation_config) -> tuple:
+        """``(text, finish_reason)`` for a draw; raises ServiceUnavailable for failures."""
+        config = self.config
+        if roll < config.failure_rate:
+            raise ServiceUnavailable("503 The model is overloaded. Please try again later.")
+        roll -= config.failure_rate
+        if roll < config.safety_rate:
+            return "", SAFETY
+        roll -= config.safety_rate
+        finish_reason = MAX_TOKENS if roll < config.max_tokens_rate else STOP
+        words = ("insight", "goal", "pattern", "habit", "value", "focus", "growth", "risk")
+        text = " ".join(words[i % len(words)] for i in range(config.output_tokens))
+        if getattr(generation_config, "response_mime_type", None) == "application/json":
+            # Batched pattern requests: answer every key the prompt asks for
+            keys = re.search(r"exactly these keys: (.*)\.\n", str(prompt))
+            names = json.loads(f"[{keys.group(1)}]") if keys else []
+            text = json.dumps({name: text for name in names})
+        return text, finish_reason
+
+    def generate_content(self, prompt, generation_config=None, safety_settings=None, stream=False, **kwargs):
+        config = self.config
+        roll = self._draw(prompt)
+        prompt_tokens = len(str(prompt)) // 4
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+        time.sleep(config.latency)
+        text, finish_reason = self._outcome(roll, prompt, generation_config)
+        generation_seconds = (len(text) / 4) / config.tokens_per_second
+        if stream:
+            return FakeStream(text, finish_reason, prompt_tokens, generation_seconds / 8)
+        time.sleep(generation_seconds)
+        return FakeResponse(text, finish_reason, prompt_tokens)
+
+    async def generate_content_async(self, prompt, generation_config=None, safety_settings=None, **kwargs):
+        # Same outcomes as generate_content(), but the waits don't block the event loop
+        config = self.config
+        roll = self._draw(prompt)
+        prompt_tokens = len(str(prompt)) // 4
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+        await asyncio.sleep(config.latency)
+        text, finish_reason = self._outcome(roll, prompt, generation_config)
+        await asyncio.sleep((len(text) / 4) / config.tokens_per_second)
+        return FakeResponse(text, finish_reason, prompt_tokens)
+
+    def count_tokens(self, contents):
+        class Count:
+            total_tokens = len(str(contents)) // 4
+        return Count()
@@ -0,0 +1,456 @@
+"""Offline benchmarks for the analysis pipeline, search and the output browser.
+
+    python -m benchmarks --output report.json
+    python -m benchmarks --only analysis --latency 0.2 --failure-rate 0.05
+    python -m benchmarks --baseline report.json --max-regression 0.25
+
+Every model call goes to benchmarks.fake_gemini.FakeModel, all state lives in a
+temporary folder, and the corpora are generated from ``--seed``, so reports from
+the same arguments are comparable. With ``--baseline`` the run fails (exit code 1)
+if any benchmark's median is more than ``--max-regression`` slower.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.corpus import make_telos, write_outputs_tree, write_telos_corpus
+from benchmarks.fake_gemini import FakeModel, FakeModelConfig
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    """Register ``fn(ctx) -> (run, setup or None)``; ``run()`` is timed, ``setup()`` is not."""
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def configure_environment(workdir: str):
+    """Point every cache and store at ``workdir`` and lift rate limits, before telos_os is imported."""
+    os.environ.update({
+        "GEMINI_API_KEY": "benchmark",
+        "GEMINI_REQUESTS_PER_MINUTE": "1000000",
+        "GEMINI_TOKENS_PER_MINUTE": "1000000000",
+        "RESPONSE_CACHE_DIR": os.path.join(workdir, ".cache", "responses"),
+        "SECTION_CACHE_DIR": os.path.join(workdir, ".cache", "sections"),
+        "SEARCH_INDEX_DIR": os.path.join(workdir, ".cache", "search"),
+        "JOBS_DB": os.path.join(workdir, ".cache", "jobs.sqlite"),
+        "METRICS_FILE": os.path.join(workdir, ".cache", "metrics.jsonl"),
+        "CONTEXT_CACHE": "off",
+        "OUTPUT_STORE": "files",
+        "OUTPUT_KEEP_LAST": "0",
+    })
+    # outputs/ is relative to the working directory
+    os.chdir(workdir)
+
+
+def install_fake_model(model: FakeModel):
+    """Route every telos_os model call to ``model``."""
+    from telos_os import client, gemini
+
+    client.get_model = gemini.get_model = lambda model_name=None: model
+
+
+class Context:
+    """Shared state handed to each benchmark."""
+
+    def __init__(self, args, workdir: str, model: FakeModel):
+        self.args = args
+        self.workdir = workdir
+        self.model = model
+        self.small_text = make_telos(random.Random(args.seed), journal_entries=10)
+        self.large_text = make_telos(random.Random(args.seed + 1), journal_entries=args.journal_entries)
+
+
+# Parsing
+
+@benchmark("parsing.split_sections")
+def bench_split_sections(ctx):
+    from telos_os.parsing import is_anchor_section, merge_small_sections, split_telos_by_sections
+
+    def run():
+        sections = split_telos_by_sections(ctx.large_text)
+        merge_small_sections(sections, 12000, is_boundary=is_anchor_section)
+        return {"sections": len(sections), "chars": len(ctx.large_text)}
+    return run, None
+
+
+# Analysis pipeline
+
+@benchmark("analysis.single")
+def bench_single(ctx):
+    from telos_os.gemini import get_gemini_response
+    from telos_os.patterns import PATTERNS
+
+    def run():
+        get_gemini_response(PATTERNS["summarize"], ctx.small_text, use_cache=False)
+    return run, None
+
+
+@benchmark("analysis.cache_hit")
+def bench_cache_hit(ctx):
+    from telos_os.gemini import get_gemini_response
+    from telos_os.patterns import PATTERNS
+
+    get_gemini_response(PATTERNS["summarize"], ctx.small_text)
+
+    def run():
+        get_gemini_response(PATTERNS["summarize"], ctx.small_text)
+    return run, None
+
+
+@benchmark("analysis.map_reduce")
+def bench_map_reduce(ctx):
+    from telos_os import gemini
+    from telos_os.patterns import PATTERNS
+
+    def run():
+        # A small budget forces the sectioned path without a huge corpus
+        budget, gemini.MAX_INPUT_TOKENS = gemini.MAX_INPUT_TOKENS, ctx.args.map_reduce_budget
+        try:
+            gemini.get_gemini_response(PATTERNS["summarize"], ctx.large_text, use_cache=False)
+        finally:
+            gemini.MAX_INPUT_TOKENS = budget
+    return run, None
+
+
+@benchmark("analysis.sweep")
+def bench_sweep(ctx):
+    from telos_os.gemini import run_patterns_concurrently
+    from telos_os.patterns import PATTERNS
+
+    def run():
+        outputs = dict(run_patterns_concurrently(list(PATTERNS), ctx.small_text, ctx.args.concurrency, use_cache=False))
+        return {"patterns": len(outputs)}
+    return run, None
+
+
+@benchmark("analysis.sweep_batched")
+def bench_sweep_batched(ctx):
+    from telos_os.gemini import run_patterns_batched
+    from telos_os.patterns import PATTERNS
+
+    def run():
+        outputs = dict(run_patterns_batched(list(PATTERNS), ctx.small_text, ctx.args.concurrency, use_cache=False))
+        return {"patterns": len(outputs)}
+    return run, None
+
+
+# Search
+
+@benchmark("search.build")
+def bench_search_build(ctx):
+    from telos_os.parsing import split_telos_by_sections
+    from telos_os.search_index import SearchIndex
+
+    files = write_telos_corpus(os.path.join(ctx.workdir, "telos"), ctx.args.files, ctx.args.journal_entries // 4,
+                               seed=ctx.args.seed)
+    index_dir = os.path.join(ctx.workdir, ".cache", "search-build")
+
+    def setup():
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+    def run():
+        index = SearchIndex(index_dir, split_telos_by_sections)
+        index.refresh(files)
+        return {"files": len(files), "chunks": index.stats()["chunks"]}
+    return run, setup
+
+
+@benchmark("search.query")
+def bench_search_query(ctx):
+    from telos_os.parsing import split_telos_by_sections
+    from telos_os.search_index import SearchIndex
+
+    files = write_telos_corpus(os.path.join(ctx.workdir, "telos"), ctx.args.files, ctx.args.journal_entries // 4,
+                               seed=ctx.args.seed)
+    index = SearchIndex(os.path.join(ctx.workdir, ".cache", "search-query"), split_telos_by_sections)
+    index.refresh(files)
+    queries = ["morning routine and sleep", "career mentor feedback", "money savings plan", "fear and courage"]
+
+    def run():
+        # Includes the no-op refresh the app runs before every search
+        index.refresh(files)
+        for query in queries:
+            index.search(query, k=8)
+        return {"queries": len(queries)}
+    return run, None
+
+
+# Output browser
+
+def _outputs_tree(ctx):
+    from telos_os.patterns import PATTERNS
+
+    output_dir = os.path.join(ctx.workdir, "outputs")
+    if not os.path.isdir(output_dir):
+        write_outputs_tree(output_dir, ctx.args.output_sources, list(PATTERNS), ctx.args.output_versions, seed=ctx.args.seed)
+    return output_dir
+
+
+@benchmark("outputs.index_cold")
+def bench_outputs_cold(ctx):
+    from telos_os.outputs_index import OutputsIndex
+
+    output_dir = _outputs_tree(ctx)
+    db_path = os.path.join(ctx.workdir, ".cache", "cold-index.sqlite")
+
+    def setup():
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+    def run():
+        index = OutputsIndex(output_dir, db_path)
+        index.reconcile()
+        return {"outputs": sum(index.counts().values())}
+    return run, setup
+
+
+@benchmark("outputs.get_all_outputs")
+def bench_get_all_outputs(ctx):
+    from telos_os.storage import get_all_outputs
+
+    _outputs_tree(ctx)
+    get_all_outputs()
+
+    def run():
+        outputs = get_all_outputs()
+        return {"sources": len(outputs)}
+    return run, None
+
+
+@benchmark("outputs.view_page")
+def bench_view_page(ctx):
+    from telos_os.storage import get_output_counts, get_output_page
+
+    _outputs_tree(ctx)
+
+    def run():
+        # What one View Outputs rerun queries: counts, then one page per pattern
+        counts = get_output_counts("telos_000")
+        for pattern in counts:
+            get_output_page("telos_000", pattern, 0, 5)
+        return {"patterns": len(counts)}
+    return run, None
+
+
+@benchmark("outputs.analytics")
+def bench_analytics(ctx):
+    from telos_os.storage import get_output_rollup, get_recent_outputs
+
+    _outputs_tree(ctx)
+
+    def run():
+        # The Analytics dashboard's queries: pattern and day rollups plus recent activity
+        patterns = get_output_rollup("pattern")
+        get_output_rollup("day")
+        get_recent_outputs(10)
+        return {"analyses": sum(patterns.values())}
+    return run, None
+
+
+# Startup
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_time(module: str) -> dict:
+    """Import ``module`` in a fresh interpreter under ``-X importtime``."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, env=env, check=True)
+    # Lines look like "import time:   self [us] | cumulative | imported package"
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if line.startswith("import time:") and len(parts) == 3 and parts[1].strip().isdigit():
+            cumulative[parts[2].strip()] = int(parts[1])
+    return {
+        "import_ms": round(cumulative.get(module, 0) / 1000, 1),
+        "sdk_imported": "google.generativeai" in cumulative,
+    }
+
+
+def _startup(module: str):
+    def bench(ctx):
+        return (lambda: _import_time(module)), None
+    return bench
+
+
+# What `python -m telos_os` and the Streamlit app import before doing any work
+benchmark("startup.cli")(_startup("telos_os.cli"))
+benchmark("startup.core")(_startup("telos_os.analytics"))
+
+
+def measure(name: str, fn, ctx) -> dict:
+    """Time ``repeat`` runs (after one warm-up), then measure peak memory of one more run."""
+    calls_before = ctx.model.calls
+    run, setup = fn(ctx)
+    if setup:
+        setup()
+    extra = run() or {}
+
+    timings = []
+    for _ in range(ctx.args.repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    runs = ctx.args.repeat + 2
+    timings.sort()
+    return {
+        "name": name,
+        "repeat": ctx.args.repeat,
+        "seconds": {
+            "min": round(timings[0], 6),
+            "median": round(statistics.median(timings), 6),
+            "mean": round(statistics.fmean(timings), 6),
+            "p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 6),
+        },
+        "peak_memory_kb": round(peak / 1024, 1),
+        "model_calls_per_run": round((ctx.model.calls - calls_before) / runs, 2),
+        **({"details": extra} if extra else {}),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list:
+    """Return a message for each benchmark whose median regressed past ``max_regression``."""
+    previous = {result["name"]: result for result in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        before = previous.get(result["name"])
+        if not before:
+            continue
+        old, new = before["seconds"]["median"], result["seconds"]["median"]
+        if old > 0 and new > old * (1 + max_regression):
+            regressions.append(f"{result['name']}: median {old:.4f}s -> {new:.4f}s (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Run offline Telos OS benchmarks.")
+    parser.add_argument("--only", nargs="+", metavar="PREFIX", help="Run benchmarks whose name starts with PREFIX")
+    parser.add_argument("--list", action="store_true", help="List benchmark names and exit")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark (default: 5)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for corpora and fake model outcomes")
+    parser.add_argument("--output", metavar="PATH", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", metavar="PATH", help="Earlier report to compare medians against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed median slowdown vs --baseline before failing (default: 0.2 = 20%%)")
+
+    corpus = parser.add_argument_group("corpus")
+    corpus.add_argument("--files", type=int, default=20, help="Telos files for the search benchmarks")
+    corpus.add_argument("--journal-entries", type=int, default=400, help="Journal sections in the large Telos file")
+    corpus.add_argument("--output-sources", type=int, default=10, help="Source files in the outputs/ tree")
+    corpus.add_argument("--output-versions", type=int, default=10, help="Versions per source and pattern")
+    corpus.add_argument("--map-reduce-budget", type=int, default=20000,
+                        help="Input token budget that forces the large file through map-reduce")
+    corpus.add_argument("--concurrency", type=int, default=4, help="Parallel requests for sweeps")
+
+    model = parser.add_argument_group("fake model")
+    model.add_argument("--latency", type=float, default=0.05, help="Seconds before the first token")
+    model.add_argument("--tokens-per-second", type=float, default=2000.0)
+    model.add_argument("--output-tokens", type=int, default=400, help="Length of each answer")
+    model.add_argument("--failure-rate", type=float, default=0.0, help="Share of calls failing with a retryable 503")
+    model.add_argument("--max-tokens-rate", type=float, default=0.0, help="Share of answers cut off (MAX_TOKENS)")
+    model.add_argument("--safety-rate", type=float, default=0.0, help="Share of answers blocked (SAFETY)")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    names = [name for name in BENCHMARKS if not args.only or any(name.startswith(prefix) for prefix in args.only)]
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    model_config = FakeModelConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        failure_rate=args.failure_rate,
+        max_tokens_rate=args.max_tokens_rate,
+        safety_rate=args.safety_rate,
+        seed=args.seed,
+    )
+    model = FakeModel(model_config)
+
+    original_cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="telos-bench-")
+    try:
+        configure_environment(workdir)
+        install_fake_model(model)
+        ctx = Context(args, workdir, model)
+        results = []
+        # Keep stdout for the report; the app's own prints go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            for name in names:
+                result = measure(name, BENCHMARKS[name], ctx)
+                results.append(result)
+                print(f"{name:<28} median {result['seconds']['median'] * 1000:9.2f} ms  "
+                      f"peak {result['peak_memory_kb']:9.1f} KB  calls/run {result['model_calls_per_run']}")
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "arguments": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "list")},
+            "fake_model": vars(model_config),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.max_regression)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
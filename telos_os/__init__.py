@@ -0,0 +1,5 @@
+"""Reusable building blocks for Gemini Fabric - Telos OS.
+
+The Streamlit UI lives in ``app.py``; modules in this package hold logic that
+does not depend on a running Streamlit script.
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from telos_os.cli import main
+
+sys.exit(main())
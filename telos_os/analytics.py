@@ -0,0 +1,80 @@
+"""Dashboard numbers: goal progress per Telos file and analytics over saved outputs."""
+
+import os
+from collections import Counter
+from datetime import date, timedelta
+
+from telos_os.documents import TelosDocument, load_document
+from telos_os.metrics import instrumented
+from telos_os.parsing import find_markdown_files
+from telos_os.storage import get_output_rollup, get_recent_outputs
+from telos_os.tenants import current_tenant
+
+
+def analyze_goal_progress(telos_file: str, outputs: dict, document: TelosDocument = None) -> dict:
+    """Analyze goal progress by comparing Telos file with analysis outputs.
+
+    ``document`` is the already parsed file, if the caller has one; otherwise it is
+    loaded through the document cache (None if the file is missing).
+    """
+    if document is None and os.path.exists(telos_file):
+        document = load_document(telos_file)
+    goals = list(document.goals) if document else []
+    
+    # Get all analyses for this file
+    source_name = os.path.splitext(os.path.basename(telos_file))[0]
+    file_outputs = outputs.get(source_name, {})
+    
+    # Count analyses
+    total_analyses = sum(len(analyses) for analyses in file_outputs.values())
+    
+    # Get latest analysis dates
+    latest_dates = []
+    for pattern_analyses in file_outputs.values():
+        if pattern_analyses:
+            latest_dates.append(pattern_analyses[0]['timestamp'])
+    
+    last_analysis = max(latest_dates) if latest_dates else None
+    
+    return {
+        'goals_count': len(goals),
+        'goals': goals[:10],  # First 10 goals
+        'total_analyses': total_analyses,
+        'last_analysis': last_analysis,
+        'patterns_used': list(file_outputs.keys())
+    }
+
+
+@instrumented()
+def get_analytics_data(since: date = None, until: date = None):
+    """Generate analytics data for a date range (inclusive; None = open-ended).
+
+    Counts come from the outputs index's per-day rollup and recent activity from its
+    timestamp index, so this costs O(patterns + days) however many analyses are saved.
+    """
+    telos_files = find_markdown_files(current_tenant().telos_folder)
+    pattern_usage = Counter(get_output_rollup('pattern', since=since, until=until))
+    daily_counts = get_output_rollup('day', since=since, until=until)
+    
+    # Timeline with the empty days filled in, so the chart's x axis is continuous
+    timeline = {}
+    if daily_counts:
+        day = since or date.fromisoformat(min(daily_counts))
+        last = until or date.today()
+        while day <= last:
+            timeline[day.isoformat()] = daily_counts.get(day.isoformat(), 0)
+            day += timedelta(days=1)
+    
+    recent_analyses = [
+        {'source': entry['source'], 'pattern': entry['pattern'], 'timestamp': entry['timestamp']}
+        for entry in get_recent_outputs(10, since, until)
+    ]
+    
+    return {
+        'total_files': len(telos_files),
+        'total_analyses': sum(pattern_usage.values()),
+        'patterns_used': len(pattern_usage),
+        'pattern_usage': dict(pattern_usage.most_common(10)),
+        'timeline': timeline,
+        'recent_activity': recent_analyses
+    }
@@ -0,0 +1,76 @@
+"""AI writing assistance for the sections of a Telos file being drafted."""
+
+from telos_os.client import generate_content
+from telos_os.config import ASSIST_GENERATION_CONFIG
+from telos_os.gemini import safe_extract_text
+
+
+def get_ai_writing_assistance(section: str, current_content: str, full_context: str) -> str:
+    """Get AI assistance for writing a specific section."""
+    prompts = {
+        "mission": (
+            "You are a life purpose coach. Based on the user's current Telos draft, "
+            "help them articulate their core mission and purpose. Ask probing questions "
+            "or provide 3-5 concrete mission statement examples that align with what they've written. "
+            "Be inspiring but grounded."
+        ),
+        "goals": (
+            "You are a goal-setting expert. Review the user's Telos and help them create "
+            "SMART goals (Specific, Measurable, Achievable, Relevant, Time-bound). "
+            "Suggest 3-5 concrete short-term and long-term goals based on their mission and current status."
+        ),
+        "challenges": (
+            "You are a strategic problem-solver. Based on the user's Telos, help them identify "
+            "and articulate their key challenges and obstacles. Ask clarifying questions or "
+            "suggest common challenges they might be facing but haven't named yet."
+        ),
+        "strengths": (
+            "You are a strengths-based coach. Help the user identify and articulate their "
+            "key strengths, skills, and resources. Based on their Telos, suggest strengths "
+            "they might be overlooking or undervaluing."
+        ),
+        "expand": (
+            "You are a thoughtful writing coach. The user is working on their Telos. "
+            "Provide 3-5 thought-provoking questions or prompts to help them expand and deepen "
+            "what they've written. Be specific to their content."
+        ),
+        "improve": (
+            "You are an editor and life coach. Review the user's Telos draft and provide "
+            "constructive feedback on: 1) Clarity - is it clear and specific? "
+            "2) Alignment - do the sections support each other? "
+            "3) Actionability - are there concrete next steps? "
+            "Provide 3-5 specific suggestions for improvement."
+        ),
+        "analyze_expand": (
+            "You are a Telos expert. Analyze the user's current Telos document and provide: "
+            "1) What's working well (2-3 strengths), "
+            "2) What's missing or underdeveloped (2-3 gaps), "
+            "3) Specific suggestions to expand and deepen each section, "
+            "4) How to better connect Problems → Mission → Goals → Challenges. "
+            "Be specific and actionable. Reference their actual content."
+        ),
+        "connect": (
+            "You are a systems thinker. Analyze how the user's Problems, Mission, Goals, and Challenges "
+            "connect to each other. Show the logical flow: which goals address which problems? "
+            "Which challenges block which goals? Are there gaps in the chain? "
+            "Provide a clear map of connections and suggest missing links."
+        ),
+    }
+    
+    prompt = prompts.get(section, prompts["expand"])
+    
+    try:
+        full_prompt = f"""
+{prompt}
+
+--- USER'S TELOS DOCUMENT ---
+{full_context if full_context else "[User is just starting their Telos]"}
+
+Provide helpful, actionable guidance. Be concise but insightful. Use markdown formatting.
+"""
+        
+        response = generate_content(full_prompt, ASSIST_GENERATION_CONFIG, task="assist")
+        return safe_extract_text(response)
+    
+    except Exception as e:
+        return f"❌ Error getting AI assistance: {str(e)}"
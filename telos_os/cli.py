@@ -0,0 +1,259 @@
+"""Headless batch runner: ``python -m telos_os run --patterns ... --files ...``.
+
+Progress is printed as one JSON object per line on stdout so sweeps can be
+scheduled (cron, Task Scheduler) and their logs parsed.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+from telos_os.config import GENERATION_CONFIG, MAX_CONCURRENCY, MODEL_NAME, TELOS_FOLDER
+from telos_os.documents import load_document
+from telos_os.client import configure_gemini, get_model, get_usage_meter
+from telos_os.gemini import (
+    cached_contexts,
+    get_context_cache,
+    get_gemini_response,
+    get_response_cache,
+    run_patterns_batched,
+)
+from telos_os.metrics import calls_by_route, export_otlp, get_metrics_store, latency_by_name, to_otlp, tokens_by_day
+from telos_os.parsing import find_markdown_files
+from telos_os.patterns import PATTERN_CATEGORIES, PATTERNS, get_pattern_registry
+from telos_os.storage import export_outputs, get_output_store, get_outputs_index, save_output
+from telos_os.tenants import DEFAULT_TENANT, bind, current_tenant, get_tenant, tenant_for_user, use_tenant
+
+
+def emit(event: str, **fields):
+    """Print one machine-readable progress record."""
+    print(json.dumps({"event": event, "time": datetime.now().isoformat(timespec="seconds"), **fields}), flush=True)
+
+
+def is_up_to_date(filepath: str, pattern: str) -> bool:
+    """True if the newest saved output for (file, pattern) is newer than the file itself."""
+    source_name = os.path.splitext(os.path.basename(filepath))[0]
+    latest = get_outputs_index().query(source=source_name, pattern=pattern, limit=1)
+    if not latest:
+        return False
+    return latest[0]['timestamp'].timestamp() >= int(os.path.getmtime(filepath))
+
+
+def resolve_patterns(names: list) -> list:
+    """Expand pattern names and category names into pattern keys."""
+    if not names:
+        return list(PATTERNS)
+
+    resolved = []
+    for name in names:
+        if name in PATTERNS:
+            resolved.append(name)
+            continue
+        category = next((c for c in PATTERN_CATEGORIES if name.lower() in c.lower()), None)
+        if category is None:
+            raise SystemExit(f"Unknown pattern or category: {name}")
+        resolved.extend(PATTERN_CATEGORIES[category])
+    return list(dict.fromkeys(resolved))
+
+
+def run(args) -> int:
+    """Run every requested (file, pattern) pair and return the number of failures."""
+    patterns = resolve_patterns(args.patterns)
+    folder = args.folder or current_tenant().telos_folder
+    files = args.files or find_markdown_files(folder)
+    if not files:
+        emit("error", message=f"No markdown files found in '{folder}'")
+        return 1
+    missing = [filepath for filepath in files if not os.path.isfile(filepath)]
+    if missing:
+        emit("error", message=f"File not found: {', '.join(missing)}")
+        return 1
+
+    configure_gemini()
+    get_outputs_index().reconcile()
+
+    contents = {}
+    tasks = []
+    for filepath in files:
+        contents[filepath] = load_document(filepath).text
+        for pattern in patterns:
+            if not args.force and is_up_to_date(filepath, pattern):
+                emit("skipped", file=filepath, pattern=pattern, reason="up to date")
+                continue
+            tasks.append((filepath, pattern))
+
+    emit("start", model=MODEL_NAME, files=len(files), patterns=len(patterns), tasks=len(tasks),
+         concurrency=args.concurrency)
+
+    def analyze(filepath, pattern):
+        started = time.perf_counter()
+        output = get_gemini_response(PATTERNS[pattern], contents[filepath], use_cache=not args.force)
+        return output, time.perf_counter() - started
+
+    def results(executor):
+        """Yield ``(filepath, pattern, output or exception, seconds)`` as tasks finish."""
+        if args.batch:
+            # One file at a time, its patterns packed into as few requests as possible
+            for filepath in dict.fromkeys(filepath for filepath, _ in tasks):
+                started = time.perf_counter()
+                file_patterns = [pattern for path, pattern in tasks if path == filepath]
+                for pattern, output in run_patterns_batched(file_patterns, contents[filepath], args.concurrency,
+                                                            use_cache=not args.force):
+                    yield filepath, pattern, output, time.perf_counter() - started
+            return
+
+        futures = {executor.submit(bind(analyze), filepath, pattern): (filepath, pattern) for filepath, pattern in tasks}
+        for future in as_completed(futures):
+            filepath, pattern = futures[future]
+            try:
+                output, seconds = future.result()
+            except Exception as e:
+                output, seconds = e, None
+            yield filepath, pattern, output, seconds
+
+    # Warm shared resources before the workers start
+    get_model()
+    get_response_cache()
+
+    # Files analyzed by more than one pattern are cached once for the whole sweep
+    pending = [filepath for filepath, _ in tasks]
+    shared = [contents[filepath] for filepath in dict.fromkeys(pending) if pending.count(filepath) > 1]
+
+    sweep_started = time.perf_counter()
+    failures = 0
+    completed = 0
+    with cached_contexts(shared), ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+        for filepath, pattern, output, seconds in results(executor):
+            completed += 1
+            if isinstance(output, Exception):
+                failures += 1
+                emit("failed", file=filepath, pattern=pattern, error=str(output), done=completed, total=len(tasks))
+                continue
+
+            output_path = save_output(pattern, filepath, output)
+            if output_path is None:
+                failures += 1
+                emit("failed", file=filepath, pattern=pattern, error=output.splitlines()[0], seconds=round(seconds, 3),
+                     done=completed, total=len(tasks))
+                continue
+            emit("done", file=filepath, pattern=pattern, output=output_path, seconds=round(seconds, 3),
+                 done=completed, total=len(tasks))
+
+    cache_stats = get_response_cache().stats()
+    context_stats = get_context_cache().stats()
+    emit("summary", tasks=len(tasks), failed=failures, seconds=round(time.perf_counter() - sweep_started, 3),
+         cache_hits=cache_stats["hits"], cache_misses=cache_stats["misses"],
+         context_caches=context_stats["created"], input_tokens_saved=context_stats["tokens_saved"])
+    return failures
+
+
+def list_patterns(args) -> int:
+    """Print the pattern registry grouped by category, with each pattern's own settings."""
+    registry = get_pattern_registry()
+    for category, patterns in PATTERN_CATEGORIES.items():
+        print(category)
+        for name in patterns:
+            pattern = registry.get(name)
+            settings = [f"{key}={value}" for key, value in pattern.generation_config.items()
+                        if GENERATION_CONFIG.get(key) != value]
+            if pattern.chunking != "sections":
+                settings.append(f"chunking={pattern.chunking}")
+            if pattern.tier:
+                settings.append(f"tier={pattern.tier}")
+            print(f"  {name}" + (f"  ({', '.join(settings)})" if settings else ""))
+    return 0
+
+
+def export(args) -> int:
+    """Write the SQLite output store out as the markdown ``<pattern>/<file>.md`` layout."""
+    written = export_outputs(args.to)
+    emit("exported", to=args.to, files=written, **get_output_store().stats())
+    return 0
+
+
+def metrics(args) -> int:
+    """Print metric summaries, or export the raw records as OpenTelemetry traces."""
+    records = get_metrics_store().records(since=time.time() - args.days * 86400 if args.days else None)
+    if args.otlp:
+        with open(args.otlp, "w", encoding="utf-8") as f:
+            json.dump(to_otlp(records), f)
+        emit("exported", to=args.otlp, spans=len(records))
+    if args.endpoint == "":
+        raise SystemExit("--endpoint needs a URL when OTEL_EXPORTER_OTLP_ENDPOINT is not set")
+    if args.endpoint:
+        status = export_otlp(records, args.endpoint)
+        emit("exported", to=args.endpoint, spans=len(records), status=status)
+    if args.otlp or args.endpoint:
+        return 0
+    
+    for row in latency_by_name(records, "analysis"):
+        emit("pattern", **row)
+    for row in tokens_by_day(records):
+        emit("tokens", **row)
+    for row in calls_by_route(records):
+        emit("route", **row)
+    since = date.today() - timedelta(days=max(1, math.ceil(args.days)) - 1) if args.days else None
+    for row in get_usage_meter().usage(since):
+        emit("usage", **row)
+    for row in latency_by_name(records, "page") + latency_by_name(records, "function"):
+        emit("timing", **row)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m telos_os", description="Run Telos analysis patterns without the web UI.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run patterns over Telos files and save the outputs")
+    run_parser.add_argument("--patterns", nargs="+", metavar="NAME",
+                            help="Pattern names or category names (default: all patterns)")
+    run_parser.add_argument("--files", nargs="+", metavar="PATH",
+                            help="Telos files to analyze (default: every markdown file in --folder)")
+    run_parser.add_argument("--folder", help=f"Folder to scan for Telos files (default: {TELOS_FOLDER}, or the tenant's)")
+    run_parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY,
+                            help=f"Parallel requests to Gemini (default: {MAX_CONCURRENCY})")
+    run_parser.add_argument("--force", action="store_true",
+                            help="Re-run pairs that are already up to date and bypass the response cache")
+    run_parser.add_argument("--batch", action="store_true",
+                            help="Pack several patterns into each request (fewer calls; falls back per pattern)")
+    run_parser.add_argument("--tenant", metavar="USER",
+                            help="Run as this user of a multi-user deployment: their Telos folder, outputs and quota")
+    run_parser.set_defaults(func=run)
+
+    export_parser = subparsers.add_parser("export", help="Export outputs kept in the SQLite store as markdown files")
+    export_parser.add_argument("--to", required=True, metavar="DIR", help="Folder to write <pattern>/<file>.md into")
+    export_parser.add_argument("--tenant", metavar="USER", help="Export this user's outputs (multi-user deployments)")
+    export_parser.set_defaults(func=export)
+
+    metrics_parser = subparsers.add_parser("metrics", help="Summarize recorded timings or export them for OpenTelemetry")
+    metrics_parser.add_argument("--days", type=float, default=7, help="Only records from the last N days (0 = all, default: 7)")
+    metrics_parser.add_argument("--otlp", metavar="PATH", help="Write the records as OTLP/JSON traces instead")
+    metrics_parser.add_argument("--endpoint", nargs="?", const=os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", ""),
+                                metavar="URL",
+                                help="POST the records to an OTLP/HTTP collector (no URL: $OTEL_EXPORTER_OTLP_ENDPOINT)")
+    metrics_parser.set_defaults(func=metrics)
+
+    list_parser = subparsers.add_parser("patterns", help="List available patterns")
+    list_parser.set_defaults(func=list_patterns)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    user = getattr(args, "tenant", None)
+    try:
+        with use_tenant(tenant_for_user(user) if user and user != DEFAULT_TENANT else get_tenant()):
+            return 1 if args.func(args) else 0
+    except (RuntimeError, OSError) as e:
+        emit("error", message=str(e))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
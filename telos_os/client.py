@@ -0,0 +1,399 @@
+"""The Gemini client layer: one model, one rate limiter and one event loop for every call site.
+
+Sync code calls generate_content(); coroutines await generate_content_async(). Both
+route the call to a model (see telos_os.routing) and share that model's rate limiter,
+retries, timeouts and metrics. Async calls run on a single
+long-lived event loop in a background thread (get_event_loop()), so the Streamlit
+UI, the CLI and job workers can have many requests in flight without a thread per
+call, and the SDK's async channel is always used from the loop it was created on.
+Every call also takes a slot of the fair-share scheduler (MODEL_WORKERS in flight
+across all tenants) and counts towards its tenant's daily quota.
+"""
+
+import asyncio
+import functools
+import json
+import sys
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from telos_os.config import (
+    API_KEY,
+    MAX_RETRIES,
+    MODEL_NAME,
+    MODEL_ROUTES,
+    MODEL_TIERS,
+    MODEL_WORKERS,
+    MULTI_USER,
+    REQUEST_TIMEOUT_SECONDS,
+    REQUESTS_PER_MINUTE,
+    ROUTING_DEGRADE_AT,
+    ROUTING_MAX_ERROR_RATE,
+    ROUTING_MAX_P95_SECONDS,
+    TENANT_DAILY_CALLS,
+    TENANT_DAILY_TOKENS,
+    TENANT_QUOTAS,
+    TOKENS_PER_MINUTE,
+    USAGE_DB,
+)
+from telos_os.metrics import Span, get_metrics_store
+from telos_os.rate_limit import RateLimiter, call_with_retry, call_with_retry_async
+from telos_os.routing import ModelRouter, model_id, parse_routes
+from telos_os.scheduler import FairShareScheduler
+from telos_os.tenants import bind, current_tenant, run_as, tenant_id
+from telos_os.tokens import TokenCounter, model_limits
+from telos_os.usage import Quota, UsageMeter, parse_quotas
+
+
+def sdk():
+    """The ``google.generativeai`` module, imported on first use.
+
+    Importing the SDK (and grpc/protobuf behind it) takes most of the app's startup
+    time, so nothing imports it at module level; commands and pages that never call
+    the model never pay for it.
+    """
+    import google.generativeai as genai
+    return genai
+
+
+def configure_gemini():
+    """Configure the Gemini SDK with the API key from the environment."""
+    if not API_KEY:
+        raise RuntimeError("GEMINI_API_KEY not found. Please set it in your .env file.")
+    sdk().configure(api_key=API_KEY)
+
+
+def get_model(model_name: str = None):
+    """Get the cached Gemini model instance for ``model_name`` (default MODEL_NAME).
+
+    The SDK keeps one channel per client and multiplexes requests over it, so reusing
+    this instance reuses its connections.
+    """
+    return _model(model_id(model_name or MODEL_NAME))
+
+
+@functools.lru_cache(maxsize=None)
+def _model(name: str):
+    return sdk().GenerativeModel(name)
+
+
+@functools.lru_cache(maxsize=None)
+def get_token_counter():
+    """Get the token counter for MODEL_NAME (exact counts via count_tokens(), memoised)."""
+    return TokenCounter(MODEL_NAME, remote_count=count_tokens)
+
+
+def count_tokens(text: str) -> int:
+    """Exact token count of ``text`` for MODEL_NAME, asked of the model like any other call.
+
+    It waits for the shared rate limiter and holds a scheduler slot, so counting can't
+    crowd out analyses. It isn't retried; TokenCounter falls back to its estimate.
+    """
+    tenant = current_tenant().id
+    with get_scheduler().slot(tenant):
+        return call_with_retry(lambda: get_model().count_tokens(text).total_tokens,
+                               limiter=get_rate_limiter(), max_retries=0)
+
+
+def get_rate_limiter(model_name: str = None):
+    """Get the rate limiter shared by every call to ``model_name`` (default MODEL_NAME) in this process.
+
+    Quotas are per model, so each routed model gets its own budget of the configured size.
+    """
+    return _rate_limiter(model_id(model_name or MODEL_NAME))
+
+
+@functools.lru_cache(maxsize=None)
+def _rate_limiter(name: str):
+    return RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+
+
+@functools.lru_cache(maxsize=None)
+def get_router():
+    """Get the model router configured by MODEL_TIERS, MODEL_ROUTES and the ROUTING_* settings."""
+    return ModelRouter(
+        MODEL_TIERS,
+        parse_routes(MODEL_ROUTES),
+        limiter_for=get_rate_limiter,
+        load_records=lambda since: get_metrics_store().records(since=since, kinds=("model_call",)),
+        degrade_at=ROUTING_DEGRADE_AT,
+        max_error_rate=ROUTING_MAX_ERROR_RATE,
+        max_p95_seconds=ROUTING_MAX_P95_SECONDS,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_scheduler():
+    """Get the fair-share scheduler every model call in this process takes a slot from."""
+    return FairShareScheduler(MODEL_WORKERS)
+
+
+@functools.lru_cache(maxsize=None)
+def get_usage_meter():
+    """Get the per-tenant usage counters and quotas (USAGE_DB, TENANT_DAILY_*, TENANT_QUOTAS)."""
+    # TENANT_QUOTAS may name users by their sign-in name or by tenant id
+    quotas = {tenant_id(user): quota for user, quota in parse_quotas(TENANT_QUOTAS).items()}
+    # Outside multi-user mode usage is only counted where a quota needs it
+    return UsageMeter(USAGE_DB, Quota(TENANT_DAILY_CALLS, TENANT_DAILY_TOKENS), quotas, track_unlimited=MULTI_USER)
+
+
+def route_call(model, task: str, tier: str = None) -> tuple:
+    """``(model, model name, span fields)`` for one call; an explicit ``model`` skips routing."""
+    if model is not None:
+        return model, model_id(getattr(model, "model_name", None) or MODEL_NAME), {"task": task}
+    route = get_router().choose(task, tier)
+    return get_model(route.model), route.model, {"task": task, "tier": route.tier, "degraded": route.degraded}
+
+
+def admit_call(tenant: str, model, task: str, tier: str = None) -> tuple:
+    """route_call() for a call by ``tenant``, after checking its quota (raises QuotaExceeded)."""
+    get_usage_meter().check(tenant)
+    return route_call(model, task, tier)
+
+
+def fit_generation_config(config: dict, model_name: str) -> dict:
+    """``config`` with max_output_tokens capped at the output limit of ``model_name``."""
+    limit = model_limits(model_name)["output"]
+    if config and config.get("max_output_tokens", 0) > limit:
+        return {**config, "max_output_tokens": limit}
+    return config
+
+
+@functools.lru_cache(maxsize=32)
+def _generation_config(key: str):
+    return sdk().types.GenerationConfig(**json.loads(key))
+
+
+def build_generation_config(config: dict):
+    """The SDK GenerationConfig for a settings dict, built once per distinct dict.
+
+    Call sites keep passing the plain dicts from telos_os.config (they are also part
+    of cache keys); the SDK objects are shared instead of rebuilt on every call.
+    """
+    return _generation_config(json.dumps(config, sort_keys=True))
+
+
+@functools.lru_cache(maxsize=8)
+def request_options(timeout: float):
+    """Shared RequestOptions carrying a per-call deadline in seconds."""
+    return sdk().types.RequestOptions(timeout=timeout)
+
+
+def request_kwargs(generation_config: dict, safety_settings: list, timeout: float, stream: bool = False) -> dict:
+    """Keyword arguments for ``model.generate_content`` / ``generate_content_async``."""
+    kwargs = {"stream": stream} if stream else {}
+    if generation_config is not None:
+        kwargs["generation_config"] = build_generation_config(generation_config)
+    if safety_settings is not None:
+        kwargs["safety_settings"] = safety_settings
+    if timeout:
+        kwargs["request_options"] = request_options(timeout)
+    return kwargs
+
+
+def _retry_reporter(span):
+    def on_retry(attempt, delay, error):
+        span.fields["retries"] = attempt
+        print(f"⏳ Gemini call failed ({type(error).__name__}), retry {attempt}/{MAX_RETRIES} in {delay:.1f}s",
+              file=sys.stderr)
+    return on_retry
+
+
+def _adjust_limiter(limiter, response, estimated_tokens: int):
+    # Correct the token bucket with the real prompt size when the API reports it
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None) if usage is not None else None
+    if isinstance(prompt_tokens, int):
+        limiter.adjust(prompt_tokens - estimated_tokens)
+
+
+def generate_content(prompt: str, generation_config: dict = None, safety_settings: list = None, stream: bool = False,
+                     model=None, timeout: float = REQUEST_TIMEOUT_SECONDS, task: str = "analysis", tier: str = None):
+    """Call the model through the shared rate limiter, retrying rate limits and transient errors.
+
+    Every Gemini call site goes through here (or generate_content_async()) so concurrent
+    sweeps share one budget. For streams only opening the stream is retried. The model
+    is routed from ``task`` and ``tier`` unless ``model`` is given, e.g. one bound to a
+    cached context; the response's ``served_model`` names the model it came from.
+    ``timeout`` is the deadline in seconds for each attempt (0 for none).
+    The call holds a scheduler slot through its rate-limit waits and retries, and a
+    stream holds it until it has been read. Raises QuotaExceeded when the current
+    tenant has used up its day.
+    """
+    tenant = current_tenant().id
+    model, model_name, route = admit_call(tenant, model, task, tier)
+    kwargs = request_kwargs(fit_generation_config(generation_config, model_name), safety_settings, timeout, stream)
+
+    limiter = get_rate_limiter(model_name)
+    estimated_tokens = get_token_counter().estimate(prompt)
+    span = Span("model_call", model_name, stream=stream or None, retries=0, tenant=tenant, **route)
+    scheduler = get_scheduler()
+    scheduler.acquire(tenant)
+    try:
+        response = call_with_retry(
+            lambda: model.generate_content(prompt, **kwargs),
+            limiter=limiter,
+            tokens=estimated_tokens,
+            max_retries=MAX_RETRIES,
+            on_retry=_retry_reporter(span),
+        )
+    except BaseException as e:
+        scheduler.release(tenant)
+        span.finish(e)
+        raise
+
+    _adjust_limiter(limiter, response, estimated_tokens)
+    if stream:
+        response = MeteredStream(response, span, on_close=lambda: scheduler.release(tenant))
+    else:
+        scheduler.release(tenant)
+        finish_call(span, response)
+    response.served_model = model_name
+    return response
+
+
+async def generate_content_async(prompt: str, generation_config: dict = None, safety_settings: list = None,
+                                 model=None, timeout: float = REQUEST_TIMEOUT_SECONDS, task: str = "analysis",
+                                 tier: str = None):
+    """Async counterpart of generate_content() (without streaming).
+
+    Waiting for the rate limiter or a retry backoff doesn't block the event loop, and
+    neither does the file I/O around the call: the quota check, the routing history
+    and the metrics and usage records run in the default executor.
+    ``timeout`` bounds each attempt both in the SDK and with ``asyncio.wait_for``;
+    cancelling the awaiting task cancels the request in flight.
+    """
+    loop = asyncio.get_running_loop()
+    tenant = current_tenant().id
+    model, model_name, route = await loop.run_in_executor(None, bind(admit_call), tenant, model, task, tier)
+    kwargs = request_kwargs(fit_generation_config(generation_config, model_name), safety_settings, timeout)
+
+    def attempt():
+        call = model.generate_content_async(prompt, **kwargs)
+        return asyncio.wait_for(call, timeout) if timeout else call
+
+    limiter = get_rate_limiter(model_name)
+    estimated_tokens = get_token_counter().estimate(prompt)
+    span = Span("model_call", model_name, retries=0, tenant=tenant, **route)
+    try:
+        async with get_scheduler().slot_async(tenant):
+            response = await call_with_retry_async(
+                attempt,
+                limiter=limiter,
+                tokens=estimated_tokens,
+                max_retries=MAX_RETRIES,
+                on_retry=_retry_reporter(span),
+            )
+    except BaseException as e:  # Includes cancellation
+        loop.run_in_executor(None, span.finish, e)  # Not awaited, so a cancelled call stops right away
+        raise
+
+    _adjust_limiter(limiter, response, estimated_tokens)
+    await loop.run_in_executor(None, finish_call, span, response)
+    response.served_model = model_name
+    return response
+
+
+def served_model(response) -> str:
+    """The model a response from generate_content() came from, after routing and fallbacks."""
+    return getattr(response, "served_model", None) or MODEL_NAME
+
+
+def finish_call(span, response):
+    """Record a (fully consumed) model call in the metrics and its tenant's usage."""
+    metrics = response_metrics(response)
+    span.fields.update(metrics)
+    span.finish()
+    get_usage_meter().charge(span.fields["tenant"], metrics["input_tokens"], metrics["output_tokens"])
+
+
+@functools.lru_cache(maxsize=None)
+def get_event_loop():
+    """Get the process-wide event loop async model calls run on (started on first use)."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="gemini-event-loop", daemon=True).start()
+    return loop
+
+
+def submit(coro):
+    """Schedule ``coro`` on the client event loop; returns a concurrent.futures.Future.
+
+    The coroutine runs as the caller's tenant. Cancelling the returned future cancels
+    the coroutine.
+    """
+    return asyncio.run_coroutine_threadsafe(run_as(current_tenant(), coro), get_event_loop())
+
+
+def run(coro, timeout: float = None):
+    """Run ``coro`` on the client event loop and wait for its result from sync code.
+
+    On timeout the coroutine is cancelled and ``TimeoutError`` is raised.
+    """
+    future = submit(coro)
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise TimeoutError(f"Gemini call did not finish within {timeout}s") from None
+
+
+FINISH_REASONS = {1: "STOP", 2: "MAX_TOKENS", 3: "SAFETY", 4: "RECITATION", 5: "OTHER"}
+
+
+def response_metrics(response) -> dict:
+    """Token usage and finish reason of a (fully consumed) response, for the metrics store."""
+    usage = getattr(response, "usage_metadata", None)
+    candidates = getattr(response, "candidates", None)
+    finish_reason = candidates[0].finish_reason if candidates else None
+    return {
+        "input_tokens": getattr(usage, "prompt_token_count", None),
+        "output_tokens": getattr(usage, "candidates_token_count", None),
+        "cached_tokens": getattr(usage, "cached_content_token_count", None) or None,
+        "finish_reason": FINISH_REASONS.get(finish_reason, getattr(finish_reason, "name", finish_reason)),
+    }
+
+
+class MeteredStream:
+    """A streamed response that records its model call once the stream has been read.
+
+    Usage and finish reason are only known at the end of a stream, so the call's
+    metrics (including time to first chunk) are written then; ``on_close()`` runs once
+    the stream ends, is closed, or is garbage collected without ever being read (an
+    abandoned Streamlit rerun), so the scheduler slot it holds is always given back.
+    Everything else is delegated to the wrapped response.
+    """
+
+    def __init__(self, response, span, on_close=None):
+        self._response = response
+        self._span = span
+        self._on_close = on_close
+
+    def __iter__(self):
+        try:
+            for chunk in self._response:
+                self._span.fields.setdefault("first_chunk_seconds", round(self._span.elapsed(), 6))
+                yield chunk
+        except BaseException as e:
+            self._span.finish(e)
+            raise
+        finally:
+            self.close()
+        finish_call(self._span, self._response)
+
+    def close(self):
+        """Run ``on_close()`` if it hasn't run yet; the stream can't be read after this."""
+        on_close, self._on_close = self.__dict__.get("_on_close"), None
+        if on_close is not None:
+            on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
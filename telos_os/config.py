@@ -0,0 +1,94 @@
+"""Environment-driven configuration shared by the UI, CLI and workers."""
+
+import os
+
+from dotenv import load_dotenv
+
+from telos_os.tokens import model_limits
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+API_KEY = os.environ.get("GEMINI_API_KEY", "")
+MODEL_NAME = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+TELOS_FOLDER = os.environ.get("TELOS_FOLDER", "telos")
+OUTPUT_DIR = "outputs"
+# Pattern files (<name>.md); the patterns/ folder next to the package by default
+PATTERNS_DIR = os.environ.get("PATTERNS_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "patterns"))
+PATTERNS_RELOAD_SECONDS = float(os.environ.get("PATTERNS_RELOAD_SECONDS", "2"))  # 0 = check for edits on every lookup
+OUTPUT_STORE = os.environ.get("OUTPUT_STORE", "files").lower()  # files (markdown per analysis) or sqlite
+OUTPUT_KEEP_LAST = int(os.environ.get("OUTPUT_KEEP_LAST", "0"))  # per source and pattern; 0 keeps everything
+OUTPUT_COALESCE_SECONDS = float(os.environ.get("OUTPUT_COALESCE_SECONDS", "60"))  # identical saves share one file
+VERSIONS_PER_PAGE = int(os.environ.get("VERSIONS_PER_PAGE", "5"))  # View Outputs page size
+MAX_CONCURRENCY = int(os.environ.get("MAX_CONCURRENCY", "4"))
+# Background jobs survive Streamlit reruns; workers share the rate limiter with everything else
+JOBS_DB = os.environ.get("JOBS_DB", os.path.join(".cache", "jobs.sqlite"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", str(MAX_CONCURRENCY)))
+JOB_RETENTION_DAYS = float(os.environ.get("JOB_RETENTION_DAYS", "7"))  # Finished jobs older than this are pruned
+# Multi-user server mode (telos_os/tenants.py): each signed-in user gets their own Telos folder and outputs
+MULTI_USER = os.environ.get("MULTI_USER", "false").lower() in ("1", "true", "yes")
+TENANTS_DIR = os.environ.get("TENANTS_DIR", "tenants")  # <tenant>/telos and <tenant>/outputs
+TENANT_HEADER = os.environ.get("TENANT_HEADER", "")  # user header set by an authenticating proxy; empty = st.login()
+# Model calls in flight at once across every user, job and sweep, shared fairly between users
+MODEL_WORKERS = int(os.environ.get("MODEL_WORKERS", "8"))
+# Per-user daily usage counters and quotas (0 = unlimited); TENANT_QUOTAS overrides them per user
+USAGE_DB = os.environ.get("USAGE_DB", os.path.join(".cache", "usage.sqlite"))
+TENANT_DAILY_CALLS = int(os.environ.get("TENANT_DAILY_CALLS", "0"))
+TENANT_DAILY_TOKENS = int(os.environ.get("TENANT_DAILY_TOKENS", "0"))
+TENANT_QUOTAS = os.environ.get("TENANT_QUOTAS", "")  # user=calls/tokens pairs, e.g. "alice@example.com=200/2000000"
+# Token budgets; per-model limits live in telos_os.tokens.MODEL_LIMITS
+MAX_INPUT_TOKENS = int(os.environ.get("MAX_INPUT_TOKENS", "0"))  # 0 = 90% of the model's context window
+MAX_OUTPUT_TOKENS = int(os.environ.get("MAX_OUTPUT_TOKENS", "8192"))
+SECTION_TOKEN_BUDGET = int(os.environ.get("SECTION_TOKEN_BUDGET", "12000"))
+SEARCH_INDEX_DIR = os.environ.get("SEARCH_INDEX_DIR", os.path.join(".cache", "search"))
+SEARCH_TOP_K = int(os.environ.get("SEARCH_TOP_K", "8"))
+SEARCH_EMBEDDINGS = os.environ.get("SEARCH_EMBEDDINGS", "false").lower() in ("1", "true", "yes")
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "models/text-embedding-004")
+REQUESTS_PER_MINUTE = int(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "60"))
+TOKENS_PER_MINUTE = int(os.environ.get("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", "4"))
+# Model routing (telos_os/routing.py). Every tier defaults to GEMINI_MODEL, so nothing changes until one is set
+MODEL_TIERS = {
+    "deep": os.environ.get("GEMINI_DEEP_MODEL", MODEL_NAME),
+    "standard": MODEL_NAME,
+    "fast": os.environ.get("GEMINI_FAST_MODEL", MODEL_NAME),
+}
+MODEL_ROUTES = os.environ.get("MODEL_ROUTES", "")  # task=tier overrides, e.g. "section=fast,reduce=deep"
+ROUTING_DEGRADE_AT = float(os.environ.get("ROUTING_DEGRADE_AT", "0.8"))  # rate-limit use that sends calls a tier down
+ROUTING_MAX_ERROR_RATE = float(os.environ.get("ROUTING_MAX_ERROR_RATE", "0.5"))  # over the last 15 minutes
+ROUTING_MAX_P95_SECONDS = float(os.environ.get("ROUTING_MAX_P95_SECONDS", "0"))  # 0 = latency doesn't affect routing
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", "600"))  # per attempt; 0 = no deadline
+RESPONSE_CACHE_DIR = os.environ.get("RESPONSE_CACHE_DIR", os.path.join(".cache", "responses"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "500"))
+RESPONSE_CACHE_MAX_AGE_DAYS = float(os.environ.get("RESPONSE_CACHE_MAX_AGE_DAYS", "30"))
+# Per-section partial results of large files, reused when only some sections change
+SECTION_CACHE_DIR = os.environ.get("SECTION_CACHE_DIR", os.path.join(".cache", "sections"))
+SECTION_CACHE_MAX_ENTRIES = int(os.environ.get("SECTION_CACHE_MAX_ENTRIES", "5000"))
+# Context caching for multi-pattern sweeps: auto (provider cache when the model allows it), local or off
+CONTEXT_CACHE = os.environ.get("CONTEXT_CACHE", "auto").lower()
+CONTEXT_CACHE_TTL_SECONDS = int(os.environ.get("CONTEXT_CACHE_TTL_SECONDS", "600"))
+# Batched sweeps: expected answer length used to decide how many patterns share one request
+BATCH_TOKENS_PER_PATTERN = int(os.environ.get("BATCH_TOKENS_PER_PATTERN", "1500"))
+
+# Per-call timings for the Performance page; empty METRICS_FILE disables recording
+METRICS_FILE = os.environ.get("METRICS_FILE", os.path.join(".cache", "metrics.jsonl"))
+METRICS_MAX_BYTES = int(os.environ.get("METRICS_MAX_BYTES", str(5 * 1024 * 1024)))  # rotated past this size
+METRICS_BACKUPS = int(os.environ.get("METRICS_BACKUPS", "3"))
+
+# Generation settings shared by every analysis call (also part of the response cache key)
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "max_output_tokens": min(MAX_OUTPUT_TOKENS, model_limits(MODEL_NAME)["output"]),
+    "candidate_count": 1,
+}
+SECTION_GENERATION_CONFIG = {**GENERATION_CONFIG, "max_output_tokens": min(4096, GENERATION_CONFIG["max_output_tokens"])}
+BATCH_GENERATION_CONFIG = {**GENERATION_CONFIG, "response_mime_type": "application/json"}
+SEARCH_GENERATION_CONFIG = {**GENERATION_CONFIG, "response_mime_type": "application/json"}
+ASSIST_GENERATION_CONFIG = GENERATION_CONFIG
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
@@ -0,0 +1,180 @@
+"""Reusable cached prefixes for sending the same Telos file with many pattern prompts."""
+
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+
+@dataclass
+class CachedContext:
+    """A Telos context stored once and reused by several requests."""
+
+    key: str
+    name: str
+    tokens: int
+    model: object = None  # Model bound to the provider-side cache; None for the local stand-in
+    uses: int = 0
+    tokens_saved: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class ProviderBackend:
+    """Gemini explicit context caching (``google.generativeai.caching.CachedContent``)."""
+
+    def __init__(self, model_name: str, call=None):
+        self.model_name = model_name
+        # ``call(fn, tokens)`` runs the upload, e.g. through the shared rate limiter
+        self.call = call or (lambda fn, tokens: fn())
+
+    def create(self, context: str, ttl_seconds: int, tokens: int = 0):
+        """Upload ``context`` as cached content; returns ``(name, model)``."""
+        import google.generativeai as genai
+
+        cached = self.call(
+            lambda: genai.caching.CachedContent.create(
+                model=self.model_name,
+                contents=[context],
+                ttl=timedelta(seconds=ttl_seconds),
+            ),
+            tokens,
+        )
+        return cached.name, genai.GenerativeModel.from_cached_content(cached_content=cached)
+
+    def delete(self, name: str):
+        import google.generativeai as genai
+
+        genai.caching.CachedContent.get(name).delete()
+
+    @staticmethod
+    def cached_tokens(entry: CachedContext, response) -> int:
+        usage = getattr(response, "usage_metadata", None)
+        return getattr(usage, "cached_content_token_count", 0) or 0
+
+
+class LocalBackend:
+    """Stand-in that stores nothing remotely; the full prompt is still sent.
+
+    It goes through the same prepare/lookup/release lifecycle and reports the tokens
+    a provider cache would have saved, which makes sweeps measurable offline.
+    """
+
+    def create(self, context: str, ttl_seconds: int, tokens: int = 0):
+        return f"local/{hashlib.sha256(context.encode('utf-8')).hexdigest()[:16]}", None
+
+    def delete(self, name: str):
+        pass
+
+    @staticmethod
+    def cached_tokens(entry: CachedContext, response) -> int:
+        return entry.tokens
+
+
+class ContextCache:
+    """Tracks cached contexts by content hash and the input tokens they save.
+
+    Callers that know a context will be reused (a multi-pattern sweep) call
+    ``prepare()`` before fanning out and ``release()`` afterwards; individual requests
+    only ``lookup()``, so a single analysis never pays to create a cache it uses once.
+    A ``backend`` of None disables caching.
+    """
+
+    def __init__(self, backend, count_tokens, min_tokens: int = 0, ttl_seconds: int = 600):
+        self.backend = backend
+        self.count_tokens = count_tokens
+        self.min_tokens = min_tokens
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._refcounts = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.failed = 0
+        self.uses = 0
+        self.tokens_saved = 0
+
+    @staticmethod
+    def _key(context: str) -> str:
+        return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+    def prepare(self, context: str):
+        """Create (or share) the cached prefix for ``context``; returns None if it isn't worth it."""
+        if self.backend is None:
+            return None
+        key = self._key(context)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._refcounts[key] += 1
+                return entry
+
+        tokens = self.count_tokens(context)
+        if tokens < self.min_tokens:
+            return None
+
+        try:
+            name, model = self.backend.create(context, self.ttl_seconds, tokens)
+        except Exception:
+            # Caching is an optimisation; requests fall back to sending the full prompt
+            with self._lock:
+                self.failed += 1
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                # Another caller created it first; keep theirs
+                self._refcounts[key] += 1
+                duplicate = name
+                entry = self._entries[key]
+            else:
+                duplicate = None
+                entry = CachedContext(key=key, name=name, tokens=tokens, model=model)
+                self._entries[key] = entry
+                self._refcounts[key] = 1
+                self.created += 1
+        if duplicate:
+            self._delete(duplicate)
+        return entry
+
+    def lookup(self, context: str):
+        """Return the live cached prefix for ``context``, if a sweep prepared one."""
+        with self._lock:
+            return self._entries.get(self._key(context))
+
+    def release(self, context: str):
+        """Drop one reference; the cache is deleted when the last user releases it."""
+        key = self._key(context)
+        with self._lock:
+            if key not in self._refcounts:
+                return
+            self._refcounts[key] -= 1
+            if self._refcounts[key] > 0:
+                return
+            entry = self._entries.pop(key)
+            del self._refcounts[key]
+        self._delete(entry.name)
+
+    def _delete(self, name: str):
+        try:
+            self.backend.delete(name)
+        except Exception:
+            pass  # The TTL cleans it up anyway
+
+    def record(self, entry: CachedContext, response):
+        """Account for one request that reused ``entry``."""
+        saved = self.backend.cached_tokens(entry, response)
+        with entry.lock:
+            entry.uses += 1
+            entry.tokens_saved += saved
+        with self._lock:
+            self.uses += 1
+            self.tokens_saved += saved
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": len(self._entries),
+                "created": self.created,
+                "failed": self.failed,
+                "uses": self.uses,
+                "tokens_saved": self.tokens_saved,
+            }
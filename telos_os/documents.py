@@ -0,0 +1,84 @@
+"""Parsed Telos documents cached by (path, mtime, size)."""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from telos_os.parsing import extract_goals_from_telos, split_telos_by_sections
+from telos_os.tokens import estimate_tokens
+
+
+@dataclass(frozen=True)
+class TelosDocument:
+    """A Telos file read and parsed once: raw text, sections, goals and token count."""
+
+    path: str
+    mtime: float
+    size: int
+    text: str
+    sections: tuple
+    goals: tuple
+    tokens: int
+
+
+class DocumentCache:
+    """LRU cache of parsed Telos documents.
+
+    Entries are keyed on ``(path, mtime, size)``, so an edited file is re-read and
+    re-parsed on next access while unchanged files cost a single ``os.stat``.
+    ``count_tokens`` measures the text (the local estimator unless a model-specific
+    counter is given).
+    """
+
+    def __init__(self, max_entries: int = 64, count_tokens=estimate_tokens):
+        self.max_entries = max_entries
+        self.count_tokens = count_tokens
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, path: str) -> TelosDocument:
+        """Return the parsed document for ``path``; raises OSError if it can't be read."""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+
+        with self._lock:
+            document = self._entries.get(key)
+            if document is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return document
+            self.misses += 1
+
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+
+        document = TelosDocument(
+            path=path,
+            mtime=stat.st_mtime,
+            size=stat.st_size,
+            text=text,
+            sections=tuple(split_telos_by_sections(text)),
+            goals=tuple(extract_goals_from_telos(text)),
+            tokens=self.count_tokens(text),
+        )
+
+        with self._lock:
+            # Older versions of the same file can never be hit again
+            for stale in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[stale]
+            self._entries[key] = document
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return document
+
+
+_default_cache = DocumentCache()
+
+
+def load_document(path: str) -> TelosDocument:
+    """Load ``path`` through the process-wide document cache."""
+    return _default_cache.load(path)
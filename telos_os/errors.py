@@ -0,0 +1,9 @@
+"""Result types shared by the model layer and output storage."""
+
+
+class ErrorResponse(str):
+    """Markdown error message returned in place of an analysis.
+
+    It renders like any other string, but save_output() recognises it and never
+    persists it as if it were a result.
+    """
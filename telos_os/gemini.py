@@ -0,0 +1,822 @@
+"""Gemini calls: response extraction, caching, map-reduce and concurrent pattern runs."""
+
+import asyncio
+import contextlib
+import functools
+import json
+import sys
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, as_completed, wait
+
+from telos_os.config import (
+    BATCH_GENERATION_CONFIG,
+    BATCH_TOKENS_PER_PATTERN,
+    CONTEXT_CACHE,
+    CONTEXT_CACHE_TTL_SECONDS,
+    GENERATION_CONFIG,
+    MAX_CONCURRENCY,
+    MAX_INPUT_TOKENS,
+    MAX_RETRIES,
+    MODEL_NAME,
+    RESPONSE_CACHE_DIR,
+    RESPONSE_CACHE_MAX_AGE_DAYS,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    SAFETY_SETTINGS,
+    SECTION_CACHE_DIR,
+    SECTION_CACHE_MAX_ENTRIES,
+    SECTION_GENERATION_CONFIG,
+    SECTION_TOKEN_BUDGET,
+)
+from telos_os.client import (
+    generate_content,
+    generate_content_async,
+    get_event_loop,
+    get_model,
+    get_rate_limiter,
+    get_router,
+    get_token_counter,
+    served_model,
+    submit,
+)
+from telos_os.parsing import is_anchor_section, merge_small_sections, split_telos_by_sections
+from telos_os.context_cache import ContextCache, LocalBackend, ProviderBackend
+from telos_os.metrics import Span, timed
+from telos_os.patterns import PATTERNS, get_pattern_registry, prompt_template
+from telos_os.rate_limit import call_with_retry, is_exhausted_quota
+from telos_os.errors import ErrorResponse
+from telos_os.response_cache import ResponseCache
+from telos_os.singleflight import SingleFlight
+from telos_os.tenants import bind
+from telos_os.usage import QuotaExceeded
+
+
+def pattern_name(prompt: str) -> str:
+    """The pattern key for a pattern prompt, or 'custom' for any other prompt."""
+    pattern = get_pattern_registry().find(prompt)
+    return pattern.name if pattern else "custom"
+
+
+def generation_config_for(prompt: str) -> dict:
+    """The pattern's own generation settings, or GENERATION_CONFIG for any other prompt."""
+    pattern = get_pattern_registry().find(prompt)
+    return pattern.generation_config if pattern else GENERATION_CONFIG
+
+
+def tier_for(prompt: str):
+    """The model tier a pattern asks for in its front matter, or None to route by task."""
+    pattern = get_pattern_registry().find(prompt)
+    return pattern.tier if pattern else None
+
+
+def preferred_model(task: str, tier: str = None) -> str:
+    """The model a task is routed to when no tier is under pressure; part of cache keys."""
+    return get_router().candidates(task, tier)[0][1]
+
+
+def analysis_key(prompt: str, context: str) -> str:
+    """Response cache key of a full analysis of ``context`` with ``prompt``."""
+    return ResponseCache.make_key(prompt, context, preferred_model("analysis", tier_for(prompt)),
+                                  generation_config_for(prompt))
+
+
+@functools.lru_cache(maxsize=None)
+def get_response_cache():
+    """Get the process-wide response cache (hit/miss counters survive reruns)."""
+    return ResponseCache(
+        RESPONSE_CACHE_DIR,
+        max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+        max_age_seconds=RESPONSE_CACHE_MAX_AGE_DAYS * 24 * 3600,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_inflight():
+    """Get the analyses currently being generated, which identical requests join."""
+    return SingleFlight()
+
+
+@functools.lru_cache(maxsize=None)
+def get_section_cache():
+    """Get the cache of per-section partial analyses used by the map-reduce path."""
+    return ResponseCache(
+        SECTION_CACHE_DIR,
+        max_entries=SECTION_CACHE_MAX_ENTRIES,
+        max_bytes=200 * 1024 * 1024,
+        max_age_seconds=RESPONSE_CACHE_MAX_AGE_DAYS * 24 * 3600,
+    )
+
+
+def input_token_budget() -> int:
+    """Largest context sent in a single call before falling back to map-reduce."""
+    if MAX_INPUT_TOKENS:
+        return MAX_INPUT_TOKENS
+    # Leave room for the pattern prompt and template around the Telos content
+    return int(get_token_counter().limits["input"] * 0.9)
+
+
+@functools.lru_cache(maxsize=None)
+def get_context_cache():
+    """Get the context cache selected by CONTEXT_CACHE (auto, local or off)."""
+    counter = get_token_counter()
+    if CONTEXT_CACHE == "local":
+        return ContextCache(LocalBackend(), counter.count, ttl_seconds=CONTEXT_CACHE_TTL_SECONDS)
+    if CONTEXT_CACHE == "off":
+        return ContextCache(None, counter.count)
+    backend = ProviderBackend(
+        MODEL_NAME,
+        call=lambda fn, tokens: call_with_retry(fn, limiter=get_rate_limiter(), tokens=tokens, max_retries=MAX_RETRIES),
+    )
+    return ContextCache(backend, counter.count, min_tokens=counter.limits["cache_min"],
+                        ttl_seconds=CONTEXT_CACHE_TTL_SECONDS)
+
+
+def context_block(context: str) -> str:
+    """The Telos file as it opens every prompt, so all patterns share the same prefix."""
+    return f"--- USER CONTEXT (TELOS FILE) ---\n{context}\n"
+
+
+def section_block(content: str) -> str:
+    """One section of a large Telos file as it opens a map-step prompt."""
+    return f"--- SECTION CONTENT ---\n{content}\n"
+
+
+def fit_context(prompt: str, context: str):
+    """The context to send with ``prompt`` in one call, or None if it needs the sectioned path.
+
+    Patterns with ``chunking: truncate`` send the leading whole sections that fit the
+    input budget instead of analyzing every section and synthesizing.
+    """
+    counter = get_token_counter()
+    max_input_tokens = input_token_budget()
+    if counter.fits(context, max_input_tokens):
+        return context
+    pattern = get_pattern_registry().find(prompt)
+    if pattern is None or pattern.chunking != "truncate":
+        return None
+    kept, used = [], 0
+    for section in split_telos_by_sections(context):
+        tokens = counter.estimate(section['content'])
+        if kept and used + tokens > max_input_tokens:
+            break
+        kept.append(section['content'])
+        used += tokens
+    return "\n\n".join(kept)
+
+
+def generate_with_context(block: str, instructions: str, generation_config: dict, stream: bool = False,
+                          task: str = "analysis", tier: str = None):
+    """Send ``block`` followed by ``instructions``; returns ``(response, cached_entry)``.
+
+    The context always comes first and the pattern instructions last, which lets the
+    API reuse the shared prefix across patterns. When a sweep has prepared a cached
+    prefix for ``block`` only the instructions are sent, to the model the cache belongs
+    to; otherwise the call is routed by ``task`` and ``tier``. The caller passes the
+    returned entry to ``get_context_cache().record()`` once the response is complete.
+    """
+    context_cache = get_context_cache()
+    entry = context_cache.lookup(block)
+    if entry is not None and entry.model is not None:
+        try:
+            return generate_content(instructions, generation_config, SAFETY_SETTINGS, stream=stream, model=entry.model,
+                                    task=task), entry
+        except Exception as e:
+            # Expired or deleted cache: send the full prompt instead
+            print(f"⚠️ Cached context {entry.name} unusable ({type(e).__name__}); sending full prompt", file=sys.stderr)
+            entry = None
+    return generate_content(f"{block}\n{instructions}", generation_config, SAFETY_SETTINGS, stream=stream, task=task,
+                            tier=tier), entry
+
+
+async def generate_with_context_async(block: str, instructions: str, generation_config: dict, task: str = "analysis",
+                                      tier: str = None):
+    """Async generate_with_context() (no streaming) for use on the client event loop."""
+    context_cache = get_context_cache()
+    entry = context_cache.lookup(block)
+    if entry is not None and entry.model is not None:
+        try:
+            return await generate_content_async(instructions, generation_config, SAFETY_SETTINGS, model=entry.model,
+                                                task=task), entry
+        except Exception as e:
+            print(f"⚠️ Cached context {entry.name} unusable ({type(e).__name__}); sending full prompt", file=sys.stderr)
+            entry = None
+    return await generate_content_async(f"{block}\n{instructions}", generation_config, SAFETY_SETTINGS, task=task,
+                                        tier=tier), entry
+
+
+def record_context_use(entry, response):
+    """Count the input tokens a cached prefix saved for ``response``."""
+    if entry is not None:
+        get_context_cache().record(entry, response)
+
+
+TRUNCATION_NOTICE = "\n\n✂️ **Response truncated due to maximum token limit.**\n\n💡 *Tip: Try using a shorter Telos file or run a more focused analysis pattern.*"
+
+
+def finish_reason_message(finish_reason) -> str:
+    """Explain a finish reason that left the response without content ('' if it needs no explanation)."""
+    if finish_reason == 2 or finish_reason == 'MAX_TOKENS':
+        return ErrorResponse("⚠️ **Response Truncated**\n\nThe response was cut off because it reached the maximum token limit and returned no content.\n\n**Possible solutions:**\n- Your Telos file might be too long. Try splitting it into smaller sections.\n- The analysis pattern generated too much output. Try a different pattern.\n- Consider using a model with higher token limits (e.g., gemini-1.5-pro).")
+    if finish_reason == 3 or finish_reason == 'SAFETY':
+        return ErrorResponse("🛡️ **Safety Filter Triggered**\n\nThe AI declined to respond due to safety settings. Try rephrasing your content.")
+    if finish_reason == 4 or finish_reason == 'RECITATION':
+        return ErrorResponse("📋 **Recitation Blocked**\n\nThe response was blocked for potential recitation of copyrighted material.")
+    if finish_reason == 5 or finish_reason == 'OTHER':
+        return ErrorResponse(f"⚠️ **Unknown Error**\n\nFinish reason: {finish_reason}\n\nTry running the analysis again or use a different pattern.")
+    return ""
+
+
+def safe_extract_text(response) -> str:
+    """Safely extract text from Gemini response with multiple fallback methods."""
+    try:
+        return response.text
+    except Exception as e:
+        # If .text fails, inspect the candidates.
+        if hasattr(response, "candidates") and response.candidates:
+            candidate = response.candidates[0]
+            
+            # If there's content in parts, return it, even if truncated.
+            if candidate.content and candidate.content.parts:
+                text = "".join(part.text for part in candidate.content.parts if hasattr(part, "text"))
+                if text:  # If we got some text
+                    if candidate.finish_reason == 2 or candidate.finish_reason == 'MAX_TOKENS':
+                        return text + TRUNCATION_NOTICE
+                    return text
+
+            # If no content, explain why based on finish_reason
+            message = finish_reason_message(candidate.finish_reason)
+            if message:
+                return message
+
+        # If we still can't figure it out, show a generic error
+        return ErrorResponse(f"⚠️ **Could not extract text from response**\n\nError: {str(e)}\n\nFinish reason: {getattr(response.candidates[0], 'finish_reason', 'unknown') if hasattr(response, 'candidates') and response.candidates else 'no candidates'}\n\nTry using a shorter Telos file or a different model.")
+
+
+def safe_stream_text(response):
+    """Yield text from a streamed Gemini response as chunks arrive.
+
+    Streaming counterpart of safe_extract_text(): once the stream ends, a notice is
+    yielded if the model stopped because of MAX_TOKENS, SAFETY or another abnormal
+    finish reason, so partial answers are never mistaken for complete ones.
+    """
+    finish_reason = None
+    got_text = False
+    
+    for chunk in response:
+        candidates = getattr(chunk, "candidates", None)
+        if not candidates:
+            continue
+        candidate = candidates[0]
+        if candidate.finish_reason:
+            finish_reason = candidate.finish_reason
+        if candidate.content and candidate.content.parts:
+            text = "".join(part.text for part in candidate.content.parts if hasattr(part, "text"))
+            if text:
+                got_text = True
+                yield text
+    
+    if finish_reason == 2 or finish_reason == 'MAX_TOKENS':
+        yield TRUNCATION_NOTICE if got_text else finish_reason_message(finish_reason)
+    elif got_text:
+        # Blocked part-way through: keep what arrived but say why it stopped
+        message = finish_reason_message(finish_reason)
+        if message:
+            yield "\n\n---\n\n" + message
+    else:
+        yield finish_reason_message(finish_reason) or ErrorResponse("⚠️ **Empty Response**\n\nThe model returned no content. Try running the analysis again.")
+
+
+def is_complete_response(response) -> bool:
+    """Return True if the model finished normally (not truncated, blocked or empty)."""
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        return False
+    return candidates[0].finish_reason in (1, 'STOP')
+
+
+def get_gemini_response(prompt: str, context: str, progress_callback=None, use_cache: bool = True) -> str:
+    """Get response from Gemini with robust error handling and automatic splitting for large files.
+
+    ``progress_callback`` receives status messages for the sectioned path; it is always
+    called from the calling thread.
+
+    Complete responses are stored in the response cache; set ``use_cache`` to False to
+    force a fresh API call (the new answer still refreshes the cache). Identical calls
+    already in flight (same prompt, context, model and settings) are joined rather than
+    sent again, and recorded as ``coalesced``.
+    """
+    with timed("analysis", pattern_name(prompt), cache_hit=False) as span:
+        cache = get_response_cache()
+        cache_key = analysis_key(prompt, context)
+        if use_cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                span["cache_hit"] = True
+                return cached
+        
+        output, shared = get_inflight().do(
+            cache_key, lambda: analyze_uncached(prompt, context, cache_key, span, progress_callback, use_cache)
+        )
+        if shared:
+            span["coalesced"] = True
+            span["error"] = "ErrorResponse" if isinstance(output, ErrorResponse) else None
+        return output
+
+
+def analyze_uncached(prompt: str, context: str, cache_key: str, span: dict, progress_callback=None,
+                     use_cache: bool = True) -> str:
+    """The model calls behind get_gemini_response(), noting what happened in ``span``."""
+    # Check if context is too large for one call (exact count only when it's close)
+    sent = fit_context(prompt, context)
+    if sent is None:
+        span["sectioned"] = True
+        output = analyze_in_sections(prompt, context, progress_callback, use_cache)
+        span["error"] = "ErrorResponse" if isinstance(output, ErrorResponse) else None
+        return output
+    
+    # Normal processing for smaller files
+    try:
+        response, entry = generate_with_context(context_block(sent), instructions_block(prompt),
+                                                generation_config_for(prompt), tier=tier_for(prompt))
+        return finish_analysis(response, entry, cache_key, span)
+    
+    except Exception as e:
+        span["error"] = type(e).__name__
+        return format_api_error(e)
+
+
+async def get_gemini_response_async(prompt: str, context: str, use_cache: bool = True) -> str:
+    """Coroutine version of get_gemini_response() for the client event loop.
+
+    Single-call analyses await the model on the loop, so many can be in flight without
+    a thread each; files that need the sectioned path run it in a worker thread.
+    Cancelling the task cancels the request, unless other callers joined it (see
+    get_gemini_response()), in which case one of them carries on.
+    """
+    with timed("analysis", pattern_name(prompt), cache_hit=False) as span:
+        cache_key = analysis_key(prompt, context)
+        if use_cache:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                span["cache_hit"] = True
+                return cached
+        
+        output, shared = await get_inflight().do_async(
+            cache_key, lambda: analyze_uncached_async(prompt, context, cache_key, span, use_cache)
+        )
+        if shared:
+            span["coalesced"] = True
+            span["error"] = "ErrorResponse" if isinstance(output, ErrorResponse) else None
+        return output
+
+
+async def analyze_uncached_async(prompt: str, context: str, cache_key: str, span: dict, use_cache: bool = True) -> str:
+    """Coroutine version of analyze_uncached()."""
+    # An exact token count is a (blocking) API call, so keep it off the loop
+    loop = asyncio.get_running_loop()
+    sent = await loop.run_in_executor(None, bind(fit_context), prompt, context)
+    if sent is None:
+        span["sectioned"] = True
+        output = await loop.run_in_executor(None, bind(analyze_in_sections), prompt, context, None, use_cache)
+        span["error"] = "ErrorResponse" if isinstance(output, ErrorResponse) else None
+        return output
+    
+    try:
+        response, entry = await generate_with_context_async(context_block(sent), instructions_block(prompt),
+                                                            generation_config_for(prompt), tier=tier_for(prompt))
+        return finish_analysis(response, entry, cache_key, span)
+    
+    except Exception as e:
+        span["error"] = type(e).__name__
+        return format_api_error(e)
+
+
+def finish_analysis(response, entry, cache_key: str, span: dict) -> str:
+    """Extract an analysis from its response, caching it if complete and noting errors in ``span``."""
+    record_context_use(entry, response)
+    output = safe_extract_text(response)
+    if is_complete_response(response):
+        get_response_cache().put(cache_key, output, {"model": served_model(response)})
+    span["error"] = "ErrorResponse" if isinstance(output, ErrorResponse) else None
+    return output
+
+
+def analyze_in_sections(prompt: str, context: str, progress_callback=None, use_cache: bool = True) -> str:
+    """Split a file too large for one call by sections, analyze them in parallel and synthesize one answer.
+
+    Partial results are cached per section, so after an edit only the changed sections
+    are sent again; ``use_cache=False`` re-analyzes every section.
+    """
+    counter = get_token_counter()
+    report = progress_callback or (lambda message: None)
+    report(f"📊 Large file detected (~{counter.estimate(context):,} tokens). Splitting into sections for analysis...")
+    sections = split_telos_by_sections(context)
+    output, complete, model = map_reduce_sections(prompt, sections, report, input_token_budget(), use_cache)
+    if complete:
+        get_response_cache().put(analysis_key(prompt, context), output, {"model": model, "sections": len(sections)})
+    return output
+
+
+def instructions_block(prompt: str) -> str:
+    """The pattern instructions that close an analysis prompt."""
+    return prompt_template(prompt).instructions
+
+
+def format_api_error(error: Exception) -> ErrorResponse:
+    """Turn an API exception into a helpful markdown message."""
+    error_msg = str(error)
+    
+    # Provide helpful error messages
+    if isinstance(error, QuotaExceeded):
+        return ErrorResponse(f"📉 **Daily Quota Reached**\n\n{error_msg}. Your quota resets at midnight.")
+    elif is_exhausted_quota(error):
+        return ErrorResponse("📉 **API Quota Exhausted**\n\nThe Gemini API's daily or billing quota for this key is used up. "
+                             "Try again tomorrow, or check your plan and billing in Google AI Studio.")
+    elif "API_KEY" in error_msg or "authentication" in error_msg.lower():
+        return ErrorResponse("❌ **Authentication Error**\n\nYour API key may be invalid or expired. Check your `.env` file.")
+    elif "quota" in error_msg.lower() or "rate" in error_msg.lower():
+        return ErrorResponse(f"⏸️ **Rate Limit Reached**\n\nStill rate limited after {MAX_RETRIES} retries. Wait a moment and try again, or lower the number of parallel requests.")
+    elif "safety" in error_msg.lower():
+        return ErrorResponse("🛡️ **Safety Filter Triggered**\n\nThe AI declined to respond due to safety settings. Try rephrasing your Telos content.")
+    else:
+        return ErrorResponse(f"❌ **Error**\n\n{error_msg}\n\nIf this persists, check your internet connection and API key.")
+
+
+def stream_gemini_response(prompt: str, context: str, progress_callback=None, use_cache: bool = True):
+    """Yield the analysis text incrementally as the model generates it.
+
+    Cache hits are yielded in one piece. Files large enough to need the sectioned
+    map-reduce path can't be streamed, so their final answer is yielded once it is ready.
+    A caller joining an identical analysis already in flight (see get_gemini_response())
+    gets its full text in one piece when it is done.
+    """
+    # Not timed(): the span stays open across yields, while the caller renders
+    span = Span("analysis", pattern_name(prompt), cache_hit=False, stream=True)
+    try:
+        cache_key = analysis_key(prompt, context)
+        if use_cache:
+            cached = get_response_cache().get(cache_key)
+            if cached is not None:
+                span.fields["cache_hit"] = True
+                yield cached
+                return
+        
+        inflight = get_inflight()
+        while True:
+            flight, leader = inflight.join(cache_key)
+            if leader:
+                break
+            try:
+                output = flight.result()
+            except CancelledError:
+                continue  # The leading caller stopped early; run it ourselves
+            span.fields["coalesced"] = True
+            span.fields["error"] = "ErrorResponse" if isinstance(output, ErrorResponse) else None
+            yield output
+            return
+        
+        output = error = None
+        try:
+            output = yield from stream_uncached(prompt, context, cache_key, span.fields, progress_callback, use_cache)
+        except BaseException as e:  # Including GeneratorExit when the caller stops reading
+            error = e
+            raise
+        finally:
+            inflight.settle(cache_key, flight, output, error)
+    finally:
+        span.finish()
+
+
+def stream_uncached(prompt: str, context: str, cache_key: str, span: dict, progress_callback=None,
+                    use_cache: bool = True):
+    """The model calls behind stream_gemini_response(); yields the pieces and returns the full text."""
+    sent = fit_context(prompt, context)
+    if sent is None:
+        span["sectioned"] = True
+        output = analyze_in_sections(prompt, context, progress_callback, use_cache)
+        yield output
+        return output
+    
+    pieces = []
+    try:
+        response, entry = generate_with_context(context_block(sent), instructions_block(prompt),
+                                                generation_config_for(prompt), stream=True, tier=tier_for(prompt))
+        for piece in safe_stream_text(response):
+            pieces.append(piece)
+            yield piece
+    except Exception as e:
+        span["error"] = type(e).__name__
+        message = ErrorResponse("\n\n---\n\n" + format_api_error(e) if pieces else format_api_error(e))
+        yield message
+        return ErrorResponse("".join(pieces) + message)
+    
+    # The streamed response accumulates the chunks, so its final finish reason and usage are known here
+    record_context_use(entry, response)
+    output = pieces[0] if len(pieces) == 1 else "".join(pieces)  # One piece keeps an ErrorResponse's type
+    if is_complete_response(response):
+        get_response_cache().put(cache_key, output, {"model": served_model(response)})
+    return output
+
+
+def generate_model_response(full_prompt: str, generation_config: dict, task: str = "analysis"):
+    """Send one analysis prompt with the shared safety settings."""
+    return generate_content(full_prompt, generation_config, SAFETY_SETTINGS, task=task)
+
+
+def section_chunks(sections: list, max_input_tokens: int) -> list:
+    """Merge adjacent small sections into the chunks the map step analyzes.
+
+    Chunks break at anchor sections so an edited section leaves most chunks, and their
+    cached partial results, unchanged.
+    """
+    return merge_small_sections(sections, min(SECTION_TOKEN_BUDGET, max_input_tokens), get_token_counter().estimate,
+                                is_boundary=is_anchor_section)
+
+
+def context_blocks(context: str) -> list:
+    """The prompt prefixes every pattern run on ``context`` will send."""
+    max_input_tokens = input_token_budget()
+    if get_token_counter().fits(context, max_input_tokens):
+        return [context_block(context)]
+    chunks = section_chunks(split_telos_by_sections(context), max_input_tokens)
+    return [section_block(chunk['content']) for chunk in chunks]
+
+
+@contextlib.contextmanager
+def cached_contexts(contexts: list):
+    """Keep cached prefixes for ``contexts`` alive while several patterns run on them.
+
+    Only wrap work that reuses each context more than once: creating a cache is an
+    extra request, and it pays off from the second pattern onwards.
+    """
+    context_cache = get_context_cache()
+    prepared = []
+    try:
+        for context in contexts:
+            for block in context_blocks(context):
+                if context_cache.prepare(block) is not None:
+                    prepared.append(block)
+        yield
+    finally:
+        for block in prepared:
+            context_cache.release(block)
+
+
+def map_reduce_sections(prompt: str, sections: list, report, max_input_tokens: int, use_cache: bool = True) -> tuple:
+    """Analyze sections concurrently (map), then synthesize a single answer (reduce).
+
+    Adjacent small sections are merged up to SECTION_TOKEN_BUDGET first so fewer calls
+    are made. Complete partial results are stored in the section cache keyed by the
+    chunk's content, so only new or edited chunks are sent when ``use_cache`` is set;
+    the reduce step always runs over the current set of partials.
+    ``report`` is called from the calling thread with progress messages.
+    Returns ``(output, complete, model)``; ``complete`` is False if any call was cut
+    short or failed, in which case the result should not be cached, and ``model`` is
+    the model that wrote the final text (None if it was reused from the section cache).
+    """
+    counter = get_token_counter()
+    section_cache = get_section_cache()
+    chunks = section_chunks(sections, max_input_tokens)
+    total = len(chunks)
+    partials = [None] * total
+    models = [None] * total  # Model that wrote each partial this run
+    complete = True
+    
+    # Reuse partial results for chunks whose content hasn't changed since the last run
+    section_model = preferred_model("section")
+    keys = [ResponseCache.make_key(prompt, chunk['content'], section_model, SECTION_GENERATION_CONFIG) for chunk in chunks]
+    if use_cache:
+        for i, key in enumerate(keys):
+            partials[i] = section_cache.get(key)
+    stale = [i for i in range(total) if partials[i] is None]
+    if len(stale) < total:
+        report(f"♻️ Reusing {total - len(stale)} of {total} section analyses; analyzing {len(stale)} changed sections...")
+    
+    template = prompt_template(prompt)
+    
+    def analyze_chunk(chunk):
+        response, entry = generate_with_context(section_block(chunk['content']), template.section_instructions,
+                                                SECTION_GENERATION_CONFIG, task="section")
+        record_context_use(entry, response)
+        return response
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENCY, len(stale) or 1))) as executor:
+        futures = {executor.submit(bind(analyze_chunk), chunks[i]): i for i in stale}
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                response = future.result()
+                partials[i] = safe_extract_text(response)
+                models[i] = served_model(response)
+                if is_complete_response(response):
+                    section_cache.put(keys[i], partials[i], {"model": models[i], "header": chunks[i]['header']})
+                else:
+                    complete = False
+            except Exception as e:
+                complete = False
+                partials[i] = format_api_error(e)
+            report(f"Analyzed section {done}/{len(stale)}: {chunks[i]['header'] or 'Introduction'}")
+    
+    failed = sum(isinstance(partial, ErrorResponse) for partial in partials)
+    if failed == total:
+        return partials[0], False, None
+    if total == 1:
+        return partials[0], complete, models[0]
+    
+    # Failed sections are left out of the synthesis and mentioned at the end instead
+    labelled = [
+        f"### {chunk['header'] or 'Introduction'}\n\n{partial}"
+        for chunk, partial in zip(chunks, partials)
+        if not isinstance(partial, ErrorResponse)
+    ]
+    failure_note = f"\n\n---\n\n⚠️ *{failed} of {total} sections could not be analyzed and are not reflected above.*" if failed else ""
+    
+    # Reduce in rounds so the synthesis prompt itself never exceeds the input budget
+    model = None
+    try:
+        while len(labelled) > 1:
+            groups = [[]]
+            for partial in labelled:
+                group_tokens = sum(counter.estimate(p) for p in groups[-1])
+                if groups[-1] and len(groups[-1]) > 1 and group_tokens + counter.estimate(partial) > max_input_tokens:
+                    groups.append([])
+                groups[-1].append(partial)
+            
+            report(f"🧩 Synthesizing {len(labelled)} partial analyses...")
+            reduced = []
+            for group in groups:
+                if len(group) == 1:
+                    reduced.append(group[0])
+                    continue
+                response = generate_model_response(template.reduce_prompt(group), generation_config_for(prompt),
+                                                   task="reduce")
+                synthesis = safe_extract_text(response)
+                if isinstance(synthesis, ErrorResponse):
+                    # A blocked or empty synthesis is not a partial analysis to reduce further or save
+                    return synthesis, False, None
+                complete = complete and is_complete_response(response)
+                reduced.append(synthesis)
+                model = served_model(response)
+            labelled = reduced
+        return labelled[0] + failure_note, complete, model
+    
+    except Exception as e:
+        # Fall back to the per-section results rather than losing them
+        report(f"⚠️ Synthesis failed ({str(e)}); showing per-section results.")
+        combined = "# Analysis Results (Processed in Sections)\n\n" + "\n\n---\n\n".join(
+            f"### {chunk['header'] or 'Introduction'}\n\n{partial}" for chunk, partial in zip(chunks, partials)
+        )
+        return combined, False, None
+
+
+def run_patterns_concurrently(pattern_names: list, context: str, max_workers: int = MAX_CONCURRENCY,
+                              use_cache: bool = True):
+    """Run several patterns against the same context, at most ``max_workers`` at a time.
+
+    Yields ``(pattern, output)`` tuples in completion order so the caller can render
+    and save each result as soon as it arrives. The requests run as coroutines on the
+    client event loop rather than one thread each, and any still pending are cancelled
+    if the caller stops iterating early. The context is cached once for the whole
+    sweep (see cached_contexts()).
+    """
+    # Warm the cached resources in the calling thread before the loop needs them
+    get_model()
+    get_response_cache()
+    get_event_loop()
+    
+    async def new_semaphore():
+        # Created on the loop, which Python < 3.10 requires of asyncio primitives
+        return asyncio.Semaphore(max(1, max_workers))
+    
+    async def analyze(pattern, semaphore):
+        async with semaphore:
+            return await get_gemini_response_async(PATTERNS[pattern], context, use_cache)
+    
+    semaphore = submit(new_semaphore()).result()
+    with cached_contexts([context] if len(pattern_names) > 1 else []):
+        futures = {submit(analyze(pattern, semaphore)): pattern for pattern in pattern_names}
+        try:
+            for future in as_completed(futures):
+                pattern = futures[future]
+                try:
+                    output = future.result()
+                except Exception as e:
+                    output = format_api_error(e)
+                yield pattern, output
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def patterns_per_batch() -> int:
+    """How many pattern answers fit in one response's output token limit."""
+    return max(1, BATCH_GENERATION_CONFIG["max_output_tokens"] // max(1, BATCH_TOKENS_PER_PATTERN))
+
+
+def batch_instructions(pattern_names: list) -> str:
+    """Instructions asking for several patterns at once, answered as one JSON object."""
+    keys = ", ".join(json.dumps(pattern) for pattern in pattern_names)
+    analyses = "\n\n".join(f"### {pattern}\n{PATTERNS[pattern]}" for pattern in pattern_names)
+    return f"""--- INSTRUCTIONS ---
+Run each of the {len(pattern_names)} analyses below on the Telos file at the start of this conversation.
+Treat them as independent requests: follow each one's instructions in full and don't refer to the others.
+Keep each analysis under about {BATCH_TOKENS_PER_PATTERN} tokens.
+
+Respond with ONE JSON object with exactly these keys: {keys}.
+Each value is that analysis written as a Markdown string.
+
+{analyses}
+"""
+
+
+def parse_batched_response(text: str, pattern_names: list) -> dict:
+    """Return ``{pattern: answer}`` for every usable answer in a batched JSON response."""
+    text = text.strip()
+    if text.startswith("```"):
+        # Some models wrap JSON in a code fence despite the mime type
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {
+        pattern: data[pattern].strip()
+        for pattern in pattern_names
+        if isinstance(data.get(pattern), str) and data[pattern].strip()
+    }
+
+
+def run_pattern_batch(pattern_names: list, context: str) -> dict:
+    """Ask for several patterns in one request; returns the answers that could be parsed.
+
+    Patterns missing from the result (truncated, blocked or malformed JSON) are left
+    for the caller to run one by one.
+    """
+    response, entry = generate_with_context(context_block(context), batch_instructions(pattern_names),
+                                            BATCH_GENERATION_CONFIG, task="batch")
+    record_context_use(entry, response)
+    if not is_complete_response(response):
+        return {}
+    
+    answers = parse_batched_response(safe_extract_text(response), pattern_names)
+    cache = get_response_cache()
+    for pattern, answer in answers.items():
+        cache.put(analysis_key(PATTERNS[pattern], context), answer,
+                  {"model": served_model(response), "batched": len(pattern_names)})
+    return answers
+
+
+def run_patterns_batched(pattern_names: list, context: str, max_workers: int = MAX_CONCURRENCY,
+                         use_cache: bool = True, batch_size: int = None):
+    """Like run_patterns_concurrently(), but packs several patterns into each request.
+
+    Patterns are grouped so their answers fit the output token limit, and each group
+    is answered as one JSON object keyed by pattern name. Anything a batch fails to
+    answer is re-run on its own, as are files too large for a single request. Yields
+    ``(pattern, output)`` tuples in completion order.
+    """
+    cache = get_response_cache()
+    pending = []
+    for pattern in pattern_names:
+        cached = cache.get(analysis_key(PATTERNS[pattern], context)) if use_cache else None
+        if cached is not None:
+            yield pattern, cached
+        else:
+            pending.append(pattern)
+    
+    batch_size = batch_size or patterns_per_batch()
+    if len(pending) < 2 or batch_size < 2 or not get_token_counter().fits(context, input_token_budget()):
+        # Keeps use_cache so large files can still reuse their per-section results
+        yield from run_patterns_concurrently(pending, context, max_workers, use_cache=use_cache)
+        return
+    
+    get_model()
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    with cached_contexts([context] if len(batches) > 1 else []), \
+            ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # Values are a list of patterns for batches and a single pattern for fallbacks
+        futures = {executor.submit(bind(run_pattern_batch), batch, context): batch for batch in batches}
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = futures.pop(future)
+                if isinstance(job, str):
+                    try:
+                        output = future.result()
+                    except Exception as e:
+                        output = format_api_error(e)
+                    yield job, output
+                    continue
+                
+                try:
+                    answers = future.result()
+                except Exception as e:
+                    print(f"⚠️ Batched request failed ({type(e).__name__}); running its patterns one by one", file=sys.stderr)
+                    answers = {}
+                for pattern in job:
+                    if pattern in answers:
+                        yield pattern, answers[pattern]
+                    else:
+                        fallback = executor.submit(bind(get_gemini_response), PATTERNS[pattern], context,
+                                                   lambda message: None, False)
+                        futures[fallback] = pattern
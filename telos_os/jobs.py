@@ -0,0 +1,396 @@
+"""Persistent background job queue for analyses that must outlive a Streamlit rerun."""
+
+import functools
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from telos_os.config import JOBS_DB, JOB_RETENTION_DAYS, JOB_WORKERS
+from telos_os.errors import ErrorResponse
+from telos_os.gemini import get_gemini_response
+from telos_os.patterns import PATTERNS
+from telos_os.storage import save_output
+from telos_os.tenants import current_tenant, get_tenant, use_tenant
+
+# Job status: queued -> running -> done | failed | cancelled (queued jobs can be cancelled directly)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sweep TEXT NOT NULL,
+    tenant TEXT NOT NULL DEFAULT 'default',
+    filepath TEXT NOT NULL,
+    pattern TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    use_cache INTEGER NOT NULL DEFAULT 1,
+    status TEXT NOT NULL DEFAULT 'queued',
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    owner_pid INTEGER,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    output_path TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS idx_jobs_sweep ON jobs (sweep);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active ON jobs (filepath, pattern, content_hash)
+    WHERE status IN ('queued', 'running');
+CREATE TABLE IF NOT EXISTS job_contents (
+    content_hash TEXT PRIMARY KEY,
+    text TEXT NOT NULL
+);
+"""
+# Queues created before tenants existed get the column, with their jobs in the default tenant
+MIGRATIONS = [("tenant", "ALTER TABLE jobs ADD COLUMN tenant TEXT NOT NULL DEFAULT 'default'")]
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_jobs_tenant ON jobs (tenant, status);
+CREATE INDEX IF NOT EXISTS idx_jobs_tenant_started ON jobs (tenant, started);
+"""
+
+
+def content_hash(text: str) -> str:
+    """Identify a snapshot of a Telos file's content."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists but belongs to someone else
+    return True
+
+
+class JobQueue:
+    """SQLite-backed queue of (file, pattern) analyses run by a pool of worker threads.
+
+    Jobs snapshot the file content they were submitted with, so an edit made while a
+    sweep is queued doesn't change what it analyzes. An identical (file, pattern,
+    content) job that is still queued or running is reused instead of duplicated.
+    Workers call ``analyze(pattern, context, use_cache)`` and then
+    ``save(pattern, filepath, output)``, which returns the saved path or None for an
+    error response. Several processes may share one database; claiming a job is a
+    single write transaction.
+
+    Each job belongs to the tenant that submitted it and runs as that tenant. A free
+    worker takes the oldest job of the tenant with the fewest jobs running (on a tie,
+    the one that started a job least recently), so one tenant's sweep doesn't hold
+    up everyone else's.
+
+    Finished jobs older than ``retention_seconds`` are pruned when the workers start
+    and then every ``prune_every`` seconds, so the queue doesn't grow with every sweep.
+    """
+
+    PRUNE_EVERY = 3600
+
+    def __init__(self, db_path: str, analyze, save, max_workers: int = 2, poll_seconds: float = 1.0,
+                 retention_seconds: float = 7 * 24 * 3600):
+        self.db_path = db_path
+        self.analyze = analyze
+        self.save = save
+        self.max_workers = max_workers
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self._pruned_at = 0.0
+        self._prune_lock = threading.Lock()
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def _connect(self):
+        # One connection per thread; SQLite serialises the writers
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in MIGRATIONS:
+                if column not in columns:
+                    conn.execute(statement)
+            conn.executescript(INDEXES)
+            self._local.conn = conn
+        return conn
+
+    def submit(self, filepath: str, pattern: str, context: str, sweep: str = None, use_cache: bool = True) -> int:
+        """Queue one analysis and return its job id (an existing active duplicate's id if any)."""
+        return self.submit_many(filepath, [pattern], context, sweep, use_cache)[0]
+
+    def submit_many(self, filepath: str, patterns: list, context: str, sweep: str = None,
+                    use_cache: bool = True) -> list:
+        """Queue several patterns for one file under the same sweep id; returns their job ids.
+
+        The jobs belong to the current tenant.
+        """
+        sweep = sweep or uuid.uuid4().hex
+        tenant = current_tenant().id
+        digest = content_hash(context)
+        conn = self._connect()
+        job_ids = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO job_contents (content_hash, text) VALUES (?, ?)", (digest, context))
+            for pattern in patterns:
+                existing = conn.execute(
+                    "SELECT id FROM jobs WHERE filepath = ? AND pattern = ? AND content_hash = ? "
+                    "AND status IN ('queued', 'running')",
+                    (filepath, pattern, digest),
+                ).fetchone()
+                if existing is not None:
+                    job_ids.append(existing["id"])
+                    continue
+                cursor = conn.execute(
+                    "INSERT INTO jobs (sweep, tenant, filepath, pattern, content_hash, use_cache, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (sweep, tenant, filepath, pattern, digest, int(use_cache), time.time()),
+                )
+                job_ids.append(cursor.lastrowid)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._wakeup.set()
+        return job_ids
+
+    def cancel(self, job_ids: list) -> int:
+        """Cancel jobs; running ones finish their current call but their result is discarded.
+
+        Returns the number of jobs that were still active.
+        """
+        if not job_ids:
+            return 0
+        marks = ",".join("?" * len(job_ids))
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            queued = conn.execute(
+                f"UPDATE jobs SET status = 'cancelled', finished = ? WHERE status = 'queued' AND id IN ({marks})",
+                (time.time(), *job_ids),
+            ).rowcount
+            running = conn.execute(
+                f"UPDATE jobs SET cancel_requested = 1 WHERE status = 'running' AND id IN ({marks})", job_ids
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return queued + running
+
+    def jobs(self, job_ids: list = None, sweep: str = None, status: str = None, limit: int = None) -> list:
+        """Return jobs as dicts, oldest first."""
+        clauses, params = [], []
+        if job_ids is not None:
+            if not job_ids:
+                return []
+            clauses.append(f"id IN ({','.join('?' * len(job_ids))})")
+            params.extend(job_ids)
+        if sweep is not None:
+            clauses.append("sweep = ?")
+            params.append(sweep)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        sql = "SELECT id, sweep, tenant, filepath, pattern, status, cancel_requested, created, started, finished, output_path, error FROM jobs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self._connect().execute(sql, params).fetchall()]
+
+    def progress(self, job_ids: list) -> dict:
+        """Count ``job_ids`` by status."""
+        counts = {status: 0 for status in ("queued", "running", "done", "failed", "cancelled")}
+        for job in self.jobs(job_ids):
+            counts[job["status"]] += 1
+        return counts
+
+    def active_sweeps(self, tenant: str = None) -> list:
+        """Return ``{'sweep', 'filepath', 'job_ids'}`` for sweeps with queued or running jobs, oldest first.
+
+        ``tenant`` limits them to one tenant's sweeps.
+        """
+        sql = ("SELECT sweep, filepath, id FROM jobs WHERE sweep IN "
+               "(SELECT DISTINCT sweep FROM jobs WHERE status IN ('queued', 'running'))")
+        params = []
+        if tenant is not None:
+            sql += " AND tenant = ?"
+            params.append(tenant)
+        rows = self._connect().execute(sql + " ORDER BY id", params).fetchall()
+        sweeps = {}
+        for row in rows:
+            sweeps.setdefault(row["sweep"], {"sweep": row["sweep"], "filepath": row["filepath"], "job_ids": []})
+            sweeps[row["sweep"]]["job_ids"].append(row["id"])
+        return list(sweeps.values())
+
+    def prune(self, max_age_seconds: float = None) -> int:
+        """Delete finished jobs older than ``max_age_seconds`` (default: the retention) and unreferenced content."""
+        if max_age_seconds is None:
+            max_age_seconds = self.retention_seconds
+        conn = self._connect()
+        removed = conn.execute(
+            "DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND finished < ?",
+            (time.time() - max_age_seconds,),
+        ).rowcount
+        conn.execute("DELETE FROM job_contents WHERE content_hash NOT IN (SELECT content_hash FROM jobs)")
+        return removed
+
+    # Workers
+
+    def start(self):
+        """Start the worker threads once per process (safe to call on every rerun)."""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._recover()
+            self._prune_due()
+            for i in range(max(1, self.max_workers)):
+                thread = threading.Thread(target=self._work, name=f"telos-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = None):
+        """Ask the workers to exit after their current job."""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stopping.clear()
+
+    def _prune_due(self):
+        """prune() if no worker has in the last PRUNE_EVERY seconds; errors are only reported."""
+        with self._prune_lock:
+            if self._pruned_at and time.monotonic() - self._pruned_at < self.PRUNE_EVERY:
+                return
+            self._pruned_at = time.monotonic()
+        try:
+            self.prune()
+        except Exception as e:
+            print(f"⚠️ Could not prune old jobs ({type(e).__name__}: {e})", file=sys.stderr)
+
+    def _recover(self):
+        """Requeue jobs left 'running' by a process that no longer exists."""
+        conn = self._connect()
+        for row in conn.execute("SELECT id, owner_pid FROM jobs WHERE status = 'running'").fetchall():
+            if row["owner_pid"] is None or not _pid_alive(row["owner_pid"]):
+                conn.execute("UPDATE jobs SET status = 'queued', owner_pid = NULL, started = NULL WHERE id = ?",
+                             (row["id"],))
+
+    def _claim(self):
+        """Atomically move the next queued job to running; returns ``(job, context)`` or None.
+
+        The next job is the oldest one of the tenant with the fewest jobs running, then
+        of the tenant that started a job least recently.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT jobs.id, tenant, filepath, pattern, use_cache, text FROM jobs "
+                "JOIN job_contents USING (content_hash) WHERE status = 'queued' "
+                "ORDER BY (SELECT COUNT(*) FROM jobs AS running WHERE running.tenant = jobs.tenant "
+                "AND running.status = 'running'), "
+                "(SELECT COALESCE(MAX(started), 0) FROM jobs AS served WHERE served.tenant = jobs.tenant), "
+                "jobs.id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', owner_pid = ?, started = ? WHERE id = ?",
+                         (os.getpid(), time.time(), row["id"]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return dict(row), row["text"]
+
+    def _finish(self, job_id: int, output_path: str = None, error: str = None):
+        conn = self._connect()
+        cancelled = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()["cancel_requested"]
+        if cancelled:
+            status = "cancelled"
+        else:
+            status = "failed" if error else "done"
+        conn.execute("UPDATE jobs SET status = ?, finished = ?, output_path = ?, error = ? WHERE id = ?",
+                     (status, time.time(), output_path, error, job_id))
+        return status
+
+    def _is_cancel_requested(self, job_id: int) -> bool:
+        row = self._connect().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def _work(self):
+        while not self._stopping.is_set():
+            self._prune_due()
+            try:
+                claimed = self._claim()
+            except Exception as e:  # A locked or unreadable database must not end the worker
+                print(f"⚠️ Job queue unavailable ({e}); retrying", file=sys.stderr)
+                claimed = None
+            if claimed is None:
+                # Other processes may submit too, so poll as well as waiting for a local submit
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+                continue
+
+            job, context = claimed
+            try:
+                with use_tenant(get_tenant(job["tenant"])):
+                    outcome = self._run(job, context)
+            except Exception as e:
+                outcome = {"error": f"{type(e).__name__}: {e}"}
+            self._record(job["id"], outcome)
+
+    def _run(self, job: dict, context: str) -> dict:
+        """Analyze and save one claimed job (as its tenant); returns the outcome as _finish() arguments."""
+        output = self.analyze(job["pattern"], context, bool(job["use_cache"]))
+        if self._is_cancel_requested(job["id"]):
+            return {}
+        output_path = self.save(job["pattern"], job["filepath"], output)
+        if output_path is None:
+            return {"error": output.splitlines()[0] if isinstance(output, ErrorResponse) and output else "Not saved"}
+        return {"output_path": output_path}
+
+    def _record(self, job_id: int, outcome: dict, attempts: int = 3):
+        """_finish() a job, retrying a locked or failing database, without ever raising.
+
+        A job that still can't be recorded stays 'running' until _recover() requeues it
+        after a restart; the worker itself carries on with the next job.
+        """
+        for attempt in range(1, attempts + 1):
+            try:
+                self._finish(job_id, **outcome)
+                return
+            except Exception as e:
+                print(f"⚠️ Could not record job {job_id} ({type(e).__name__}: {e}); attempt {attempt}/{attempts}",
+                      file=sys.stderr)
+                if attempt < attempts:
+                    self._stopping.wait(self.poll_seconds)
+
+
+@functools.lru_cache(maxsize=None)
+def get_job_queue():
+    """Get the process-wide job queue running analyses through Gemini, with workers started."""
+    queue = JobQueue(
+        JOBS_DB,
+        analyze=lambda pattern, context, use_cache: get_gemini_response(
+            PATTERNS[pattern], context, lambda message: None, use_cache
+        ),
+        save=save_output,
+        max_workers=JOB_WORKERS,
+        retention_seconds=JOB_RETENTION_DAYS * 24 * 3600,
+    )
+    queue.start()
+    return queue
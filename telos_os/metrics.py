@@ -0,0 +1,326 @@
+"""Per-call timings for model calls, analyses and heavy helpers, kept in a rotating JSONL file.
+
+Each record is one JSON line: ``kind`` (model_call, analysis, function, page), ``name``,
+start ``time`` (epoch seconds), ``seconds`` and whatever fields the call site adds
+(token counts, cache hits, retries, finish reason). Records nested in the same thread
+share a trace id, so they can be exported as OpenTelemetry spans with to_otlp().
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import math
+import os
+import secrets
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+
+from telos_os.config import METRICS_BACKUPS, METRICS_FILE, METRICS_MAX_BYTES, MULTI_USER
+from telos_os.tenants import current_tenant
+
+# (trace_id, span_id) of the span currently open in this thread
+_current_span = contextvars.ContextVar("telos_metrics_span", default=None)
+
+
+class MetricsStore:
+    """Append-only JSONL metrics file rotated like a logging RotatingFileHandler.
+
+    Once ``path`` grows past ``max_bytes`` it is renamed to ``path.1`` (older files
+    shift up to ``path.<backups>``, the oldest is dropped), so disk use stays bounded
+    at roughly ``max_bytes * (backups + 1)``. An empty ``path`` disables recording.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 5 * 1024 * 1024, backups: int = 3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def record(self, kind: str, name: str, seconds: float, started: float = None, **fields):
+        """Append one record; ``started`` defaults to ``seconds`` before now."""
+        if not self.enabled:
+            return
+        entry = {
+            "time": round(started if started is not None else time.time() - seconds, 6),
+            "kind": kind,
+            "name": name,
+            "seconds": round(seconds, 6),
+            **{key: value for key, value in fields.items() if value is not None},
+        }
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                size = f.tell()
+            if size > self.max_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        for i in range(self.backups, 0, -1):
+            source = self.path if i == 1 else f"{self.path}.{i - 1}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i}")
+        if self.backups <= 0:
+            os.remove(self.path)
+
+    def _files(self) -> list:
+        """Metrics files oldest first."""
+        files = [f"{self.path}.{i}" for i in range(self.backups, 0, -1)] + [self.path]
+        return [path for path in files if os.path.exists(path)]
+
+    def records(self, since: float = None, kinds: tuple = None) -> list:
+        """Return records (oldest first) started at or after ``since``, optionally of some ``kinds``."""
+        if not self.enabled:
+            return []
+        results = []
+        with self._lock:
+            files = self._files()
+        for path in files:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+            except FileNotFoundError:
+                continue  # Rotated away while listing
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # A line cut short by a crash
+                if since is not None and entry.get("time", 0) < since:
+                    continue
+                if kinds and entry.get("kind") not in kinds:
+                    continue
+                results.append(entry)
+        return results
+
+    def clear(self) -> int:
+        """Delete every metrics file; returns the number removed."""
+        with self._lock:
+            files = self._files()
+            for path in files:
+                os.remove(path)
+        return len(files)
+
+
+@functools.lru_cache(maxsize=None)
+def get_metrics_store():
+    """Get the process-wide metrics store (METRICS_FILE, empty to disable)."""
+    return MetricsStore(METRICS_FILE, max_bytes=METRICS_MAX_BYTES, backups=METRICS_BACKUPS)
+
+
+class Span:
+    """One timing, started on creation and written to the metrics store by finish().
+
+    Most call sites use timed(); a Span is for work that outlives a ``with`` block,
+    such as a streamed response that is consumed later.
+    """
+
+    def __init__(self, kind: str, name: str, **fields):
+        parent = _current_span.get()
+        self.kind = kind
+        self.name = name
+        self.fields = dict(fields)
+        if MULTI_USER:
+            # Lets each user's Performance page show only their own records
+            self.fields.setdefault("tenant", current_tenant().id)
+        self.trace_id = parent[0] if parent else secrets.token_hex(16)
+        self.parent_id = parent[1] if parent else None
+        self.span_id = secrets.token_hex(8)
+        self.started = time.time()
+        self._started_perf = time.perf_counter()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started_perf
+
+    def finish(self, error: BaseException = None):
+        """Record the span; ``error`` is stored by type name."""
+        if error is not None:
+            self.fields.setdefault("error", type(error).__name__)
+        get_metrics_store().record(self.kind, self.name, self.elapsed(), started=self.started, trace_id=self.trace_id,
+                                   span_id=self.span_id, parent_id=self.parent_id, **self.fields)
+
+
+@contextlib.contextmanager
+def timed(kind: str, name: str, **fields):
+    """Record how long the block takes; yields a dict the block can add fields to.
+
+    An exception escaping the block is recorded as ``error`` (its type name) and
+    re-raised. Blocks nested in the same thread become child spans of the outer one.
+    """
+    span = Span(kind, name, **fields)
+    token = _current_span.set((span.trace_id, span.span_id))
+    error = None
+    try:
+        yield span.fields
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        span.finish(error)
+
+
+def instrumented(kind: str = "function", name: str = None):
+    """Decorator form of timed(); the record is named after the function by default."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(kind, name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Summaries for the Performance page and the CLI
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile (``q`` in 0-100) of ``values``; 0.0 when empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(q / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def latency_by_name(records: list, kind: str) -> list:
+    """Per-name call count, p50/p95/max seconds, cache hits and coalesced calls for one kind, slowest p95 first."""
+    groups = defaultdict(list)
+    for entry in records:
+        if entry.get("kind") == kind:
+            groups[entry["name"]].append(entry)
+    rows = []
+    for name, entries in groups.items():
+        seconds = [entry["seconds"] for entry in entries]
+        rows.append({
+            "name": name,
+            "calls": len(entries),
+            "p50_seconds": round(percentile(seconds, 50), 3),
+            "p95_seconds": round(percentile(seconds, 95), 3),
+            "max_seconds": round(max(seconds), 3),
+            "cache_hits": sum(1 for entry in entries if entry.get("cache_hit")),
+            "coalesced": sum(1 for entry in entries if entry.get("coalesced")),
+            "errors": sum(1 for entry in entries if entry.get("error")),
+        })
+    rows.sort(key=lambda row: row["p95_seconds"], reverse=True)
+    return rows
+
+
+def tokens_by_day(records: list) -> list:
+    """Model-call token totals per local day, oldest first."""
+    days = defaultdict(lambda: {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "retries": 0})
+    for entry in records:
+        if entry.get("kind") != "model_call":
+            continue
+        day = days[datetime.fromtimestamp(entry["time"]).strftime("%Y-%m-%d")]
+        day["calls"] += 1
+        for field in ("input_tokens", "output_tokens", "cached_tokens", "retries"):
+            day[field] += entry.get(field) or 0
+    return [{"day": day, **totals} for day, totals in sorted(days.items())]
+
+
+def calls_by_route(records: list) -> list:
+    """Model calls per task, tier and model: count, p95 seconds, tokens and calls sent down a tier."""
+    groups = defaultdict(list)
+    for entry in records:
+        if entry.get("kind") == "model_call":
+            groups[(entry.get("task") or "analysis", entry.get("tier") or "", entry["name"])].append(entry)
+    rows = []
+    for (task, tier, model), entries in sorted(groups.items()):
+        rows.append({
+            "task": task,
+            "tier": tier,
+            "model": model,
+            "calls": len(entries),
+            "p95_seconds": round(percentile([entry["seconds"] for entry in entries], 95), 3),
+            "input_tokens": sum(entry.get("input_tokens") or 0 for entry in entries),
+            "output_tokens": sum(entry.get("output_tokens") or 0 for entry in entries),
+            "degraded": sum(1 for entry in entries if entry.get("degraded")),
+        })
+    return rows
+
+
+def slowest(records: list, kind: str, limit: int = 10) -> list:
+    """The ``limit`` slowest records of one kind."""
+    return sorted((entry for entry in records if entry.get("kind") == kind),
+                  key=lambda entry: entry["seconds"], reverse=True)[:limit]
+
+
+# OpenTelemetry export (OTLP/JSON trace format)
+
+# Record fields that have an OpenTelemetry GenAI semantic-convention name
+OTEL_ATTRIBUTES = {
+    "model": "gen_ai.request.model",
+    "input_tokens": "gen_ai.usage.input_tokens",
+    "output_tokens": "gen_ai.usage.output_tokens",
+    "finish_reason": "gen_ai.response.finish_reasons",
+}
+SPAN_FIELDS = {"time", "kind", "name", "seconds", "trace_id", "span_id", "parent_id"}
+
+
+def _otel_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(records: list, service_name: str = "telos-os") -> dict:
+    """Convert records into an OTLP/JSON ``ExportTraceServiceRequest`` body.
+
+    The result can be POSTed to a collector's ``/v1/traces`` endpoint or loaded by any
+    tool that reads OTLP JSON. Records from before trace ids were kept get fresh ones.
+    """
+    spans = []
+    for entry in records:
+        start_ns = int(entry["time"] * 1e9)
+        attributes = [{"key": "telos.kind", "value": {"stringValue": entry["kind"]}}]
+        for key, value in entry.items():
+            if key not in SPAN_FIELDS:
+                attributes.append({"key": OTEL_ATTRIBUTES.get(key, f"telos.{key}"), "value": _otel_value(value)})
+        span = {
+            "traceId": entry.get("trace_id") or secrets.token_hex(16),
+            "spanId": entry.get("span_id") or secrets.token_hex(8),
+            "name": f"{entry['kind']} {entry['name']}",
+            # SPAN_KIND_CLIENT for calls that leave the process, INTERNAL otherwise
+            "kind": 3 if entry["kind"] == "model_call" else 1,
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(start_ns + int(entry["seconds"] * 1e9)),
+            "attributes": attributes,
+            "status": {"code": 2, "message": entry["error"]} if entry.get("error") else {"code": 1},
+        }
+        if entry.get("parent_id"):
+            span["parentSpanId"] = entry["parent_id"]
+        spans.append(span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "telos_os.metrics"}, "spans": spans}],
+        }]
+    }
+
+
+def export_otlp(records: list, endpoint: str, timeout: float = 10.0) -> int:
+    """POST records to an OTLP/HTTP collector (e.g. ``http://localhost:4318``); returns the HTTP status."""
+    url = endpoint.rstrip("/")
+    if not url.endswith("/v1/traces"):
+        url += "/v1/traces"
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(to_otlp(records)).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status
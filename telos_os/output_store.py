@@ -0,0 +1,179 @@
+"""Single-file SQLite store for saved analyses, with compressed and deduplicated bodies."""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # Optional: gzip-compatible zlib is always available
+    zstandard = None
+
+# Outputs kept in the store are addressed as store:<pattern>/<filename>
+STORE_PREFIX = "store:"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    raw_size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    pattern TEXT NOT NULL,
+    source TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    header TEXT NOT NULL,
+    hash TEXT NOT NULL REFERENCES bodies (hash)
+);
+CREATE INDEX IF NOT EXISTS idx_entries_source ON entries (source, pattern, timestamp);
+CREATE INDEX IF NOT EXISTS idx_entries_hash ON entries (hash);
+"""
+
+
+def is_store_path(filepath: str) -> bool:
+    """True for paths that point into the output store rather than the filesystem."""
+    return filepath.startswith(STORE_PREFIX)
+
+
+def store_path(pattern: str, filename: str) -> str:
+    return f"{STORE_PREFIX}{pattern}/{filename}"
+
+
+def numbered_filename(filename: str, n: int) -> str:
+    """``filename`` for the ``n``-th output saved under the same name (``name-2.md``, ``name-3.md``, ...)."""
+    if n <= 1:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}-{n}{ext}"
+
+
+def compress(text: str, codec: str) -> bytes:
+    data = text.encode("utf-8")
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def decompress(data: bytes, codec: str) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This output was compressed with zstd; install the zstandard package "
+                               "(pip install zstandard) to read it")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    return zlib.decompress(data).decode("utf-8")
+
+
+class OutputStore:
+    """Saved analyses as rows of one SQLite file instead of one markdown file each.
+
+    Bodies are compressed (zstd when ``zstandard`` is installed, zlib otherwise) and
+    stored once per content hash, so re-runs that produce identical text cost one
+    small row; each run's metadata header is kept next to its entry. Entries keep
+    the ``<pattern>/<source>_<timestamp>.md`` names of the file layout and can be
+    exported back to it.
+    """
+
+    def __init__(self, db_path: str, codec: str = None):
+        self.db_path = db_path
+        self.codec = codec or ("zstd" if zstandard is not None else "zlib")
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def put(self, pattern: str, source: str, filename: str, timestamp: datetime, header: str, text: str) -> str:
+        """Store an analysis (``header`` + ``text``) and return its ``store:`` path.
+
+        An entry already stored under ``filename`` is never replaced; the new one gets
+        a numbered name instead (see numbered_filename()).
+        """
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                if conn.execute("SELECT 1 FROM bodies WHERE hash = ?", (digest,)).fetchone() is None:
+                    conn.execute(
+                        "INSERT INTO bodies (hash, codec, raw_size, data) VALUES (?, ?, ?, ?)",
+                        (digest, self.codec, len(text.encode("utf-8")), compress(text, self.codec)),
+                    )
+                n = 1
+                while True:
+                    path = store_path(pattern, numbered_filename(filename, n))
+                    try:
+                        conn.execute(
+                            "INSERT INTO entries (path, pattern, source, timestamp, header, hash) VALUES (?, ?, ?, ?, ?, ?)",
+                            (path, pattern, source, timestamp.strftime("%Y-%m-%d %H:%M:%S"), header, digest),
+                        )
+                        break
+                    except sqlite3.IntegrityError:
+                        n += 1
+        return path
+
+    def get(self, path: str) -> str:
+        """Return the text stored at ``path``; raises FileNotFoundError if it isn't there."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT header, codec, data FROM entries JOIN bodies USING (hash) WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None:
+            raise FileNotFoundError(path)
+        return row["header"] + decompress(row["data"], row["codec"])
+
+    def delete(self, path: str):
+        """Remove an entry, and its body once no other entry shares it."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                row = conn.execute("SELECT hash FROM entries WHERE path = ?", (path,)).fetchone()
+                if row is None:
+                    raise FileNotFoundError(path)
+                conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+                if conn.execute("SELECT 1 FROM entries WHERE hash = ? LIMIT 1", (row["hash"],)).fetchone() is None:
+                    conn.execute("DELETE FROM bodies WHERE hash = ?", (row["hash"],))
+
+    def entries(self) -> list:
+        """Return ``{'path', 'pattern', 'source', 'timestamp'}`` for every stored analysis."""
+        with self._lock:
+            rows = self._connect().execute("SELECT path, pattern, source, timestamp FROM entries").fetchall()
+        return [
+            dict(row, timestamp=datetime.strptime(row["timestamp"], "%Y-%m-%d %H:%M:%S"))
+            for row in rows
+        ]
+
+    def export(self, dest_dir: str) -> int:
+        """Write every entry as ``dest_dir/<pattern>/<filename>``; returns the number written."""
+        written = 0
+        for entry in self.entries():
+            relative = entry["path"][len(STORE_PREFIX):]
+            target = os.path.join(dest_dir, *relative.split("/"))
+            Path(os.path.dirname(target)).mkdir(parents=True, exist_ok=True)
+            with open(target, "w", encoding="utf-8") as f:
+                f.write(self.get(entry["path"]))
+            os.utime(target, (entry["timestamp"].timestamp(), entry["timestamp"].timestamp()))
+            written += 1
+        return written
+
+    def stats(self) -> dict:
+        """Entry and body counts with raw vs stored sizes in bytes."""
+        with self._lock:
+            conn = self._connect()
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            bodies, raw, stored = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM bodies"
+            ).fetchone()
+            logical = conn.execute(
+                "SELECT COALESCE(SUM(raw_size), 0) FROM entries JOIN bodies USING (hash)"
+            ).fetchone()[0]
+        return {"entries": entries, "bodies": bodies, "logical_bytes": logical, "raw_bytes": raw, "stored_bytes": stored}
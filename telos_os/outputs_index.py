@@ -0,0 +1,327 @@
+"""SQLite manifest of saved analyses so pages don't have to rescan ``outputs/``."""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, time
+
+# Saved outputs are named <source>_YYYY-MM-DD_HH-MM-SS-ffffff.md, with -<n> appended to a name
+# already taken; outputs saved by older versions have no microseconds
+OUTPUT_FILENAME_RE = re.compile(
+    r"^(?P<source>.+)_(?P<date>\d{4}-\d{2}-\d{2})_(?P<time>\d{2}-\d{2}-\d{2})(?:-\d{6})?(?:-\d+)?$"
+)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+PREVIEW_CHARS = 280
+# Rows for outputs kept in the SQLite output store are maintained by sync_store(), not by folder scans
+ON_DISK = "filepath NOT LIKE 'store:%'"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    filepath TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    pattern TEXT NOT NULL,
+    source TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    preview TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outputs_source ON outputs (source, pattern, timestamp);
+CREATE INDEX IF NOT EXISTS idx_outputs_timestamp ON outputs (timestamp);
+CREATE TABLE IF NOT EXISTS pattern_dirs (
+    pattern TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+-- Analytics rollup: outputs per (source, pattern, day), kept current by the triggers below
+CREATE TABLE IF NOT EXISTS daily_counts (
+    source TEXT NOT NULL,
+    pattern TEXT NOT NULL,
+    day TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (source, pattern, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_daily_counts_day ON daily_counts (day);
+CREATE TRIGGER IF NOT EXISTS outputs_rollup_insert AFTER INSERT ON outputs BEGIN
+    INSERT INTO daily_counts (source, pattern, day, n) VALUES (NEW.source, NEW.pattern, substr(NEW.timestamp, 1, 10), 1)
+    ON CONFLICT (source, pattern, day) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS outputs_rollup_delete AFTER DELETE ON outputs BEGIN
+    UPDATE daily_counts SET n = n - 1
+    WHERE source = OLD.source AND pattern = OLD.pattern AND day = substr(OLD.timestamp, 1, 10);
+    DELETE FROM daily_counts
+    WHERE source = OLD.source AND pattern = OLD.pattern AND day = substr(OLD.timestamp, 1, 10) AND n <= 0;
+END;
+"""
+# GROUP BY columns rollup() accepts
+ROLLUP_GROUPS = ("source", "pattern", "day")
+
+
+def parse_output_filename(filename: str, filepath: str) -> tuple:
+    """Return ``(source_name, timestamp)`` for a saved output file."""
+    name_without_ext = filename[:-3] if filename.endswith('.md') else filename
+    match = OUTPUT_FILENAME_RE.match(name_without_ext)
+    if match:
+        try:
+            timestamp = datetime.strptime(f"{match['date']}_{match['time']}", "%Y-%m-%d_%H-%M-%S")
+            return match['source'], timestamp
+        except ValueError:
+            pass
+
+    # Fallback: use whole filename as source and the file's mtime as its date
+    return name_without_ext, datetime.fromtimestamp(os.path.getmtime(filepath))
+
+
+def make_preview(text: str, max_chars: int = PREVIEW_CHARS) -> str:
+    """Return the start of a saved analysis as one line of plain text, skipping its metadata header."""
+    # Saved outputs start with a title and metadata block closed by a "---" rule
+    _, separator, body = text.partition("\n---\n")
+    text = body if separator else text
+    text = re.sub(r"[#*_`>|]+", "", text)
+    text = " ".join(text.split())
+    return text[:max_chars].rstrip() + ("…" if len(text) > max_chars else "")
+
+
+def read_preview(filepath: str, max_chars: int = PREVIEW_CHARS) -> str:
+    """make_preview() for a markdown file, reading only its first few KB."""
+    try:
+        with open(filepath, "r", encoding="utf-8", errors="replace") as f:
+            return make_preview(f.read(max_chars * 4 + 512), max_chars)
+    except OSError:
+        return ""
+
+
+class OutputsIndex:
+    """Incrementally maintained index of the markdown files under an outputs folder.
+
+    ``save_output()`` and the delete actions keep the index current with ``add()`` and
+    ``remove()``. ``reconcile()`` catches changes made behind the app's back by comparing
+    each pattern folder's mtime with the one recorded at its last scan, so only folders
+    that actually changed are listed again.
+
+    Triggers keep a per-(source, pattern, day) count in step with every insert and
+    delete, so analytics read that rollup (see rollup()) instead of every output.
+    """
+
+    def __init__(self, output_dir: str, db_path: str = None):
+        self.output_dir = output_dir
+        self.db_path = db_path or os.path.join(output_dir, ".index.sqlite")
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            # INSERT OR REPLACE must fire the delete trigger too, or replaced rows are counted twice
+            self._conn.execute("PRAGMA recursive_triggers = ON")
+            self._conn.executescript(SCHEMA)
+            self._migrate(self._conn)
+        return self._conn
+
+    def _migrate(self, conn):
+        """Bring indexes created by older versions up to date.
+
+        Adds and fills the preview column, and builds the analytics rollup once for
+        outputs indexed before its triggers existed.
+        """
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(outputs)")}
+        if 'preview' not in columns:
+            with conn:
+                conn.execute("ALTER TABLE outputs ADD COLUMN preview TEXT")
+                for row in conn.execute("SELECT filepath FROM outputs").fetchall():
+                    conn.execute("UPDATE outputs SET preview = ? WHERE filepath = ?",
+                                 (read_preview(row['filepath']), row['filepath']))
+
+        # The triggers keep the two in step, so an empty rollup next to indexed outputs means it predates them
+        if conn.execute("SELECT 1 FROM daily_counts LIMIT 1").fetchone() is None:
+            with conn:
+                conn.execute(
+                    "INSERT INTO daily_counts (source, pattern, day, n) "
+                    "SELECT source, pattern, substr(timestamp, 1, 10), COUNT(*) FROM outputs GROUP BY 1, 2, 3"
+                )
+
+    def add(self, filepath: str, pattern: str, source: str, timestamp: datetime, preview: str = None):
+        """Record a newly saved output (the preview is read from ``filepath`` if not given)."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO outputs (filepath, filename, pattern, source, timestamp, preview) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (filepath, os.path.basename(filepath), pattern, source, timestamp.strftime(TIMESTAMP_FORMAT),
+                     read_preview(filepath) if preview is None else preview),
+                )
+
+    def remove(self, filepath: str):
+        """Forget a deleted output."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM outputs WHERE filepath = ?", (filepath,))
+
+    def sync_store(self, store) -> int:
+        """Index entries of an OutputStore that are missing from the index; returns how many."""
+        with self._lock:
+            conn = self._connect()
+            indexed = {row['filepath'] for row in conn.execute(f"SELECT filepath FROM outputs WHERE NOT ({ON_DISK})")}
+        missing = [entry for entry in store.entries() if entry['path'] not in indexed]
+        for entry in missing:
+            self.add(entry['path'], entry['pattern'], entry['source'], entry['timestamp'],
+                     preview=make_preview(store.get(entry['path'])))
+        return len(missing)
+
+    def reconcile(self) -> int:
+        """Rescan pattern folders whose mtime changed since the last pass.
+
+        Returns the number of folders that were rescanned.
+        """
+        if not os.path.isdir(self.output_dir):
+            return 0
+
+        current_dirs = {}
+        for entry in os.scandir(self.output_dir):
+            if entry.is_dir() and not entry.name.startswith('.'):
+                current_dirs[entry.name] = entry.stat().st_mtime
+
+        with self._lock:
+            conn = self._connect()
+            known_dirs = {row['pattern']: row['mtime'] for row in conn.execute("SELECT pattern, mtime FROM pattern_dirs")}
+            rescanned = 0
+
+            with conn:
+                for pattern in set(known_dirs) - set(current_dirs):
+                    conn.execute(f"DELETE FROM outputs WHERE pattern = ? AND {ON_DISK}", (pattern,))
+                    conn.execute("DELETE FROM pattern_dirs WHERE pattern = ?", (pattern,))
+
+                for pattern, mtime in current_dirs.items():
+                    if known_dirs.get(pattern) == mtime:
+                        continue
+                    self._rescan_pattern_dir(conn, pattern)
+                    conn.execute("INSERT OR REPLACE INTO pattern_dirs (pattern, mtime) VALUES (?, ?)", (pattern, mtime))
+                    rescanned += 1
+
+        return rescanned
+
+    def _rescan_pattern_dir(self, conn, pattern: str):
+        pattern_path = os.path.join(self.output_dir, pattern)
+        on_disk = {
+            os.path.join(pattern_path, filename)
+            for filename in os.listdir(pattern_path)
+            if filename.endswith('.md')
+        }
+        indexed = {
+            row['filepath']
+            for row in conn.execute(f"SELECT filepath FROM outputs WHERE pattern = ? AND {ON_DISK}", (pattern,))
+        }
+
+        for filepath in indexed - on_disk:
+            conn.execute("DELETE FROM outputs WHERE filepath = ?", (filepath,))
+
+        for filepath in on_disk - indexed:
+            filename = os.path.basename(filepath)
+            source, timestamp = parse_output_filename(filename, filepath)
+            conn.execute(
+                "INSERT OR REPLACE INTO outputs (filepath, filename, pattern, source, timestamp, preview) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (filepath, filename, pattern, source, timestamp.strftime(TIMESTAMP_FORMAT), read_preview(filepath)),
+            )
+
+    @staticmethod
+    def _where(source: str = None, pattern: str = None, since: datetime = None, until: datetime = None) -> tuple:
+        clauses, params = [], []
+        if source is not None:
+            clauses.append("source = ?")
+            params.append(source)
+        if pattern is not None:
+            clauses.append("pattern = ?")
+            params.append(pattern)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since.strftime(TIMESTAMP_FORMAT))
+        if until is not None:
+            clauses.append("timestamp <= ?")
+            params.append(until.strftime(TIMESTAMP_FORMAT))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, source: str = None, pattern: str = None, since: datetime = None, until: datetime = None,
+              limit: int = None, offset: int = 0) -> list:
+        """Return matching outputs, newest first; ``limit``/``offset`` select one page."""
+        where, params = self._where(source, pattern, since, until)
+        sql = "SELECT filepath, filename, pattern, source, timestamp, preview FROM outputs" + where
+        # Within a second, newest first by the microseconds in the name; dropping ".md" first makes a
+        # numbered name (name-2) sort after the name it was numbered from (name), i.e. as newer
+        sql += " ORDER BY timestamp DESC, substr(filename, 1, length(filename) - 3) DESC"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+
+        return [
+            {
+                'filepath': row['filepath'],
+                'filename': row['filename'],
+                'timestamp': datetime.strptime(row['timestamp'], TIMESTAMP_FORMAT),
+                'pattern': row['pattern'],
+                'source': row['source'],
+                'preview': row['preview'] or "",
+            }
+            for row in rows
+        ]
+
+    def counts(self, **filters) -> dict:
+        """Return ``{pattern: number of outputs}`` for the matching outputs."""
+        where, params = self._where(**filters)
+        sql = f"SELECT pattern, COUNT(*) AS n FROM outputs{where} GROUP BY pattern"
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return {row['pattern']: row['n'] for row in rows}
+
+    def rollup(self, group_by: str, source: str = None, pattern: str = None, since: date = None,
+               until: date = None) -> dict:
+        """Return ``{key: number of outputs}`` per source, pattern or day (``YYYY-MM-DD``).
+
+        Served from the daily rollup, so the cost grows with the number of sources,
+        patterns and days rather than with the number of saved outputs. ``since`` and
+        ``until`` are inclusive dates.
+        """
+        if group_by not in ROLLUP_GROUPS:
+            raise ValueError(f"group_by must be one of {', '.join(ROLLUP_GROUPS)}")
+        clauses, params = [], []
+        for column, value in (("source", source), ("pattern", pattern)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("day >= ?")
+            params.append(since.isoformat())
+        if until is not None:
+            clauses.append("day <= ?")
+            params.append(until.isoformat())
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        sql = f"SELECT {group_by} AS key, SUM(n) AS n FROM daily_counts{where} GROUP BY {group_by} ORDER BY {group_by}"
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return {row['key']: row['n'] for row in rows}
+
+    def recent(self, limit: int = 10, since: date = None, until: date = None) -> list:
+        """The ``limit`` newest outputs between two inclusive dates (walks the timestamp index)."""
+        return self.query(
+            since=datetime.combine(since, time.min) if since else None,
+            until=datetime.combine(until, time.max) if until else None,
+            limit=limit,
+        )
+
+    def sources(self) -> list:
+        """Return every source name that has at least one output."""
+        with self._lock:
+            rows = self._connect().execute("SELECT DISTINCT source FROM outputs ORDER BY source").fetchall()
+        return [row['source'] for row in rows]
+
+    def nested(self, **filters) -> dict:
+        """Return outputs as ``{source: {pattern: [entries newest first]}}``."""
+        outputs = {}
+        for entry in self.query(**filters):
+            outputs.setdefault(entry['source'], {}).setdefault(entry['pattern'], []).append(entry)
+        return outputs
@@ -0,0 +1,107 @@
+"""Finding and parsing Telos markdown files."""
+
+import hashlib
+import os
+import re
+
+from telos_os.tokens import estimate_tokens
+
+
+def find_markdown_files(folder: str) -> list[str]:
+    """Scan folder for markdown files."""
+    if not os.path.exists(folder):
+        return []
+    
+    md_files = []
+    for file in os.listdir(folder):
+        if file.endswith(('.md', '.markdown')):
+            md_files.append(os.path.join(folder, file))
+    
+    return sorted(md_files)
+
+
+def split_telos_by_sections(content: str) -> list:
+    """Split Telos content by ## sections for processing large files."""
+    sections = []
+    current_section = ""
+    current_header = ""
+    
+    for line in content.split('\n'):
+        if line.startswith('## '):
+            # Save previous section
+            if current_section:
+                sections.append({
+                    'header': current_header,
+                    'content': current_section.strip()
+                })
+            # Start new section
+            current_header = line
+            current_section = line + '\n'
+        else:
+            current_section += line + '\n'
+    
+    # Add last section
+    if current_section:
+        sections.append({
+            'header': current_header,
+            'content': current_section.strip()
+        })
+    
+    return sections
+
+
+def is_anchor_section(section: dict, every: int = 6) -> bool:
+    """True for roughly one section in ``every``, decided by its header alone.
+
+    Anchors are stable chunk boundaries: editing a section's text never moves them.
+    """
+    digest = hashlib.sha1(section['header'].encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') % every == 0
+
+
+def merge_small_sections(sections: list, max_tokens: int, count_tokens=estimate_tokens, is_boundary=None) -> list:
+    """Merge adjacent sections into chunks of at most ``max_tokens`` to save model calls.
+
+    Sections that are already over the budget are kept on their own. ``count_tokens``
+    measures each piece (the local estimator unless a model-specific counter is given).
+    If ``is_boundary(section)`` is true the section starts a new chunk once the current
+    one is at least half full, so growing or shrinking one section mostly reshuffles
+    chunks up to the next boundary while chunks still fill most of the budget.
+    """
+    chunks = []
+    chunk_tokens = 0
+    for section in sections:
+        tokens = count_tokens(section['content'])
+        boundary = is_boundary is not None and chunk_tokens >= max_tokens // 2 and is_boundary(section)
+        if chunks and not boundary and chunk_tokens + tokens <= max_tokens:
+            previous = chunks[-1]
+            first_header = previous['header'].split(" → ")[0]
+            chunks[-1] = {
+                'header': f"{first_header} → {section['header']}" if first_header else section['header'],
+                'content': previous['content'] + "\n\n" + section['content'],
+            }
+            chunk_tokens += tokens
+        else:
+            chunks.append(dict(section))
+            chunk_tokens = tokens
+    
+    return chunks
+
+
+def extract_goals_from_telos(content: str) -> list:
+    """Extract goals from Telos content using pattern matching and AI."""
+    goals = []
+    
+    # Pattern 1: Look for Goals section
+    goals_section = re.search(r'##\s*Goals\s*\n(.*?)(?=\n##|\Z)', content, re.DOTALL | re.IGNORECASE)
+    if goals_section:
+        goal_text = goals_section.group(1)
+        # Extract bullet points
+        bullet_goals = re.findall(r'[-*]\s+(.+)', goal_text)
+        goals.extend(bullet_goals)
+    
+    # Pattern 2: Look for numbered goals
+    numbered_goals = re.findall(r'\d+\.\s+(.+)', content)
+    goals.extend(numbered_goals)
+    
+    return list(set(goals))  # Remove duplicates
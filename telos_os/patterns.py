@@ -0,0 +1,296 @@
+"""Registry of analysis patterns (AI personas), loaded from markdown files in PATTERNS_DIR.
+
+Each pattern is one ``<name>.md`` file: a front-matter block of ``key: value`` lines
+(a small YAML subset) followed by the prompt::
+
+    ---
+    category: ⚡ Creative & Practical
+    order: 140
+    max_output_tokens: 1024
+    chunking: truncate
+    ---
+    Based on the 'Mission' and 'Narrative' sections, ...
+
+``temperature``, ``max_output_tokens``, ``top_p`` and ``top_k`` override the shared
+GENERATION_CONFIG for that pattern. ``chunking`` says what happens to files too large
+for one call: ``sections`` (map-reduce over the sections, the default) or ``truncate``
+(send the leading sections that fit). ``tier`` (deep, standard or fast) routes the
+pattern's calls to that model tier instead of the default for analyses (see
+telos_os.routing). Edited, added and removed files are picked up on the next lookup
+after PATTERNS_RELOAD_SECONDS.
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+from telos_os.config import GENERATION_CONFIG, MODEL_NAME, PATTERNS_DIR, PATTERNS_RELOAD_SECONDS
+from telos_os.routing import TIER_ORDER
+from telos_os.tokens import model_limits
+
+GENERATION_KEYS = {"temperature": float, "max_output_tokens": int, "top_p": float, "top_k": int}
+CHUNKING_STRATEGIES = ("sections", "truncate")
+DEFAULT_CATEGORY = "🧩 Custom"
+
+
+class PromptTemplate:
+    """The fixed text around a pattern prompt, rendered once instead of on every call.
+
+    ``instructions`` closes a single-call prompt (the Telos file comes first, so every
+    pattern shares the same prefix); ``section_instructions`` and reduce_prompt() are the
+    map and reduce steps for files analyzed in sections. The map step doesn't say which
+    part it is, so a cached partial stays valid when sections are added or removed.
+    """
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.instructions = f"""--- INSTRUCTIONS ---
+{prompt}
+
+Apply the instructions above to the Telos file at the start of this conversation.
+"""
+        self.section_instructions = f"""--- INSTRUCTIONS ---
+{prompt}
+
+**Note:** The section above is one part of a larger Telos document. Analyze only this part; your notes will be combined with the other parts into one final answer.
+"""
+        self._reduce_head = f"""
+{prompt}
+
+The Telos document was too large to analyze at once, so it was split into parts and each part was analyzed separately with the instructions above. Below are those partial analyses.
+Synthesize them into ONE coherent answer that follows the original instructions for the whole document. Merge overlapping points, resolve contradictions, and do not mention the parts or sections.
+
+--- PARTIAL ANALYSES ---
+"""
+
+    def reduce_prompt(self, partials: list) -> str:
+        """The synthesis prompt over a group of partial analyses."""
+        return self._reduce_head + "\n".join(partials) + "\n"
+
+
+@functools.lru_cache(maxsize=256)
+def prompt_template(prompt: str) -> PromptTemplate:
+    """The template for any prompt; patterns keep theirs, this covers custom prompts."""
+    return PromptTemplate(prompt)
+
+
+@dataclass(frozen=True)
+class Pattern:
+    """One loaded pattern file; ``generation_config`` is GENERATION_CONFIG with its overrides applied."""
+
+    name: str
+    prompt: str
+    category: str = DEFAULT_CATEGORY
+    order: int = 1000
+    generation_config: dict = field(default_factory=lambda: dict(GENERATION_CONFIG))
+    chunking: str = "sections"
+    tier: str = None
+    path: str = ""
+
+    @functools.cached_property
+    def template(self) -> PromptTemplate:
+        return prompt_template(self.prompt)
+
+
+def parse_front_matter(text: str) -> tuple:
+    """Split ``---`` delimited front matter from the body; returns ``(metadata, body)``.
+
+    Values are ints, floats or booleans when they look like one, strings otherwise.
+    """
+    lines = text.lstrip("\ufeff").splitlines()
+    if not lines or lines[0].strip() != "---":
+        return {}, text.strip()
+    metadata = {}
+    for i, line in enumerate(lines[1:], 1):
+        if line.strip() == "---":
+            return metadata, "\n".join(lines[i + 1:]).strip()
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        key, sep, value = line.partition(":")
+        if not sep:
+            raise ValueError(f"line {i + 1}: expected 'key: value', got {line!r}")
+        metadata[key.strip()] = _parse_value(value.strip())
+    raise ValueError("front matter is not closed with '---'")
+
+
+def _parse_value(value: str):
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    for parse in (int, float):
+        try:
+            return parse(value)
+        except ValueError:
+            pass
+    return value
+
+
+def load_pattern(path: str) -> Pattern:
+    """Read one pattern file; raises ValueError when it is malformed."""
+    with open(path, "r", encoding="utf-8") as f:
+        metadata, prompt = parse_front_matter(f.read())
+    if not prompt:
+        raise ValueError("the prompt is empty")
+
+    generation_config = dict(GENERATION_CONFIG)
+    for key, kind in GENERATION_KEYS.items():
+        if key in metadata:
+            generation_config[key] = kind(metadata[key])
+    # A pattern may ask for more than the MAX_OUTPUT_TOKENS default, but not more than the model allows
+    generation_config["max_output_tokens"] = min(generation_config["max_output_tokens"],
+                                                 model_limits(MODEL_NAME)["output"])
+
+    chunking = str(metadata.get("chunking", "sections")).lower()
+    if chunking not in CHUNKING_STRATEGIES:
+        raise ValueError(f"unknown chunking {chunking!r} (expected one of {', '.join(CHUNKING_STRATEGIES)})")
+    tier = metadata.get("tier")
+    if tier is not None and tier not in TIER_ORDER:
+        raise ValueError(f"unknown tier {tier!r} (expected one of {', '.join(TIER_ORDER)})")
+    return Pattern(
+        name=os.path.splitext(os.path.basename(path))[0],
+        prompt=prompt,
+        category=str(metadata.get("category", DEFAULT_CATEGORY)),
+        order=int(metadata.get("order", 1000)),
+        generation_config=generation_config,
+        chunking=chunking,
+        tier=tier,
+        path=path,
+    )
+
+
+class PatternRegistry:
+    """Patterns loaded from a directory of markdown files, reloaded when they change.
+
+    Lookups check the directory at most every ``reload_seconds`` (0 checks on every
+    lookup); only files whose mtime or size changed are parsed again. A file that
+    fails to parse is reported on stderr and its last good version is kept.
+    """
+
+    def __init__(self, directory: str, reload_seconds: float = 2.0):
+        self.directory = directory
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._files = {}  # path -> ((mtime_ns, size), Pattern or None)
+        self._patterns = {}
+        self._by_prompt = {}
+        self._checked = None
+        self.version = 0
+
+    def _scan(self) -> dict:
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return {}
+        return {
+            entry.path: (stat.st_mtime_ns, stat.st_size)
+            for entry in entries
+            if entry.name.endswith(".md") and not entry.name.startswith((".", "_")) and entry.is_file()
+            for stat in (entry.stat(),)
+        }
+
+    def refresh(self, force: bool = False) -> bool:
+        """Pick up edited, added and removed files; returns True if anything changed."""
+        now = time.monotonic()
+        checked = self._checked
+        if not force and checked is not None and now - checked < self.reload_seconds:
+            return False  # Checked recently; skips the lock on the hot path
+        with self._lock:
+            if not force and self._checked is not checked:
+                return False  # Another thread just checked
+            try:
+                return self._reload()
+            finally:
+                # Only now, so lock-free readers never see a check whose patterns aren't loaded yet
+                self._checked = now
+
+    def _reload(self) -> bool:
+        # Called with the lock held
+        current = self._scan()
+        changed = current.keys() != self._files.keys()
+        files = {}
+        for path, signature in current.items():
+            previous = self._files.get(path)
+            if previous is not None and previous[0] == signature:
+                files[path] = previous
+                continue
+            changed = True
+            try:
+                files[path] = (signature, load_pattern(path))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Skipping pattern file {path}: {e}", file=sys.stderr)
+                files[path] = (signature, previous[1] if previous else None)
+        if not changed:
+            return False
+        self._files = files
+        patterns = sorted((pattern for _, pattern in files.values() if pattern is not None),
+                          key=lambda pattern: (pattern.order, pattern.name))
+        self._patterns = {pattern.name: pattern for pattern in patterns}
+        self._by_prompt = {pattern.prompt: pattern for pattern in patterns}
+        self.version += 1
+        return True
+
+    def all(self) -> dict:
+        """``{name: Pattern}`` in display order."""
+        self.refresh()
+        return self._patterns
+
+    def get(self, name: str) -> Pattern:
+        """The pattern called ``name``, or None."""
+        return self.all().get(name)
+
+    def find(self, prompt: str) -> Pattern:
+        """The pattern whose prompt is ``prompt``, or None for custom prompts."""
+        self.refresh()
+        return self._by_prompt.get(prompt)
+
+    def categories(self) -> dict:
+        """``{category: {name: prompt}}``, categories in order of their first pattern."""
+        categories = {}
+        for pattern in self.all().values():
+            categories.setdefault(pattern.category, {})[pattern.name] = pattern.prompt
+        return categories
+
+
+@functools.lru_cache(maxsize=None)
+def get_pattern_registry():
+    """Get the process-wide pattern registry (PATTERNS_DIR)."""
+    return PatternRegistry(PATTERNS_DIR, reload_seconds=PATTERNS_RELOAD_SECONDS)
+
+
+class _Patterns(Mapping):
+    """``{name: prompt}`` view of the registry, always current."""
+
+    def __getitem__(self, name):
+        pattern = get_pattern_registry().get(name)
+        if pattern is None:
+            raise KeyError(name)
+        return pattern.prompt
+
+    def __iter__(self):
+        return iter(get_pattern_registry().all())
+
+    def __len__(self):
+        return len(get_pattern_registry().all())
+
+
+class _PatternCategories(Mapping):
+    """``{category: {name: prompt}}`` view of the registry, always current."""
+
+    def __getitem__(self, category):
+        return get_pattern_registry().categories()[category]
+
+    def __iter__(self):
+        return iter(get_pattern_registry().categories())
+
+    def __len__(self):
+        return len(get_pattern_registry().categories())
+
+
+# The old module-level dicts, now live views over the files in PATTERNS_DIR
+PATTERNS = _Patterns()
+PATTERN_CATEGORIES = _PatternCategories()
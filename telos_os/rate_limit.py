@@ -0,0 +1,197 @@
+"""Client-side rate limiting and retry with backoff for Gemini calls."""
+
+import asyncio
+import random
+import re
+import threading
+import time
+
+# HTTP status codes worth retrying: rate limited, or a transient server-side failure
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout",
+}
+# Quotas that waiting a minute won't restore; these fail at once instead of being retried
+EXHAUSTED_QUOTA_RE = re.compile(r"per[ _-]?day|daily|billing", re.IGNORECASE)
+RETRY_HINT_PATTERNS = [
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry[- ]after:?\s*([\d.]+)", re.IGNORECASE),
+]
+
+
+class RateLimiter:
+    """Token buckets for requests per minute and tokens per minute.
+
+    Every model call acquires one request and its estimated input tokens before it is
+    sent, so concurrent workers share one budget instead of each discovering the quota
+    by failing. A limit of 0 disables that bucket. ``pause()`` holds back every caller,
+    which is how a server-sent retry hint is honoured across all workers.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        wait = max(0.0, self._paused_until - now)
+        if self.requests_per_minute and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+        if self.tokens_per_minute:
+            # A single request larger than the whole bucket only waits for a full bucket
+            needed = min(tokens, self.tokens_per_minute)
+            if self._tokens < needed:
+                wait = max(wait, (needed - self._tokens) * 60 / self.tokens_per_minute)
+        return wait
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take one request and ``tokens`` if available (returns 0), else return how long to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._wait_time(tokens, now)
+            if wait <= 0:
+                if self.requests_per_minute:
+                    self._requests -= 1
+                if self.tokens_per_minute:
+                    self._tokens -= tokens
+            return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until one request and ``tokens`` input tokens are available; returns seconds waited."""
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """acquire() for coroutines: waits without blocking the event loop."""
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def adjust(self, tokens: int):
+        """Charge (or refund) the difference between estimated and actual token usage."""
+        if not self.tokens_per_minute or not tokens:
+            return
+        with self._lock:
+            self._tokens = min(self.tokens_per_minute, self._tokens - tokens)
+
+    def pause(self, seconds: float):
+        """Hold back every caller for ``seconds``."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def utilization(self) -> float:
+        """Fraction (0-1) of the tighter bucket currently used up."""
+        with self._lock:
+            self._refill(time.monotonic())
+            used = [0.0]
+            if self.requests_per_minute:
+                used.append(1 - self._requests / self.requests_per_minute)
+            if self.tokens_per_minute:
+                used.append(1 - self._tokens / self.tokens_per_minute)
+            return max(0.0, min(1.0, max(used)))
+
+
+def is_exhausted_quota(error: Exception) -> bool:
+    """True for a daily or billing quota, which a retry within minutes can't get past."""
+    return bool(EXHAUSTED_QUOTA_RE.search(str(error)))
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for per-minute rate limits and transient server errors (not for exhausted quotas)."""
+    if is_exhausted_quota(error):
+        return False
+    if getattr(error, "code", None) in RETRYABLE_STATUS_CODES:
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "per minute" in message
+
+
+def retry_after_hint(error: Exception):
+    """Return the server-suggested delay in seconds, if the error carries one."""
+    message = str(error)
+    for pattern in RETRY_HINT_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def retry_delay(error: Exception, attempt: int, limiter: RateLimiter, base_delay: float, max_delay: float) -> float:
+    """Backoff before retry number ``attempt + 1``; a server retry hint also pauses ``limiter``."""
+    # Full jitter keeps concurrent workers from retrying in lockstep
+    delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+    hint = retry_after_hint(error)
+    if hint is not None:
+        delay = max(delay, min(hint, max_delay))
+        if limiter is not None:
+            limiter.pause(delay)
+    return delay
+
+
+def call_with_retry(fn, limiter: RateLimiter = None, tokens: int = 0, max_retries: int = 4,
+                    base_delay: float = 1.0, max_delay: float = 60.0, on_retry=None):
+    """Call ``fn()`` through ``limiter``, retrying retryable errors with jittered exponential backoff.
+
+    Retry hints from the server win over the computed backoff and pause the shared
+    limiter so other workers back off too. ``on_retry(attempt, delay, error)`` is called
+    before each sleep. The last error is re-raised once ``max_retries`` is exhausted.
+    """
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire(tokens)
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = retry_delay(e, attempt, limiter, base_delay, max_delay)
+            attempt += 1
+            if on_retry:
+                on_retry(attempt, delay, e)
+            time.sleep(delay)
+
+
+async def call_with_retry_async(fn, limiter: RateLimiter = None, tokens: int = 0, max_retries: int = 4,
+                                base_delay: float = 1.0, max_delay: float = 60.0, on_retry=None):
+    """call_with_retry() for coroutines: ``fn()`` returns an awaitable, waits don't block the loop."""
+    attempt = 0
+    while True:
+        if limiter is not None:
+            await limiter.acquire_async(tokens)
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = retry_delay(e, attempt, limiter, base_delay, max_delay)
+            attempt += 1
+            if on_retry:
+                on_retry(attempt, delay, e)
+            await asyncio.sleep(delay)
@@ -0,0 +1,139 @@
+"""Persistent, content-addressed cache for Gemini responses."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class ResponseCache:
+    """On-disk cache of model responses keyed by a hash of everything sent to the model.
+
+    Each entry is a small JSON file named after its key. Entries older than
+    ``max_age_seconds`` are treated as misses, and the oldest entries are evicted
+    once the cache grows past ``max_entries`` or ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 500, max_bytes: int = 50 * 1024 * 1024,
+                 max_age_seconds: float = 30 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(prompt: str, context: str, model_name: str, generation_config: dict) -> str:
+        """Hash the exact inputs of a model call into a cache key."""
+        payload = json.dumps(
+            {
+                "prompt": prompt,
+                "context": context,
+                "model": model_name,
+                "generation_config": generation_config,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str):
+        """Return the cached text for ``key``, or None on a miss."""
+        path = self._path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age > self.max_age_seconds:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            # Touch the entry so eviction treats it as recently used
+            os.utime(path, None)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return entry.get("text")
+
+    def put(self, key: str, text: str, metadata: dict = None):
+        """Store ``text`` under ``key`` and evict old entries if the cache is over budget."""
+        Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+        entry = {"text": text, "created": time.time(), "metadata": metadata or {}}
+
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        self.evict()
+
+    def _entries(self) -> list:
+        """List ``(mtime, size, path)`` for every entry, oldest first."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+
+        entries = []
+        for item in os.scandir(self.cache_dir):
+            if item.is_file() and item.name.endswith(".json"):
+                stat = item.stat()
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+        entries.sort()
+        return entries
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used ones until within budget."""
+        now = time.time()
+        removed = 0
+        entries = []
+        for mtime, size, path in self._entries():
+            if now - mtime > self.max_age_seconds:
+                removed += self._remove(path)
+            else:
+                entries.append((mtime, size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            total_bytes -= size
+            removed += self._remove(path)
+
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+
+    def clear(self) -> int:
+        """Delete every entry and reset the counters."""
+        removed = sum(self._remove(path) for _, _, path in self._entries())
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+        return removed
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size of the cache."""
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
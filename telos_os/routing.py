@@ -0,0 +1,139 @@
+"""Model routing: which model serves each kind of call, adjusted for load and recent history.
+
+Every call names a task (analysis, section, reduce, batch, search, assist). MODEL_ROUTES
+maps the task to a preferred tier and MODEL_TIERS maps tiers to models; a pattern can
+ask for its own tier in its front matter. The cheaper tiers after the preferred one are
+fallbacks: a tier is passed over while its model's rate limiter is nearly used up or its
+recent calls (from the metrics store) mostly failed or ran too slowly.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from telos_os.metrics import percentile
+
+# Most capable first; every tier after a task's preferred one is a cheaper fallback
+TIER_ORDER = ("deep", "standard", "fast")
+DEFAULT_ROUTES = {
+    "analysis": "standard",
+    "batch": "standard",
+    "assist": "standard",
+    "section": "fast",  # Map step over one part of a large file
+    "reduce": "deep",  # Synthesis of the partial analyses
+    "search": "fast",
+}
+MIN_HISTORY_CALLS = 5  # Recent calls needed before a model's history counts against it
+
+
+def model_id(name: str) -> str:
+    """A model name without the API's ``models/`` prefix."""
+    return name.split("/", 1)[1] if name.startswith("models/") else name
+
+
+def parse_routes(spec: str) -> dict:
+    """Parse ``task=tier`` pairs (``section=fast,reduce=deep``) over DEFAULT_ROUTES."""
+    routes = dict(DEFAULT_ROUTES)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        task, sep, tier = item.partition("=")
+        if not sep or tier.strip() not in TIER_ORDER:
+            raise ValueError(f"MODEL_ROUTES: expected task=tier with a tier in {', '.join(TIER_ORDER)}, got {item!r}")
+        routes[task.strip()] = tier.strip()
+    return routes
+
+
+@dataclass(frozen=True)
+class Route:
+    task: str
+    tier: str
+    model: str
+    degraded: str = None  # Why the preferred tier was passed over (load, errors or latency)
+
+
+class ModelRouter:
+    """Picks a model per call from the task's tier and the cheaper fallbacks.
+
+    ``limiter_for(model)`` returns the rate limiter of a model and ``load_records(since)``
+    the recent ``model_call`` metrics; the history is re-read at most every
+    ``refresh_seconds``. When every tier is in the same model, routing is a lookup.
+    """
+
+    def __init__(self, tiers: dict, routes: dict, limiter_for, load_records, degrade_at: float = 0.8,
+                 max_error_rate: float = 0.5, max_p95_seconds: float = 0.0, history_seconds: float = 900.0,
+                 refresh_seconds: float = 60.0):
+        self.tiers = {tier: model_id(model) for tier, model in tiers.items()}
+        self.routes = routes
+        self.limiter_for = limiter_for
+        self.load_records = load_records
+        self.degrade_at = degrade_at
+        self.max_error_rate = max_error_rate
+        self.max_p95_seconds = max_p95_seconds
+        self.history_seconds = history_seconds
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._history = {}
+        self._history_loaded = None
+
+    def candidates(self, task: str, tier: str = None) -> list:
+        """``(tier, model)`` pairs to try for ``task``, preferred first, one per model."""
+        preferred = tier if tier in TIER_ORDER else self.routes.get(task, "standard")
+        seen = set()
+        candidates = []
+        for name in TIER_ORDER[TIER_ORDER.index(preferred):]:
+            model = self.tiers[name]
+            if model not in seen:
+                seen.add(model)
+                candidates.append((name, model))
+        return candidates
+
+    def history(self) -> dict:
+        """``{model: {"calls", "error_rate", "p95_seconds"}}`` over the last ``history_seconds``."""
+        now = time.time()
+        with self._lock:
+            if self._history_loaded is not None and now - self._history_loaded < self.refresh_seconds:
+                return self._history
+            self._history_loaded = now
+        groups = defaultdict(list)
+        for entry in self.load_records(now - self.history_seconds):
+            groups[model_id(entry["name"])].append(entry)
+        history = {
+            model: {
+                "calls": len(entries),
+                "error_rate": sum(1 for entry in entries if entry.get("error")) / len(entries),
+                "p95_seconds": percentile([entry["seconds"] for entry in entries], 95),
+            }
+            for model, entries in groups.items()
+        }
+        with self._lock:
+            self._history = history
+        return history
+
+    def _unavailable(self, model: str, history: dict):
+        """Why ``model`` should be passed over right now, or None."""
+        if self.limiter_for(model).utilization() >= self.degrade_at:
+            return "load"
+        stats = history.get(model)
+        if stats is None or stats["calls"] < MIN_HISTORY_CALLS:
+            return None
+        if stats["error_rate"] > self.max_error_rate:
+            return "errors"
+        if self.max_p95_seconds and stats["p95_seconds"] > self.max_p95_seconds:
+            return "latency"
+        return None
+
+    def choose(self, task: str, tier: str = None) -> Route:
+        """The route for one call of ``task`` (``tier`` overrides the task's preferred tier)."""
+        candidates = self.candidates(task, tier)
+        if len(candidates) == 1:
+            return Route(task, *candidates[0])
+        history = self.history()
+        degraded = None
+        for name, model in candidates:
+            reason = self._unavailable(model, history)
+            if reason is None:
+                return Route(task, name, model, degraded)
+            degraded = degraded or reason
+        # Every tier is under pressure: use the one with the most headroom
+        name, model = min(candidates, key=lambda candidate: self.limiter_for(candidate[1]).utilization())
+        return Route(task, name, model, degraded)
@@ -0,0 +1,111 @@
+"""Fair-share scheduling of model calls across tenants."""
+
+import asyncio
+import contextlib
+import itertools
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future
+
+
+class FairShareScheduler:
+    """A fixed number of model-call slots, handed out fairly between tenants.
+
+    Every model call holds one slot. When a slot frees up it goes to the waiting
+    tenant with the fewest calls running, and on a tie to the one served least
+    recently, so a tenant with a 20-pattern sweep queued can't keep another
+    tenant's single analysis waiting behind it. Within one tenant calls are served
+    in order.
+    Callers in worker threads and coroutines on the client event loop wait on the
+    same concurrent.futures.Future per request.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = max(1, slots)
+        self._lock = threading.Lock()
+        self._free = self.slots
+        self._running = Counter()
+        self._waiting = {}  # tenant -> deque of Futures
+        self._served = {}  # tenant -> sequence number of its last grant
+        self._sequence = itertools.count()
+
+    def _request(self, tenant: str) -> Future:
+        future = Future()
+        with self._lock:
+            self._waiting.setdefault(tenant, deque()).append(future)
+            self._dispatch()
+        return future
+
+    def _dispatch(self):
+        # Called with the lock held
+        while self._free and self._waiting:
+            tenant = min(self._waiting, key=lambda name: (self._running[name], self._served.get(name, -1)))
+            queue = self._waiting[tenant]
+            future = queue.popleft()
+            if not queue:
+                del self._waiting[tenant]
+            if not future.set_running_or_notify_cancel():
+                continue  # The caller gave up waiting
+            self._free -= 1
+            self._running[tenant] += 1
+            self._served[tenant] = next(self._sequence)
+            future.set_result(None)
+
+    def release(self, tenant: str):
+        """Give back a slot taken by ``tenant``."""
+        with self._lock:
+            self._running[tenant] -= 1
+            if not self._running[tenant]:
+                del self._running[tenant]
+            self._free += 1
+            self._dispatch()
+
+    def _abandon(self, tenant: str, future: Future):
+        """Withdraw a request whose caller stopped waiting, releasing the slot if it was already granted."""
+        if not future.cancel() and not future.cancelled():
+            self.release(tenant)
+
+    def acquire(self, tenant: str):
+        """Block until ``tenant`` has a slot; pair with release()."""
+        future = self._request(tenant)
+        try:
+            future.result()
+        except BaseException:
+            self._abandon(tenant, future)
+            raise
+
+    async def acquire_async(self, tenant: str):
+        """acquire() for coroutines: waits without blocking the event loop."""
+        future = self._request(tenant)
+        try:
+            await asyncio.shield(asyncio.wrap_future(future))
+        except BaseException:  # Includes cancellation
+            self._abandon(tenant, future)
+            raise
+
+    @contextlib.contextmanager
+    def slot(self, tenant: str):
+        """Hold one slot for ``tenant`` inside the block."""
+        self.acquire(tenant)
+        try:
+            yield
+        finally:
+            self.release(tenant)
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self, tenant: str):
+        """Coroutine form of slot()."""
+        await self.acquire_async(tenant)
+        try:
+            yield
+        finally:
+            self.release(tenant)
+
+    def stats(self) -> dict:
+        """``{"slots", "running": {tenant: calls}, "waiting": {tenant: calls}}`` right now."""
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "running": dict(self._running),
+                "waiting": {tenant: len(queue) for tenant, queue in self._waiting.items()},
+            }
@@ -0,0 +1,157 @@
+"""Search across Telos files: a local index picks candidate sections, the model ranks them."""
+
+import functools
+import itertools
+import json
+import re
+
+from telos_os.client import generate_content, get_rate_limiter, get_token_counter, sdk
+from telos_os.config import (
+    EMBEDDING_MODEL,
+    MAX_RETRIES,
+    SEARCH_EMBEDDINGS,
+    SEARCH_GENERATION_CONFIG,
+    SEARCH_TOP_K,
+    SECTION_TOKEN_BUDGET,
+)
+from telos_os.gemini import safe_extract_text
+from telos_os.metrics import instrumented
+from telos_os.parsing import split_telos_by_sections
+from telos_os.rate_limit import call_with_retry
+from telos_os.search_index import SearchIndex
+from telos_os.tenants import current_tenant
+
+
+def embed_texts(texts: list, is_query: bool) -> list:
+    """Embed texts with the Gemini embedding model in one request (SearchIndex sends at most 100)."""
+    result = call_with_retry(
+        lambda: sdk().embed_content(
+            model=EMBEDDING_MODEL,
+            content=texts,
+            task_type="retrieval_query" if is_query else "retrieval_document",
+        ),
+        limiter=get_rate_limiter(),
+        max_retries=MAX_RETRIES,
+    )
+    return result['embedding']
+
+
+def get_search_index(index_dir: str = None):
+    """Get the shared local search index over Telos sections in ``index_dir`` (default: the current tenant's)."""
+    return _search_index(index_dir or current_tenant().search_index_dir)
+
+
+@functools.lru_cache(maxsize=None)
+def _search_index(index_dir: str):
+    return SearchIndex(
+        index_dir,
+        split_telos_by_sections,
+        embed_fn=embed_texts if SEARCH_EMBEDDINGS else None,
+    )
+
+
+def fallback_sections(index: SearchIndex, max_tokens: int) -> list:
+    """Sections to let the model search when the local index matched nothing.
+
+    The whole corpus if it fits in ``max_tokens``; otherwise the leading sections of
+    every file, taken in turn from each file until the budget is used up.
+    """
+    sections = index.sections()
+    estimate = get_token_counter().estimate
+    if sum(estimate(section['text']) for section in sections) <= max_tokens:
+        return sections
+    
+    by_file = {}
+    for section in sections:
+        by_file.setdefault(section['file'], []).append(section)
+    picked, used = [], 0
+    for section in itertools.chain.from_iterable(itertools.zip_longest(*by_file.values())):
+        if section is None:
+            continue
+        tokens = estimate(section['text'])
+        if used + tokens > max_tokens:
+            continue  # A shorter section further on may still fit
+        picked.append(section)
+        used += tokens
+    return picked
+
+
+@instrumented()
+def semantic_search_telos(query: str, telos_files: list) -> list:
+    """Perform semantic search across all Telos files using AI.
+
+    A local BM25 (and optionally embedding) index picks the top sections first, so only
+    those excerpts are sent to the model for ranking and explanation. A query that shares
+    no words with the files (and so gets no local hits) is answered by the model from
+    fallback_sections() instead.
+    """
+    try:
+        index = get_search_index()
+        index.refresh(telos_files)
+        hits = index.search(query, k=SEARCH_TOP_K)
+        
+        # Fallback results straight from the local index
+        local_results = [
+            {
+                'file': hit['file'],
+                'relevance': 'high' if i < 2 else 'medium' if i < 5 else 'low',
+                'excerpt': hit['text'],
+                'context': f"Matched section {hit['header'] or '(top of file)'}"
+            }
+            for i, hit in enumerate(hits)
+        ]
+        
+        if not hits:
+            hits = fallback_sections(index, SECTION_TOKEN_BUDGET)
+            if not hits:
+                return []
+        
+        # Create search prompt
+        files_text = "\n\n---\n\n".join([
+            f"FILE: {hit['file']}\nSECTION: {hit['header'] or '(top of file)'}\n{hit['text']}"
+            for hit in hits
+        ])
+        
+        prompt = f"""You are a semantic search engine for personal Telos files.
+
+USER QUERY: "{query}"
+
+CANDIDATE SECTIONS (pre-selected from the user's Telos files):
+{files_text}
+
+Find and return the most relevant sections from these files that answer the query.
+Format your response as JSON with this structure:
+{{
+    "results": [
+        {{
+            "file": "filename.md",
+            "relevance": "high/medium/low",
+            "excerpt": "relevant text excerpt",
+            "context": "why this is relevant"
+        }}
+    ]
+}}
+
+Return only the JSON, no other text."""
+        
+        try:
+            response = generate_content(prompt, SEARCH_GENERATION_CONFIG, task="search")
+            result_text = safe_extract_text(response)
+        except Exception:
+            return local_results
+        
+        # Try to parse JSON
+        try:
+            # Extract JSON from response
+            json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
+            if json_match:
+                results = json.loads(json_match.group())
+                return results.get('results', [])
+        except Exception:
+            pass
+        
+        # Fallback: the model answered in prose, so show the local matches instead
+        return local_results
+    
+    except Exception as e:
+        return [{'file': 'Error', 'relevance': 'low', 'excerpt': str(e), 'context': 'Search failed'}]
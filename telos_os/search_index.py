@@ -0,0 +1,288 @@
+"""Local BM25 (plus optional embedding) index over Telos file sections."""
+
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # Embedding search is optional; BM25 works without numpy
+    np = None
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "i", "in", "is",
+    "it", "my", "of", "on", "or", "that", "the", "this", "to", "was", "were", "what", "with",
+}
+
+
+def tokenize(text: str) -> list:
+    """Lowercase word tokens without common stopwords."""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SearchIndex:
+    """Incrementally rebuilt search index over the sections of a set of Telos files.
+
+    Files are split with ``splitter`` (``split_telos_by_sections``) and each section is
+    one searchable chunk. Only files whose mtime/size changed are re-read, and only
+    files whose content hash changed are re-split. When an ``embed_fn`` is supplied and
+    numpy is installed, chunk embeddings are cached by content hash in a NumPy matrix and
+    combined with BM25 using reciprocal rank fusion. Missing embeddings are requested
+    EMBED_BATCH chunks at a time; after a failed request the index waits (doubling up to
+    EMBED_MAX_BACKOFF seconds) before asking again, serving BM25 results meanwhile.
+    """
+
+    K1 = 1.5
+    B = 0.75
+    RRF_K = 60
+    EMBED_BATCH = 100  # The embedding API takes at most 100 texts per request
+    EMBED_BACKOFF = 30
+    EMBED_MAX_BACKOFF = 3600
+
+    def __init__(self, index_dir: str, splitter, embed_fn=None):
+        self.index_dir = index_dir
+        self.splitter = splitter
+        self.embed_fn = embed_fn if np is not None else None
+        self._lock = threading.Lock()
+        self._files = {}  # path -> {mtime, size, sha, chunks: [{header, text, sha}]}
+        self._embeddings = {}  # chunk sha -> vector
+        self._chunks = []
+        self._postings = {}
+        self._lengths = []
+        self._avg_length = 0.0
+        self._matrix = None
+        self._embed_failures = 0
+        self._embed_retry_at = 0.0
+        self.embed_error = None  # Last embedding failure, until a request succeeds again
+        self._load()
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.index_dir, "index.json")
+
+    @property
+    def _embeddings_path(self) -> str:
+        return os.path.join(self.index_dir, "embeddings.npz")
+
+    def _load(self):
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                self._files = json.load(f)
+        except (OSError, ValueError):
+            self._files = {}
+
+        if np is not None and os.path.exists(self._embeddings_path):
+            try:
+                data = np.load(self._embeddings_path)
+                self._embeddings = dict(zip(data["keys"].tolist(), data["vectors"]))
+            except (OSError, ValueError, KeyError):
+                self._embeddings = {}
+
+        self._rebuild()
+
+    def _save(self):
+        Path(self.index_dir).mkdir(parents=True, exist_ok=True)
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._files, f, ensure_ascii=False)
+        os.replace(tmp_path, self._manifest_path)
+
+        if np is not None and self._embeddings:
+            keys = list(self._embeddings)
+            with open(self._embeddings_path + ".tmp", "wb") as f:
+                np.savez(f, keys=np.array(keys), vectors=np.vstack([self._embeddings[k] for k in keys]))
+            os.replace(self._embeddings_path + ".tmp", self._embeddings_path)
+
+    def refresh(self, filepaths: list) -> int:
+        """Bring the index up to date with ``filepaths``; returns how many files were re-indexed."""
+        with self._lock:
+            changed = 0
+            wanted = set(filepaths)
+
+            for path in list(self._files):
+                if path not in wanted:
+                    del self._files[path]
+                    changed += 1
+
+            for path in filepaths:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                record = self._files.get(path)
+                if record and record["mtime"] == stat.st_mtime and record["size"] == stat.st_size:
+                    continue
+
+                with open(path, "r", encoding="utf-8") as f:
+                    content = f.read()
+                sha = _sha256(content)
+                if record and record["sha"] == sha:
+                    record.update(mtime=stat.st_mtime, size=stat.st_size)
+                    continue
+
+                chunks = [
+                    {"header": section["header"], "text": section["content"], "sha": _sha256(section["content"])}
+                    for section in self.splitter(content)
+                    if section["content"].strip()
+                ]
+                self._files[path] = {"mtime": stat.st_mtime, "size": stat.st_size, "sha": sha, "chunks": chunks}
+                changed += 1
+
+            if changed or (self._embedding_due() and self._missing_embeddings()):
+                self._embed_missing()
+                self._rebuild()
+                self._save()
+
+            return changed
+
+    def _missing_embeddings(self) -> list:
+        return [chunk for chunk in self._iter_chunks() if chunk["sha"] not in self._embeddings]
+
+    def _iter_chunks(self):
+        for path in sorted(self._files):
+            for chunk in self._files[path]["chunks"]:
+                yield chunk
+
+    def _embedding_due(self) -> bool:
+        return bool(self.embed_fn) and time.monotonic() >= self._embed_retry_at
+
+    def _embed_missing(self):
+        if not self._embedding_due():
+            return
+        missing = self._missing_embeddings()
+        for start in range(0, len(missing), self.EMBED_BATCH):
+            batch = missing[start:start + self.EMBED_BATCH]
+            try:
+                vectors = self.embed_fn([chunk["text"] for chunk in batch], False)
+            except Exception as e:
+                # Keep serving BM25 results, and the batches embedded so far, until the backoff ends
+                self._embed_failures += 1
+                backoff = min(self.EMBED_BACKOFF * 2 ** (self._embed_failures - 1), self.EMBED_MAX_BACKOFF)
+                self._embed_retry_at = time.monotonic() + backoff
+                self.embed_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ Embedding request failed ({type(e).__name__}); retrying in {backoff}s", file=sys.stderr)
+                break
+            for chunk, vector in zip(batch, vectors):
+                self._embeddings[chunk["sha"]] = np.asarray(vector, dtype=np.float32)
+        else:
+            self._embed_failures = 0
+            self.embed_error = None
+
+        # Drop vectors for chunks that no longer exist
+        live = {chunk["sha"] for chunk in self._iter_chunks()}
+        self._embeddings = {sha: vec for sha, vec in self._embeddings.items() if sha in live}
+
+    def _rebuild(self):
+        """Recompute the inverted index and embedding matrix from the per-file records."""
+        self._chunks = []
+        self._postings = defaultdict(list)
+        self._lengths = []
+
+        for path in sorted(self._files):
+            for chunk in self._files[path]["chunks"]:
+                chunk_id = len(self._chunks)
+                terms = Counter(tokenize(chunk["text"]))
+                for term, tf in terms.items():
+                    self._postings[term].append((chunk_id, tf))
+                self._lengths.append(sum(terms.values()))
+                self._chunks.append({"file": os.path.basename(path), "path": path, **chunk})
+
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+        self._matrix = None
+        if np is not None and self._chunks and all(c["sha"] in self._embeddings for c in self._chunks):
+            matrix = np.vstack([self._embeddings[c["sha"]] for c in self._chunks])
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._matrix = matrix / np.where(norms == 0, 1, norms)
+
+    def _bm25(self, query: str) -> dict:
+        scores = defaultdict(float)
+        total = len(self._chunks)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings:
+                length_norm = 1 - self.B + self.B * self._lengths[chunk_id] / (self._avg_length or 1)
+                scores[chunk_id] += idf * tf * (self.K1 + 1) / (tf + self.K1 * length_norm)
+        return scores
+
+    def _embed_query(self, query: str):
+        """The normalised query vector, or None; called without the lock held, as it is a network request."""
+        if self._matrix is None or not self.embed_fn:
+            return None
+        try:
+            query_vector = np.asarray(self.embed_fn([query], True)[0], dtype=np.float32)
+        except Exception:
+            return None
+        norm = np.linalg.norm(query_vector)
+        return query_vector / norm if norm else None
+
+    def _vector_ranking(self, query_vector, k: int) -> list:
+        if self._matrix is None or query_vector is None or self._matrix.shape[1] != query_vector.shape[0]:
+            return []
+        similarities = self._matrix @ query_vector
+        top = np.argsort(-similarities)[:k]
+        return [int(i) for i in top]
+
+    def search(self, query: str, k: int = 8) -> list:
+        """Return the top ``k`` chunks for ``query`` as dicts with file, header, text and score."""
+        query_vector = self._embed_query(query)
+        with self._lock:
+            if not self._chunks:
+                return []
+
+            bm25 = self._bm25(query)
+            lexical_ranking = sorted(bm25, key=bm25.get, reverse=True)[:k * 4]
+            vector_ranking = self._vector_ranking(query_vector, k * 4)
+
+            if vector_ranking:
+                fused = defaultdict(float)
+                for ranking in (lexical_ranking, vector_ranking):
+                    for rank, chunk_id in enumerate(ranking):
+                        fused[chunk_id] += 1.0 / (self.RRF_K + rank + 1)
+                scores = fused
+            else:
+                scores = bm25
+
+            top = sorted(scores, key=scores.get, reverse=True)[:k]
+            return [
+                {
+                    "file": self._chunks[i]["file"],
+                    "header": self._chunks[i]["header"],
+                    "text": self._chunks[i]["text"],
+                    "score": scores[i],
+                }
+                for i in top
+            ]
+
+    def sections(self) -> list:
+        """Every indexed chunk in file order, shaped like search() hits with a score of 0."""
+        with self._lock:
+            return [
+                {"file": chunk["file"], "header": chunk["header"], "text": chunk["text"], "score": 0.0}
+                for chunk in self._chunks
+            ]
+
+    def stats(self) -> dict:
+        """Return the number of indexed files and chunks and whether embeddings are in use."""
+        return {
+            "files": len(self._files),
+            "chunks": len(self._chunks),
+            "terms": len(self._postings),
+            "embeddings": self._matrix is not None,
+            "embedding_error": self.embed_error,
+        }
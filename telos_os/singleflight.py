@@ -0,0 +1,81 @@
+"""Single-flight: concurrent identical calls share one execution and its result."""
+
+import asyncio
+import threading
+from concurrent.futures import CancelledError, Future
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; callers arriving meanwhile share its result.
+
+    The shared result is a concurrent.futures.Future, so callers in worker threads and
+    coroutines on the client event loop can wait for the same call. Exceptions are
+    shared like results. If the leading call is cancelled instead (a closed generator,
+    a cancelled task), one of the waiting callers runs the call itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def join(self, key) -> tuple:
+        """``(future, leader)`` for ``key``; a leader must settle() the future when done."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def settle(self, key, future: Future, result=None, error: BaseException = None):
+        """Publish the leader's ``result`` (or ``error``) to every caller waiting on ``future``."""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            future.cancel()  # Cancelled or interrupted: let a waiting caller take over
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key, fn) -> tuple:
+        """Run ``fn()`` unless a call with ``key`` is in flight; returns ``(result, shared)``."""
+        while True:
+            future, leader = self.join(key)
+            if not leader:
+                try:
+                    return future.result(), True
+                except CancelledError:
+                    continue
+            try:
+                result = fn()
+            except BaseException as e:
+                self.settle(key, future, error=e)
+                raise
+            self.settle(key, future, result)
+            return result, False
+
+    async def do_async(self, key, coro_fn) -> tuple:
+        """Coroutine form of do(): awaits ``coro_fn()`` or the call already in flight."""
+        while True:
+            future, leader = self.join(key)
+            if not leader:
+                try:
+                    # Shielded so cancelling this caller doesn't cancel the shared call
+                    return await asyncio.shield(asyncio.wrap_future(future)), True
+                except asyncio.CancelledError:
+                    if future.cancelled():
+                        continue
+                    raise
+            try:
+                result = await coro_fn()
+            except BaseException as e:
+                self.settle(key, future, error=e)
+                raise
+            self.settle(key, future, result)
+            return result, False
@@ -0,0 +1,290 @@
+"""Saving analyses to ``outputs/`` and querying them through the outputs index.
+
+Analyses are markdown files under ``outputs/<pattern>/`` by default. With
+OUTPUT_STORE=sqlite they are rows of ``outputs/.store.sqlite`` instead, addressed
+by ``store:<pattern>/<filename>`` paths; read_output() and delete_output() accept
+either kind of path. Every function works on the current tenant's outputs folder
+(see telos_os.tenants), which is ``outputs/`` unless MULTI_USER is on.
+"""
+
+import functools
+import hashlib
+import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from telos_os.config import OUTPUT_COALESCE_SECONDS, OUTPUT_KEEP_LAST, OUTPUT_STORE
+from telos_os.errors import ErrorResponse
+from telos_os.metrics import instrumented
+from telos_os.output_store import OutputStore, is_store_path, numbered_filename, store_path
+from telos_os.outputs_index import OutputsIndex, make_preview
+from telos_os.singleflight import SingleFlight
+from telos_os.tenants import current_tenant
+
+# Recently saved outputs, so callers that shared one analysis also share its file
+_recent_saves = {}  # (outputs folder, pattern, source name, output digest) -> (filepath, monotonic time saved)
+_recent_saves_lock = threading.Lock()
+
+
+@contextmanager
+def open_output(pattern: str, source_file: str):
+    """Create a new output with its metadata header and yield it for writing.
+
+    The output is added to the outputs index once the block exits, so streamed
+    results can be written piece by piece as they arrive. The yielded object's
+    ``name`` is the path save_output() returns; read it after the block exits, since
+    the output store can only settle on a unique name once it has been written.
+    Names carry the time to the microsecond and get a number appended if another
+    output still took the same one, so two saves never overwrite each other.
+    """
+    now = datetime.now()
+    timestamp = now.strftime("%Y-%m-%d_%H-%M-%S-%f")
+    source_name = os.path.splitext(os.path.basename(source_file))[0]
+    filename = f"{source_name}_{timestamp}.md"
+    header = (
+        f"# {pattern.replace('_', ' ').title()} Analysis\n\n"
+        f"**Source File:** {os.path.basename(source_file)}\n"
+        f"**Date:** {now.strftime('%Y-%m-%d %H:%M:%S')}\n"
+        f"**Pattern:** {pattern}\n\n"
+        "---\n\n"
+    )
+    
+    if OUTPUT_STORE == "sqlite":
+        # Buffered in memory and written to the store in one go when the block exits
+        f = io.StringIO()
+        f.name = store_path(pattern, filename)
+        f.write(header)
+        yield f
+        text = f.getvalue()
+        filepath = get_output_store().put(pattern, source_name, filename, now.replace(microsecond=0),
+                                          header, text[len(header):])
+        f.name = filepath
+        get_outputs_index().add(filepath, pattern, source_name, now.replace(microsecond=0), preview=make_preview(text))
+    else:
+        pattern_dir = os.path.join(output_dir(), pattern)
+        Path(pattern_dir).mkdir(parents=True, exist_ok=True)
+        n = 1
+        while True:
+            filepath = os.path.join(pattern_dir, numbered_filename(filename, n))
+            try:
+                f = open(filepath, "x", encoding="utf-8")
+                break
+            except FileExistsError:
+                n += 1
+        with f:
+            f.write(header)
+            yield f
+        get_outputs_index().add(filepath, pattern, source_name, now.replace(microsecond=0))
+    
+    apply_retention(source_name, pattern)
+
+
+def apply_retention(source_name: str, pattern: str) -> int:
+    """Delete all but the newest OUTPUT_KEEP_LAST outputs of a source/pattern pair (0 keeps all)."""
+    if OUTPUT_KEEP_LAST <= 0:
+        return 0
+    expired = get_outputs_index().query(source=source_name, pattern=pattern, limit=-1, offset=OUTPUT_KEEP_LAST)
+    for entry in expired:
+        try:
+            delete_output(entry['filepath'])
+        except FileNotFoundError:
+            get_outputs_index().remove(entry['filepath'])
+    return len(expired)
+
+
+def save_output(pattern: str, source_file: str, output: str):
+    """Save output to file.
+
+    Returns the new file's path, or None if ``output`` is an ErrorResponse - error
+    messages are shown to the user but never saved as analyses. Saving the same output
+    for the same file and pattern again within OUTPUT_COALESCE_SECONDS, as callers that
+    shared one analysis do, returns the first save's path instead of writing a copy.
+    """
+    if isinstance(output, ErrorResponse):
+        return None
+    
+    key = _output_key(pattern, source_file, output)
+    
+    def write():
+        filepath = _recent_output(key)
+        if filepath is None:
+            with open_output(pattern, source_file) as f:
+                f.write(output)
+            filepath = f.name
+            _remember_output(key, filepath)
+        return filepath
+    
+    filepath, _ = get_saves_in_flight().do(key, write)
+    return filepath
+
+
+def share_output(filepath: str, pattern: str, source_file: str, output: str) -> str:
+    """Register an output written with open_output(), or switch to an identical one saved moments ago.
+
+    For streamed analyses, which are written as they arrive: if another caller saved
+    the same output for the same file and pattern within OUTPUT_COALESCE_SECONDS,
+    ``filepath`` is deleted and that caller's path is returned.
+    """
+    key = _output_key(pattern, source_file, output)
+    
+    def register():
+        shared = _recent_output(key)
+        if shared is None:
+            _remember_output(key, filepath)
+            return filepath
+        return shared
+    
+    shared, _ = get_saves_in_flight().do(key, register)
+    if shared != filepath:
+        delete_output(filepath)
+    return shared
+
+
+@functools.lru_cache(maxsize=None)
+def get_saves_in_flight():
+    """Get the saves currently being written, which identical saves wait for."""
+    return SingleFlight()
+
+
+def _output_key(pattern: str, source_file: str, output: str) -> tuple:
+    source_name = os.path.splitext(os.path.basename(source_file))[0]
+    return output_dir(), pattern, source_name, hashlib.sha256(output.encode("utf-8")).hexdigest()
+
+
+def _recent_output(key: tuple):
+    now = time.monotonic()
+    with _recent_saves_lock:
+        for expired in [k for k, (_, saved) in _recent_saves.items() if now - saved > OUTPUT_COALESCE_SECONDS]:
+            del _recent_saves[expired]
+        filepath, _ = _recent_saves.get(key, (None, None))
+    if filepath is not None and not is_store_path(filepath) and not os.path.exists(filepath):
+        return None
+    return filepath
+
+
+def _remember_output(key: tuple, filepath: str):
+    if OUTPUT_COALESCE_SECONDS > 0:
+        with _recent_saves_lock:
+            _recent_saves[key] = (filepath, time.monotonic())
+
+
+@instrumented()
+def read_output(filepath: str) -> str:
+    """Return the full text of a saved output, from the store or from disk."""
+    if is_store_path(filepath):
+        return get_output_store().get(filepath)
+    with open(filepath, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def delete_output(filepath: str):
+    """Delete a saved output and drop it from the index."""
+    with _recent_saves_lock:
+        for key in [k for k, (path, _) in _recent_saves.items() if k[0] == output_dir() and path == filepath]:
+            del _recent_saves[key]
+    if is_store_path(filepath):
+        get_output_store().delete(filepath)
+    else:
+        os.remove(filepath)
+    get_outputs_index().remove(filepath)
+
+
+def export_outputs(dest_dir: str) -> int:
+    """Write every stored analysis to ``dest_dir/<pattern>/<filename>.md``, the file layout."""
+    return get_output_store().export(dest_dir)
+
+
+def output_dir() -> str:
+    """The current tenant's outputs folder."""
+    return current_tenant().output_dir
+
+
+def get_output_store(directory: str = None):
+    """Get the SQLite output store of ``directory`` (default: the current tenant's outputs folder).
+
+    Used when OUTPUT_STORE=sqlite.
+    """
+    return _output_store(directory or output_dir())
+
+
+@functools.lru_cache(maxsize=None)
+def _output_store(directory: str):
+    return OutputStore(os.path.join(directory, ".store.sqlite"))
+
+
+def get_outputs_index(directory: str = None):
+    """Get the shared outputs index of ``directory`` (default: the current tenant's outputs folder)."""
+    return _outputs_index(directory or output_dir())
+
+
+@functools.lru_cache(maxsize=None)
+def _outputs_index(directory: str):
+    index = OutputsIndex(directory)
+    if OUTPUT_STORE == "sqlite":
+        # The index can be deleted and rebuilt; the store is the source of truth for its entries
+        index.sync_store(get_output_store(directory))
+    return index
+
+
+@instrumented()
+def get_all_outputs(**filters):
+    """Get all output files organized by pattern and source file.
+
+    Served from the outputs index; a cheap mtime check picks up files added or removed
+    outside the app. ``filters`` (source, pattern, since, until) narrow the query.
+    """
+    if not os.path.exists(output_dir()):
+        return {}
+    
+    index = get_outputs_index()
+    index.reconcile()
+    return index.nested(**filters)
+
+
+def get_output_counts(source: str) -> dict:
+    """Get ``{pattern: number of saved versions}`` for one source file."""
+    if not os.path.exists(output_dir()):
+        return {}
+    
+    index = get_outputs_index()
+    index.reconcile()
+    return index.counts(source=source)
+
+
+def get_output_page(source: str, pattern: str, page: int, page_size: int) -> list:
+    """Get one page (0-based) of a pattern's saved versions, newest first, with previews."""
+    return get_outputs_index().query(source=source, pattern=pattern, limit=page_size, offset=page * page_size)
+
+
+def get_output_rollup(group_by: str, **filters) -> dict:
+    """Get ``{source|pattern|day: number of saved outputs}`` from the index's daily rollup.
+
+    ``filters`` (source, pattern, since, until - dates, inclusive) narrow the counts.
+    """
+    if not os.path.exists(output_dir()):
+        return {}
+    
+    index = get_outputs_index()
+    index.reconcile()
+    return index.rollup(group_by, **filters)
+
+
+def get_recent_outputs(limit: int = 10, since=None, until=None) -> list:
+    """Get the ``limit`` newest saved outputs, optionally between two dates."""
+    if not os.path.exists(output_dir()):
+        return []
+    return get_outputs_index().recent(limit, since, until)
+
+
+def get_output_sources() -> list:
+    """Get the names of all source files that have saved outputs."""
+    if not os.path.exists(output_dir()):
+        return []
+    
+    index = get_outputs_index()
+    index.reconcile()
+    return index.sources()
@@ -0,0 +1,97 @@
+"""Tenants: whose Telos folder and outputs a call works with.
+
+A single-user deployment has one tenant, ``default``, using TELOS_FOLDER and
+``outputs/``. With MULTI_USER on, every signed-in user is a tenant with its own
+``TENANTS_DIR/<tenant>/telos`` and ``outputs`` folders and search index. The tenant
+of the running code is a context variable: the UI sets it once per script run, job
+workers per job, and work handed to other threads carries it along with bind().
+"""
+
+import contextlib
+import contextvars
+import functools
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+
+from telos_os.config import OUTPUT_DIR, SEARCH_INDEX_DIR, TELOS_FOLDER, TENANTS_DIR
+
+DEFAULT_TENANT = "default"
+TENANT_ID = re.compile(r"^[a-z0-9][a-z0-9._-]{0,63}$")
+
+_current_tenant = contextvars.ContextVar("telos_tenant", default=None)
+
+
+@dataclass(frozen=True)
+class Tenant:
+    id: str
+    telos_folder: str
+    output_dir: str
+    search_index_dir: str
+
+
+def tenant_id(user: str) -> str:
+    """A folder-safe tenant id for a user name or e-mail address.
+
+    Ids that had to be changed to be safe (and the reserved ``default``) get a short
+    hash of the original, so two users never map to the same folder.
+    """
+    user = user.strip().lower()
+    slug = re.sub(r"[^a-z0-9._-]+", "-", user).strip("-.")[:48]
+    if slug != user or slug == DEFAULT_TENANT:
+        slug = f"{slug or 'user'}-{hashlib.sha256(user.encode('utf-8')).hexdigest()[:8]}"
+    return slug
+
+
+@functools.lru_cache(maxsize=None)
+def get_tenant(tenant: str = None) -> Tenant:
+    """The tenant called ``tenant`` (None or ``default`` for the single-user layout)."""
+    if not tenant or tenant == DEFAULT_TENANT:
+        return Tenant(DEFAULT_TENANT, TELOS_FOLDER, OUTPUT_DIR, SEARCH_INDEX_DIR)
+    if not TENANT_ID.match(tenant):
+        raise ValueError(f"Invalid tenant id: {tenant!r}")
+    root = os.path.join(TENANTS_DIR, tenant)
+    return Tenant(tenant, os.path.join(root, "telos"), os.path.join(root, "outputs"), os.path.join(root, ".search"))
+
+
+def tenant_for_user(user: str) -> Tenant:
+    """The tenant of a signed-in user."""
+    return get_tenant(tenant_id(user))
+
+
+def current_tenant() -> Tenant:
+    """The tenant the running code works for (the default tenant unless one was set)."""
+    return _current_tenant.get() or get_tenant()
+
+
+def set_tenant(tenant: Tenant):
+    """Make ``tenant`` current for the rest of this context (a Streamlit script run)."""
+    _current_tenant.set(tenant)
+
+
+@contextlib.contextmanager
+def use_tenant(tenant: Tenant):
+    """Make ``tenant`` current inside the block."""
+    token = _current_tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _current_tenant.reset(token)
+
+
+def bind(fn):
+    """``fn`` wrapped to run as the current tenant, for handing work to another thread."""
+    tenant = current_tenant()
+
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        with use_tenant(tenant):
+            return fn(*args, **kwargs)
+    return bound
+
+
+async def run_as(tenant: Tenant, coro):
+    """Await ``coro`` as ``tenant``; coroutines scheduled on another loop don't inherit it."""
+    with use_tenant(tenant):
+        return await coro
@@ -0,0 +1,119 @@
+"""Token accounting: per-model limits, a calibrated local estimator and memoised exact counts."""
+
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Context window (input), maximum response (output) and the smallest context the
+# API accepts for explicit context caching ("cache_min"), in tokens. Names are
+# matched by longest prefix, so "gemini-2.5-flash-lite" uses its own entry and
+# "gemini-2.5-flash-preview-..." falls back to "gemini-2.5-flash".
+MODEL_LIMITS = {
+    "gemini-2.5-pro": {"input": 1_048_576, "output": 65_536, "cache_min": 4_096},
+    "gemini-2.5-flash": {"input": 1_048_576, "output": 65_536, "cache_min": 1_024},
+    "gemini-2.5-flash-lite": {"input": 1_048_576, "output": 65_536, "cache_min": 1_024},
+    "gemini-2.0-flash": {"input": 1_048_576, "output": 8_192, "cache_min": 4_096},
+    "gemini-2.0-flash-lite": {"input": 1_048_576, "output": 8_192, "cache_min": 4_096},
+    "gemini-1.5-pro": {"input": 2_097_152, "output": 8_192, "cache_min": 32_768},
+    "gemini-1.5-flash": {"input": 1_048_576, "output": 8_192, "cache_min": 32_768},
+    "gemini-1.5-flash-8b": {"input": 1_048_576, "output": 8_192, "cache_min": 32_768},
+}
+DEFAULT_LIMITS = {"input": 32_768, "output": 8_192, "cache_min": 32_768}
+
+
+def model_limits(model_name: str) -> dict:
+    """Return ``{"input": ..., "output": ..., "cache_min": ...}`` token limits for ``model_name``."""
+    name = model_name.split("/")[-1]
+    matches = [key for key in MODEL_LIMITS if name.startswith(key)]
+    if not matches:
+        return dict(DEFAULT_LIMITS)
+    return dict(MODEL_LIMITS[max(matches, key=len)])
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate tokens offline, weighting characters by script.
+
+    Plain ASCII words run about 4 characters per token, but accented Latin, Cyrillic
+    and similar scripts take roughly one token per 2-3 characters, CJK about one per
+    character and emoji two or more, so a flat ``len(text) // 4`` badly undercounts
+    non-English and emoji-heavy Telos files.
+    """
+    ascii_chars = 0
+    weighted = 0.0
+    for char in text:
+        code = ord(char)
+        if code < 128:
+            ascii_chars += 1
+        elif code >= 0x1F000 or 0x2600 <= code < 0x2800:
+            weighted += 2.0  # Emoji and pictographs
+        elif unicodedata.east_asian_width(char) in ("W", "F"):
+            weighted += 1.0  # CJK and other wide characters
+        elif unicodedata.category(char).startswith("M") or code in (0x200D, 0xFE0F):
+            weighted += 0.5  # Combining marks, zero-width joiners and variation selectors
+        else:
+            weighted += 0.4
+    return int(ascii_chars / 4 + weighted)
+
+
+class TokenCounter:
+    """Counts tokens for one model, preferring the model's own ``count_tokens``.
+
+    Exact counts are memoised by content hash. When the remote count fails (offline,
+    quota) the calibrated local estimate is used and the remote is not retried for
+    ``offline_backoff`` seconds. Every exact count also refines a correction ratio
+    applied to local estimates, so estimates track the real tokenizer over time.
+    """
+
+    def __init__(self, model_name: str, remote_count=None, max_entries: int = 4096, offline_backoff: float = 300):
+        self.model_name = model_name
+        self.limits = model_limits(model_name)
+        self.remote_count = remote_count
+        self.max_entries = max_entries
+        self.offline_backoff = offline_backoff
+        self._memo = OrderedDict()
+        self._ratio = 1.0
+        self._offline_until = 0.0
+        self._lock = threading.Lock()
+
+    def estimate(self, text: str) -> int:
+        """Local estimate, corrected by what exact counts have shown so far."""
+        return int(estimate_tokens(text) * self._ratio)
+
+    def count(self, text: str) -> int:
+        """Exact token count when available, otherwise the corrected local estimate."""
+        key = hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+
+        if self.remote_count is None or time.monotonic() < self._offline_until:
+            return self.estimate(text)
+
+        try:
+            tokens = int(self.remote_count(text))
+        except Exception:
+            self._offline_until = time.monotonic() + self.offline_backoff
+            return self.estimate(text)
+
+        local = estimate_tokens(text)
+        with self._lock:
+            if local >= 100:
+                # Exponential moving average, clamped so one odd document can't skew it
+                observed = tokens / local
+                self._ratio = min(2.0, max(0.5, 0.8 * self._ratio + 0.2 * observed))
+            self._memo[key] = tokens
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        return tokens
+
+    def fits(self, text: str, limit: int) -> bool:
+        """True if ``text`` fits in ``limit`` tokens; only asks the model when the estimate is close."""
+        estimate = self.estimate(text)
+        if estimate < limit * 0.5:
+            return True
+        if estimate > limit * 2:
+            return False
+        return self.count(text) <= limit
@@ -0,0 +1,128 @@
+"""Per-tenant daily usage counters and the quotas checked against them before each model call."""
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    tenant TEXT NOT NULL,
+    day TEXT NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL,
+    PRIMARY KEY (tenant, day)
+);
+"""
+
+
+class QuotaExceeded(Exception):
+    """A tenant used up its daily quota; raised before the model is called."""
+
+
+@dataclass(frozen=True)
+class Quota:
+    calls: int = 0  # Model calls per day; 0 = unlimited
+    tokens: int = 0  # Input plus output tokens per day; 0 = unlimited
+
+
+def parse_quotas(spec: str) -> dict:
+    """Parse ``tenant=calls/tokens`` pairs (``alice=200/2000000,bob=50/0``) into ``{tenant: Quota}``."""
+    quotas = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        tenant, sep, limits = item.partition("=")
+        calls, slash, tokens = (part.strip() for part in limits.partition("/"))
+        if not sep or not slash or not tenant.strip() or not calls.isdigit() or not tokens.isdigit():
+            raise ValueError(f"TENANT_QUOTAS: expected tenant=calls/tokens, got {item!r}")
+        quotas[tenant.strip()] = Quota(int(calls), int(tokens))
+    return quotas
+
+
+class UsageMeter:
+    """Model calls and tokens per tenant and day, in a SQLite file shared by every process.
+
+    check() raises QuotaExceeded once a tenant's calls or tokens for today reach its
+    quota (``quotas`` per tenant, ``default_quota`` for everyone else); charge() adds
+    a finished call. A call already under way is never cut off, so a tenant can end a
+    day slightly over its token quota. With ``track_unlimited`` off, tenants without a
+    quota aren't counted at all, so a single-user install never touches the database.
+    """
+
+    def __init__(self, db_path: str, default_quota: Quota = Quota(), quotas: dict = None,
+                 track_unlimited: bool = True):
+        self.db_path = db_path
+        self.default_quota = default_quota
+        self.quotas = quotas or {}
+        self.track_unlimited = track_unlimited
+        self._local = threading.local()
+
+    def _connect(self):
+        # One connection per thread; SQLite serialises the writers
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def quota(self, tenant: str) -> Quota:
+        return self.quotas.get(tenant, self.default_quota)
+
+    def today(self, tenant: str) -> dict:
+        """``{"calls", "input_tokens", "output_tokens"}`` used by ``tenant`` today."""
+        row = self._connect().execute(
+            "SELECT calls, input_tokens, output_tokens FROM usage WHERE tenant = ? AND day = ?",
+            (tenant, date.today().isoformat()),
+        ).fetchone()
+        return dict(row) if row else {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+
+    def check(self, tenant: str):
+        """Raise QuotaExceeded if ``tenant`` has no calls or tokens left today."""
+        quota = self.quota(tenant)
+        if not quota.calls and not quota.tokens:
+            return
+        used = self.today(tenant)
+        if quota.calls and used["calls"] >= quota.calls:
+            raise QuotaExceeded(f"Daily limit of {quota.calls} model calls reached")
+        if quota.tokens and used["input_tokens"] + used["output_tokens"] >= quota.tokens:
+            raise QuotaExceeded(f"Daily limit of {quota.tokens:,} tokens reached")
+
+    def charge(self, tenant: str, input_tokens: int = 0, output_tokens: int = 0):
+        """Count one model call and its tokens for ``tenant`` today."""
+        quota = self.quota(tenant)
+        if not self.track_unlimited and not quota.calls and not quota.tokens:
+            return
+        self._connect().execute(
+            "INSERT INTO usage (tenant, day, calls, input_tokens, output_tokens, updated) VALUES (?, ?, 1, ?, ?, ?) "
+            "ON CONFLICT (tenant, day) DO UPDATE SET calls = calls + 1, "
+            "input_tokens = input_tokens + excluded.input_tokens, "
+            "output_tokens = output_tokens + excluded.output_tokens, updated = excluded.updated",
+            (tenant, date.today().isoformat(), input_tokens or 0, output_tokens or 0, time.time()),
+        )
+
+    def usage(self, since: date = None, tenant: str = None) -> list:
+        """Usage rows (tenant, day, calls, tokens, quota) from ``since`` on, newest day first."""
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("day >= ?")
+            params.append(since.isoformat())
+        if tenant is not None:
+            clauses.append("tenant = ?")
+            params.append(tenant)
+        sql = "SELECT tenant, day, calls, input_tokens, output_tokens FROM usage"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY day DESC, tenant"
+        rows = []
+        for row in self._connect().execute(sql, params).fetchall():
+            quota = self.quota(row["tenant"])
+            rows.append({**dict(row), "call_quota": quota.calls or None, "token_quota": quota.tokens or None})
+        return rows